@@ -0,0 +1,132 @@
+# %%
+import re
+from functools import lru_cache
+from typing import Any, NamedTuple, Optional
+
+# For data processing and analysis. 
+import numpy as np
+import pandas as pd 
+
+# Import personal module. 
+from config.config_naming import (
+    DF_CASHBACK_RATE, 
+    DF_CASHBACK_CAP, 
+    DF_CASHBACK_BENCHMARK, 
+    DF_CASHBACK_FROM, 
+    DF_CASHBACK_TILL, 
+    DF_CASHBACK_WEEKENDS_COND, 
+    DF_CASHBACK_MONTHLY_COND, 
+    DF_CASHBACK_SINGLE_RECEIPT_COND, 
+    DF_CASHBACK_UNCAPPED_COND, 
+)
+
+
+
+# %%
+# -------------------------------------------------------
+# Cashback benchmark parser
+# -------------------------------------------------------
+
+# Cap assigned to an uncapped cashback so that it still compares as a number. 
+UNCAPPED_CASHBACK_CAP = 1e+10
+
+# Every phrase of interest in a single alternation, so each benchmark is scanned once. 
+# Example: "with monthly spend from RM1,000 up to RM2,000 on weekends". 
+RX_CASHBACK_BENCHMARK = re.compile(
+    r'from RM(?P<from>\d[\d,]*(?:\.\d+)?)'
+    r'|up to RM(?P<till>\d[\d,]*(?:\.\d+)?)'
+    r'|(?P<weekends>weekends)'
+    r'|(?P<monthly>monthly)'
+    r'|(?P<single_receipt>single receipt)'
+    r'|(?P<any_amount>any amount)'
+)
+RX_CASHBACK_RATE = re.compile(r'(\d+(?:\.\d+)?)\s*%')
+RX_CASHBACK_CAP = re.compile(r'(?i)(?P<uncapped>uncapped)|RM\s?(?P<cap>\d[\d,]*(?:\.\d+)?)')
+
+
+class CashbackTerms(NamedTuple):
+    rate: float
+    cap: float
+    cashback_from: float
+    cashback_till: float
+    weekends_only: bool
+    monthly_basis: bool
+    single_receipt: bool
+    uncapped: bool
+
+
+def _to_number(value:Optional[str]) -> float: 
+    return float(value.replace(',', '')) if value else np.nan
+
+
+@lru_cache(maxsize=None)
+def parse_cashback_terms(rate:Any, cap:Any, benchmark:Any) -> CashbackTerms: 
+    '''
+    Purpose : 
+        Parse the rate, cap and benchmark of a cashback category in one pass. 
+        The result is memoised as many cards share the exact same phrases. 
+
+    Args    : 
+        rate      : Cashback rate, e.g. "5%". 
+        cap       : Cashback cap, e.g. "RM15" or "uncapped". 
+        benchmark : Spending condition, e.g. "with monthly spend from RM1,000". 
+
+    Output  :
+        The typed terms. A missing amount is NaN, and the spending range starts 
+        from 0 unless the benchmark says otherwise. 
+    '''
+
+    benchmark = benchmark if isinstance(benchmark, str) else ''
+    dict_found = {}
+    for match in RX_CASHBACK_BENCHMARK.finditer(benchmark): 
+        dict_found.setdefault(match.lastgroup, match.group(match.lastgroup))
+
+    match_rate = RX_CASHBACK_RATE.search(rate) if isinstance(rate, str) else None
+    match_cap = RX_CASHBACK_CAP.search(cap) if isinstance(cap, str) else None
+    uncapped = bool(match_cap and match_cap.group('uncapped'))
+
+    return CashbackTerms(
+        rate=_to_number(match_rate and match_rate.group(1)), 
+        cap=UNCAPPED_CASHBACK_CAP if uncapped else _to_number(match_cap and match_cap.group('cap')), 
+        cashback_from=0.0 if 'any_amount' in dict_found else _to_number(dict_found.get('from', '0')), 
+        cashback_till=_to_number(dict_found.get('till')), 
+        weekends_only='weekends' in dict_found, 
+        monthly_basis='monthly' in dict_found, 
+        single_receipt='single_receipt' in dict_found, 
+        uncapped=uncapped, 
+    )
+
+
+def parse_cashback_columns(df_main:pd.DataFrame) -> pd.DataFrame: 
+    '''
+    Purpose : 
+        Parse the rate, cap and benchmark columns of the exploded cashback data. 
+
+    Args    : 
+        df_main : Cashback dataframe with the rate, cap and benchmark columns. 
+
+    Output  :
+        DataFrame with the typed rate, cap, spending range and conditions, on the 
+        same index as the input. 
+    '''
+
+    ls_terms = [
+        parse_cashback_terms(rate, cap, benchmark) for rate, cap, benchmark in 
+        df_main[[DF_CASHBACK_RATE, DF_CASHBACK_CAP, DF_CASHBACK_BENCHMARK]].to_numpy(dtype=object)
+    ]
+    df_terms = pd.DataFrame(ls_terms, index=df_main.index, columns=CashbackTerms._fields)
+    df_terms.columns = [
+        DF_CASHBACK_RATE, 
+        DF_CASHBACK_CAP, 
+        DF_CASHBACK_FROM, 
+        DF_CASHBACK_TILL, 
+        DF_CASHBACK_WEEKENDS_COND, 
+        DF_CASHBACK_MONTHLY_COND, 
+        DF_CASHBACK_SINGLE_RECEIPT_COND, 
+        DF_CASHBACK_UNCAPPED_COND, 
+    ]
+
+    # Keep whole numbers as integers, as before. 
+    for col in [DF_CASHBACK_RATE, DF_CASHBACK_CAP, DF_CASHBACK_FROM, DF_CASHBACK_TILL]: 
+        df_terms[col] = pd.to_numeric(df_terms[col], downcast='integer')
+    return df_terms
@@ -0,0 +1,275 @@
+# %%
+import logging
+import re
+from bisect import bisect_right
+from typing import Dict, List, Optional, Text
+
+# For data processing and analysis. 
+import numpy as np
+import pandas as pd
+
+# Import personal module. 
+from config.config_logger import setup_logger
+from config.config import ( 
+    LOG_CARD_QUERY_FILEPATH, 
+    QUERY_VIEW_SIZE, 
+)
+from config.config_naming import ( 
+    DF_BANK, 
+    DF_CARD_NAME, 
+    DF_CARD_TYPE, 
+    DF_REQUIRED_INC, 
+    DF_REQUIRED_APPLICANT, 
+    DF_CASHBACK_CAT, 
+    DF_CASHBACK_RATE, 
+    DF_REWARD_CAT, 
+    DF_REWARD_POINTS, 
+    DF_EACH_SPENDING, 
+)
+
+
+
+# %%
+# --------------------------------------------------------------
+# Logging configuration 
+# --------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+logger, file_handler, stream_handler = setup_logger(logger, LOG_CARD_QUERY_FILEPATH)
+
+
+
+# %%
+# -------------------------------------------------------
+# Offers 
+# -------------------------------------------------------
+
+# Columns of the offer table the index is built on. 
+OFFER_KIND = 'kind'
+OFFER_CATEGORY = 'category'
+OFFER_SCORE = 'score'
+
+OFFER_CASHBACK = 'cashback'
+OFFER_REWARD = 'reward'
+
+# Applicant type that every customer qualifies for. 
+APPLICANT_ANYBODY = 'Anybody'
+
+# Words that don't tell the categories apart. 
+SET_STOPWORDS = {'and', 'or', 'the', 'on', 'at', 'for', 'in', 'of', 'with', 'to', 'all', 'a', 'an', 'only'}
+RX_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def tokenise_category(text:Text) -> List[Text]:
+    '''
+    Purpose :
+        Normalise a category into its distinct words, e.g. "Groceries & Dining"
+        into ["groceries", "dining"], with "e-wallet" as "e", "wallet".
+    '''
+
+    return sorted({token for token in RX_TOKEN.findall(str(text).lower()) if token not in SET_STOPWORDS})
+
+
+def build_offers(
+        df_cashback:Optional[pd.DataFrame]=None,
+        df_reward:Optional[pd.DataFrame]=None,
+        sr_point_values:Optional[pd.Series]=None,
+    ) -> pd.DataFrame:
+    '''
+    Purpose :
+        Put the cashback and reward categories of every card in one offer table,
+        scored as the percentage of the spending paid back.
+
+    Args    :
+        df_cashback     : Processed cashback dataframe.
+        df_reward       : Processed reward points dataframe.
+        sr_point_values : Value of a point in RM for each bank (load_point_values).
+                          Without it, reward offers are scored in points per RM.
+
+    Output  :
+        The offer table with the card columns, the kind, the category and the score.
+    '''
+
+    ls_cols = [DF_CARD_NAME, DF_BANK, DF_CARD_TYPE, DF_REQUIRED_INC, DF_REQUIRED_APPLICANT]
+    ls_offers = []
+
+    if df_cashback is not None:
+        ls_offers.append(df_cashback[ls_cols].assign(**{
+            OFFER_KIND: OFFER_CASHBACK,
+            OFFER_CATEGORY: df_cashback[DF_CASHBACK_CAT],
+            OFFER_SCORE: pd.to_numeric(df_cashback[DF_CASHBACK_RATE], errors='coerce'),
+        }))
+
+    if df_reward is not None:
+        sr_spending = pd.to_numeric(df_reward[DF_EACH_SPENDING], errors='coerce')
+        sr_score = pd.to_numeric(df_reward[DF_REWARD_POINTS], errors='coerce') / sr_spending.where(sr_spending > 0)
+        if sr_point_values is not None:
+            sr_score = sr_score * df_reward[DF_BANK].map(sr_point_values) * 100
+        ls_offers.append(df_reward[ls_cols].assign(**{
+            OFFER_KIND: OFFER_REWARD,
+            OFFER_CATEGORY: df_reward[DF_REWARD_CAT],
+            OFFER_SCORE: sr_score,
+        }))
+
+    return pd.concat(ls_offers, ignore_index=True)
+
+
+
+# %%
+# -------------------------------------------------------
+# Query index 
+# -------------------------------------------------------
+
+class CardQueryIndex:
+    '''
+    Purpose :
+        Answer "best cards for category C with income <= I" lookups without
+        scanning the tables. Everything is built once at load time:
+
+        - The offers are numbered by required income, so the offers open to an
+          income I are the first k offers, found by a binary search.
+        - Each set of offers is a bitmap (a Python int with one bit per offer),
+          kept for each category word, applicant type and card type, so the
+          filters of a lookup are a few bitwise ANDs. The bitmaps are packed
+          from NumPy masks in one go.
+        - For each category word and income band, the best (QUERY_VIEW_SIZE)
+          offers are kept in order, so a lookup only walks a short list and
+          falls back to the bitmaps when the filters empty the list. The views
+          are cut from the offers of each word ranked by score once.
+
+    Args    :
+        df_offers : Offer table (build_offers).
+        view_size : Number of offers kept in each materialised view.
+    '''
+
+    def __init__(self, df_offers:pd.DataFrame, view_size:int=QUERY_VIEW_SIZE):
+        self.view_size = view_size
+
+        # Number the offers by required income, best score first within the same income. 
+        df_offers = df_offers.assign(**{
+            DF_REQUIRED_INC: pd.to_numeric(df_offers[DF_REQUIRED_INC], errors='coerce').fillna(0),
+            OFFER_SCORE: pd.to_numeric(df_offers[OFFER_SCORE], errors='coerce').fillna(0),
+        })
+        df_offers = df_offers.sort_values([DF_REQUIRED_INC, OFFER_SCORE], ascending=[True, False], kind='stable')
+        self._df_offers = df_offers.reset_index(drop=True)
+        self._ls_records = self._df_offers.to_dict('records')
+        self._ls_cards = self._df_offers[DF_CARD_NAME].tolist()
+        self._arr_scores = self._df_offers[OFFER_SCORE].to_numpy()
+
+        # The offers best score first, and the rank of each offer in that order. 
+        self._arr_by_score = np.argsort(-self._arr_scores, kind='stable')
+        self._arr_ranks = np.empty(len(self._arr_by_score), dtype=np.intp)
+        self._arr_ranks[self._arr_by_score] = np.arange(len(self._arr_by_score))
+
+        # Income search: the offers open to an income are a prefix of the numbering. 
+        self._ls_incomes = self._df_offers[DF_REQUIRED_INC].tolist()
+        self._ls_bands = sorted(set(self._ls_incomes))
+        arr_band_sizes = np.searchsorted(self._ls_incomes, self._ls_bands, side='right')
+
+        # Bitmaps for the filters. 
+        dict_token_offers = self._group_offers(self._df_offers[OFFER_CATEGORY].map(tokenise_category))
+        self._dict_tokens = self._build_bitmaps(dict_token_offers)
+        self._dict_applicants = self._build_bitmaps(self._group_offers(self._df_offers[DF_REQUIRED_APPLICANT].map(lambda value: [value])))
+        self._dict_card_types = self._build_bitmaps(self._group_offers(self._df_offers[DF_CARD_TYPE].map(lambda value: [value])))
+        self._dict_token_counts = {token: len(arr_idx) for token, arr_idx in dict_token_offers.items()}
+
+        # Materialised views: the best offers of each category word for each income band. 
+        # The offers of a band are the ones numbered below its size. 
+        self._dict_views:Dict[Text, List[List[int]]] = {}
+        for token, arr_idx in dict_token_offers.items():
+            arr_ranked = arr_idx[np.argsort(self._arr_ranks[arr_idx], kind='stable')]
+            self._dict_views[token] = [arr_ranked[arr_ranked < size][:view_size].tolist() for size in arr_band_sizes]
+
+        logger.info(
+            f'Built the query index for ({len(self._df_offers)}) offers, ({len(self._dict_tokens)}) '
+            f'category words and ({len(self._ls_bands)}) income bands.'
+        )
+
+    @staticmethod
+    def _group_offers(sr_keys:pd.Series) -> Dict[Text, np.ndarray]:
+        # Numbers of the offers of each key, in order. 
+        sr_keys = sr_keys.explode()
+        sr_keys = sr_keys[sr_keys.map(lambda key: isinstance(key, str))]
+        arr_offers = sr_keys.index.to_numpy(dtype=np.intp)
+        return {key: arr_offers[arr_pos] for key, arr_pos in sr_keys.groupby(sr_keys.to_numpy(), sort=False).indices.items()}
+
+    def _build_bitmaps(self, dict_offers:Dict[Text, np.ndarray]) -> Dict[Text, int]:
+        # Bit (i) of a bitmap is offer (i), i.e. the mask packed little-endian. 
+        dict_bitmaps:Dict[Text, int] = {}
+        for key, arr_idx in dict_offers.items():
+            arr_mask = np.zeros(len(self._ls_cards), dtype=bool)
+            arr_mask[arr_idx] = True
+            dict_bitmaps[key] = int.from_bytes(np.packbits(arr_mask, bitorder='little').tobytes(), 'little')
+        return dict_bitmaps
+
+    def _income_bitmap(self, income:float) -> int:
+        return (1 << bisect_right(self._ls_incomes, income)) - 1
+
+    def _sorted_offers(self, bitmap:int) -> List[int]:
+        # Offers of the bitmap, best score first, with the bitmap unpacked to a mask. 
+        n_offers = len(self._ls_cards)
+        arr_bytes = np.frombuffer(bitmap.to_bytes((n_offers + 7) // 8, 'little'), dtype=np.uint8)
+        arr_mask = np.unpackbits(arr_bytes, count=n_offers, bitorder='little').astype(bool)
+        return self._arr_by_score[arr_mask[self._arr_by_score]].tolist()
+
+    def _best_per_card(self, ls_idx:List[int], bitmap:int, top_n:int) -> List[int]:
+        # Keep the best offer of each card that passes the bitmap. 
+        ls_top, set_cards = [], set()
+        for idx in ls_idx:
+            if bitmap >> idx & 1 and self._ls_cards[idx] not in set_cards:
+                set_cards.add(self._ls_cards[idx])
+                ls_top.append(idx)
+                if len(ls_top) == top_n:
+                    break
+        return ls_top
+
+    def query(
+            self,
+            category:Text,
+            income:float,
+            applicant:Optional[Text]=None,
+            card_type:Optional[Text]=None,
+            top_n:int=5,
+        ) -> List[Dict]:
+        '''
+        Purpose :
+            Find the best cards for a category that are open to an income.
+
+        Args    :
+            category  : Spending category, e.g. "groceries" or "online shopping".
+            income    : Monthly income of the customer in RM.
+            applicant : Applicant type of the customer, e.g. "Malaysians Only".
+                        Cards open to anybody are always included.
+            card_type : Card type to keep, e.g. "visa".
+            top_n     : Number of cards to return.
+
+        Output  :
+            The best offer of each card (as dict), best first.
+        '''
+
+        ls_tokens = tokenise_category(category)
+        if not ls_tokens or any(token not in self._dict_tokens for token in ls_tokens):
+            return []
+
+        # Bitmap of the offers that pass every filter besides the income. 
+        bitmap = -1
+        for token in ls_tokens:
+            bitmap &= self._dict_tokens[token]
+        if applicant is not None:
+            bitmap &= self._dict_applicants.get(applicant, 0) | self._dict_applicants.get(APPLICANT_ANYBODY, 0)
+        if card_type is not None:
+            bitmap &= self._dict_card_types.get(card_type, 0)
+
+        # Walk the view of the rarest word for the income band of the customer. 
+        idx_band = bisect_right(self._ls_bands, income) - 1
+        if idx_band < 0:
+            return []
+        token = min(ls_tokens, key=self._dict_token_counts.__getitem__)
+        ls_view = self._dict_views[token][idx_band]
+        ls_idx = self._best_per_card(ls_view, bitmap, top_n)
+
+        # Fall back to the bitmap itself if the filters leave too few cards in a full view. 
+        if len(ls_idx) < top_n and len(ls_view) == self.view_size:
+            ls_idx = self._best_per_card(self._sorted_offers(bitmap & self._income_bitmap(income)), -1, top_n)
+
+        return [self._ls_records[idx] for idx in ls_idx]
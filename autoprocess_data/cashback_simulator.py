@@ -0,0 +1,185 @@
+# %%
+import logging
+from typing import Dict, List, Optional, Text
+
+# For data processing and analysis. 
+import numpy as np
+import pandas as pd
+
+# Import personal module. 
+from config.config_logger import setup_logger
+from config.config import ( 
+    LOG_CASHBACK_SIMULATOR_FILEPATH, 
+    DICT_SPENDING_CATEGORY_KEYWORDS, 
+    WEEKEND_SPENDING_SHARE, 
+)
+from config.config_naming import ( 
+    DF_CARD_NAME, 
+    DF_CASHBACK_CAT, 
+    DF_CASHBACK_RATE, 
+    DF_CASHBACK_CAP, 
+    DF_CASHBACK_FROM, 
+    DF_CASHBACK_TILL, 
+    DF_CASHBACK_WEEKENDS_COND, 
+    DF_CASHBACK_MONTHLY_COND, 
+    DF_CASHBACK_SINGLE_RECEIPT_COND, 
+)
+
+
+
+# %%
+# --------------------------------------------------------------
+# Logging configuration 
+# --------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+logger, file_handler, stream_handler = setup_logger(logger, LOG_CASHBACK_SIMULATOR_FILEPATH)
+
+
+
+# %%
+# -------------------------------------------------------
+# Spending categories 
+# -------------------------------------------------------
+
+def match_spending_categories(
+        sr_category:pd.Series,
+        ls_categories:List[Text],
+        dict_keywords:Dict[Text, List[Text]]=DICT_SPENDING_CATEGORY_KEYWORDS,
+    ) -> np.ndarray:
+    '''
+    Purpose :
+        Tie each category of a card to the spending categories it mentions.
+
+    Args    :
+        sr_category   : Category of each row of the cashback (or reward) table.
+        ls_categories : Spending categories, i.e. the columns of the spending matrix.
+        dict_keywords : Words that identify each spending category.
+
+    Output  :
+        A boolean matrix of (rows x spending categories).
+    '''
+
+    sr_category = sr_category.fillna('').astype(str).str.lower()
+    if not ls_categories:
+        return np.zeros((len(sr_category), 0), dtype=bool)
+    return np.column_stack([
+        sr_category.str.contains('|'.join(dict_keywords[category]), regex=True).to_numpy()
+        for category in ls_categories
+    ])
+
+
+
+# %%
+# -------------------------------------------------------
+# Cashback simulator 
+# -------------------------------------------------------
+
+class CashbackSimulator:
+    '''
+    Purpose :
+        Work out the monthly cashback of every card for many spending profiles at
+        once. The cashback table is turned into arrays up front, so a batch of
+        customers is a handful of array operations instead of a loop over cards.
+
+        For each card and spending category, the customer gets the best of the
+        cashback categories that cover it. A cashback category pays the rate on the
+        spending, up to the cap, if the spending falls within the from / till band.
+        The band is checked against the monthly spending on the card for a monthly
+        basis, and against the spending in the category otherwise, e.g. for a single
+        receipt. Weekends only cashback applies to (WEEKEND_SPENDING_SHARE) of the
+        spending.
+
+    Args    :
+        df_cashback   : Processed cashback dataframe (extract_cashback_data).
+        ls_categories : Spending categories. Default to (DICT_SPENDING_CATEGORY_KEYWORDS).
+        dict_keywords : Words that identify each spending category.
+        weekend_share : Share of the spending that happens on weekends.
+
+    Notice  :
+        The cap of a cashback category that covers several spending categories is
+        applied to each of them separately, so such cards are slightly favoured.
+    '''
+
+    def __init__(
+            self,
+            df_cashback:pd.DataFrame,
+            ls_categories:Optional[List[Text]]=None,
+            dict_keywords:Dict[Text, List[Text]]=DICT_SPENDING_CATEGORY_KEYWORDS,
+            weekend_share:float=WEEKEND_SPENDING_SHARE,
+        ):
+        self.ls_categories = list(dict_keywords) if ls_categories is None else ls_categories
+
+        codes, self.card_names = pd.factorize(df_cashback[DF_CARD_NAME])
+        arr_match = match_spending_categories(df_cashback[DF_CASHBACK_CAT], self.ls_categories, dict_keywords)
+        arr_match[codes < 0] = False
+
+        # A row of the cashback table usually covers 1 or 2 spending categories, so only 
+        # keep the (row, category) pairs that match. Sort them by card and category so 
+        # that the rows competing for the same card and category are contiguous. A group 
+        # starts wherever the key changes, none at all if no row matches. 
+        arr_rows, arr_cats = np.nonzero(arr_match)
+        arr_order = np.lexsort((arr_rows, arr_cats, codes[arr_rows]))
+        arr_rows, arr_cats = arr_rows[arr_order], arr_cats[arr_order]
+        arr_keys = codes[arr_rows] * len(self.ls_categories) + arr_cats
+        self._group_starts = np.flatnonzero(np.diff(arr_keys, prepend=-1))
+        arr_group_cards = codes[arr_rows[self._group_starts]]
+        self._card_starts = np.flatnonzero(np.diff(arr_group_cards, prepend=-1))
+        self._cards = arr_group_cards[self._card_starts]
+        self._cats = arr_cats
+
+        # One value per pair, to broadcast over the customers. 
+        def _column(col:Text, fill:float) -> np.ndarray:
+            return pd.to_numeric(df_cashback[col], errors='coerce').fillna(fill).to_numpy(np.float32)[arr_rows]
+
+        def _flag(col:Text) -> np.ndarray:
+            return df_cashback[col].astype('boolean').fillna(False).to_numpy(bool)[arr_rows]
+
+        self._rate = _column(DF_CASHBACK_RATE, 0) / 100
+        self._cap = _column(DF_CASHBACK_CAP, np.inf)
+        self._from = _column(DF_CASHBACK_FROM, 0)
+        self._till = _column(DF_CASHBACK_TILL, np.inf)
+        self._monthly = _flag(DF_CASHBACK_MONTHLY_COND) & ~_flag(DF_CASHBACK_SINGLE_RECEIPT_COND)
+        self._share = np.where(_flag(DF_CASHBACK_WEEKENDS_COND), weekend_share, 1).astype(np.float32)
+
+        logger.info(f'Built the cashback simulator for ({len(self.card_names)}) cards and ({len(df_cashback)}) categories.')
+
+    def payout(self, spending:np.ndarray, chunk_size:int=10_000) -> np.ndarray:
+        '''
+        Purpose :
+            Work out the monthly cashback of every card for each spending profile.
+
+        Args    :
+            spending   : Monthly spending in RM of shape (customers x spending categories).
+            chunk_size : Number of customers per batch, to bound the memory used.
+
+        Output  :
+            Monthly cashback in RM of shape (customers x cards), with the cards in
+            the order of (card_names).
+        '''
+
+        spending = np.asarray(spending, dtype=np.float32)
+        if spending.ndim != 2 or spending.shape[1] != len(self.ls_categories):
+            raise ValueError(f'Expected a spending matrix with ({len(self.ls_categories)}) columns, got ({spending.shape}).')
+
+        # No cashback category covers any of the spending categories. 
+        arr_payout = np.zeros((len(spending), len(self.card_names)), dtype=np.float32)
+        if not len(self._group_starts):
+            return arr_payout
+
+        for start in range(0, len(spending), chunk_size):
+            arr_spending = spending[start:start + chunk_size]
+
+            # Spending covered by each pair: (customers, pairs). 
+            arr_covered = arr_spending[:, self._cats]
+            arr_total = arr_spending.sum(axis=1, keepdims=True)
+            arr_benchmark = np.where(self._monthly, arr_total, arr_covered)
+            arr_eligible = (arr_benchmark >= self._from) & (arr_benchmark <= self._till)
+
+            arr_cashback = np.minimum(arr_covered * self._share * self._rate, self._cap) * arr_eligible
+
+            # Best row of each card for each category, then add up the categories. 
+            arr_best = np.maximum.reduceat(arr_cashback, self._group_starts, axis=1)
+            arr_payout[start:start + chunk_size, self._cards] = np.add.reduceat(arr_best, self._card_starts, axis=1)
+
+        return arr_payout
@@ -0,0 +1,121 @@
+# %%
+import logging
+from typing import Dict, List, Optional, Text, Tuple
+
+# For data processing and analysis. 
+import json
+import pandas as pd 
+
+# Import personal module. 
+from config.config_logger import setup_logger
+from config.config import LOG_CATEGORY_EXPLODE_FILEPATH
+from config.config_naming import (
+    DF_IMG, 
+    DF_BANK, 
+    DF_CARD_NAME, 
+    DF_CARD_TYPE, 
+    DF_REQUIRED_INC, 
+    DF_REQUIRED_APPLICANT, 
+    DF_REWARD_CAT, 
+    DF_REWARD_POINTS, 
+    DF_CASHBACK_CAT, 
+    DF_CASHBACK_RATE, 
+    DF_CASHBACK_CAP, 
+    DF_CASHBACK_BENCHMARK, 
+    DF_TRAVEL_BENEFIT_CAT, 
+    DF_TRAVEL_BENEFIT_DETAIL, 
+    DF_PREMIUM_CAT, 
+    DF_PREMIUM_DETAIL, 
+    DF_PETROL_CAT, 
+    DF_PETROL_DETAIL, 
+)
+
+
+
+# %%
+# --------------------------------------------------------------
+# Logging configuration 
+# --------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+logger, file_handler, stream_handler = setup_logger(logger, LOG_CATEGORY_EXPLODE_FILEPATH) 
+
+
+
+# %%
+# -------------------------------------------------------
+# Category explode engine
+# -------------------------------------------------------
+
+# Card metadata carried over to every exploded row. 
+LS_CARD_META_COLS = [DF_IMG, DF_BANK, DF_CARD_NAME, DF_CARD_TYPE, DF_REQUIRED_INC, DF_REQUIRED_APPLICANT]
+
+# How each category column is laid out once exploded. The JSON is a dict of 
+# {first cell: [other cells, ...]} for each table row, so the key goes to the 
+# first column and the cells go to the value columns in order. 
+#   Reward   : {"RM1 = 1 point": ["Local spend"], ...} 
+#   Cashback : {"Groceries": ["5%", "RM15", "with monthly spend from RM1,000"], ...} 
+DICT_CATEGORY_LAYOUTS:Dict[Text, Tuple[Text, List[Text]]] = {
+    DF_REWARD_CAT: (DF_REWARD_POINTS, [DF_REWARD_CAT]), 
+    DF_CASHBACK_CAT: (DF_CASHBACK_CAT, [DF_CASHBACK_RATE, DF_CASHBACK_CAP, DF_CASHBACK_BENCHMARK]), 
+    DF_TRAVEL_BENEFIT_CAT: (DF_TRAVEL_BENEFIT_CAT, [DF_TRAVEL_BENEFIT_DETAIL]), 
+    DF_PREMIUM_CAT: (DF_PREMIUM_CAT, [DF_PREMIUM_DETAIL]), 
+    DF_PETROL_CAT: (DF_PETROL_CAT, [DF_PETROL_DETAIL]), 
+}
+
+
+def _parse_category_json(sr_json:pd.Series) -> pd.Series: 
+    # Parse each distinct JSON string once, as many cards (and historical 
+    # snapshots of the same card) share the exact same table. 
+    dict_parsed = {value: list(json.loads(value).items()) for value in sr_json.unique()}
+    return sr_json.map(dict_parsed)
+
+
+def explode_category_column(
+        df_main:pd.DataFrame, 
+        col:Text, 
+        ls_meta_cols:Optional[List[Text]]=None, 
+    ) -> pd.DataFrame: 
+    '''
+    Purpose : 
+        Explode a category column so that each table row of each card becomes 
+        a row of its own. The JSON is parsed once per distinct value and the 
+        card metadata is joined on the index rather than copied row by row. 
+
+    Args    : 
+        df_main      : Credit card dataframe. 
+        col          : Category column to explode, one of (DICT_CATEGORY_LAYOUTS). 
+        ls_meta_cols : Card columns to carry over. Default to (LS_CARD_META_COLS). 
+
+    Output  :
+        DataFrame with the card columns followed by the key and value columns of 
+        the category. Cards without the category are left out. 
+    '''
+
+    key_col, ls_value_cols = DICT_CATEGORY_LAYOUTS[col]
+    ls_meta_cols = LS_CARD_META_COLS if ls_meta_cols is None else ls_meta_cols
+    ls_cols = [*ls_meta_cols, key_col, *ls_value_cols]
+
+    # Ignore the cards without the category (NaN). 
+    if col not in df_main: 
+        return pd.DataFrame(columns=ls_cols)
+    df_main = df_main.reset_index(drop=True)
+    sr_json = df_main[col].dropna()
+    sr_json = sr_json[sr_json.map(type) == str]
+
+    # One row per (key, cells) pair, indexed by the position of its card. 
+    sr_items = _parse_category_json(sr_json).explode().dropna()
+    if sr_items.empty: 
+        return pd.DataFrame(columns=ls_cols)
+
+    ls_keys, ls_cells = zip(*sr_items.tolist())
+    df_values = pd.DataFrame(
+        [cells if isinstance(cells, list) else [cells] for cells in ls_cells], 
+        index=sr_items.index, 
+    ).reindex(columns=range(len(ls_value_cols)))
+    df_values.columns = ls_value_cols
+    df_values.insert(0, key_col, ls_keys)
+
+    df_exploded = df_values.join(df_main[ls_meta_cols], how='left').reset_index(drop=True)
+    logger.info(f'Exploded ({col}) from ({len(sr_json)}) cards into ({len(df_exploded)}) rows.') 
+    return df_exploded[ls_cols]
@@ -0,0 +1,247 @@
+# %%
+import logging
+import os
+from typing import Dict, List, Optional, Text
+
+# For data processing and analysis. 
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Import personal module. 
+from config.config_logger import setup_logger
+from config.config import ( 
+    LOG_COLUMNAR_STORAGE_FILEPATH, 
+    SAVE_CSV, 
+)
+from config.config_naming import ( 
+    DF_URL, 
+    DF_IMG, 
+    DF_IMG_PATH, 
+    DF_IMG_THUMBNAIL_PATH, 
+    DF_LISTING_FINGERPRINT, 
+    DF_SCRAPED_AT, 
+    DF_BANK, 
+    DF_CARD_NAME, 
+    DF_CARD_NAME_ORIGINAL, 
+    DF_CARD_TYPE, 
+    DF_CARD_FEATURE, 
+    DF_CARD_BENEFIT, 
+    DF_COST_CARD_INT_RATE, 
+    DF_COST_FEE, 
+    DF_COST_FEE_COND, 
+    DF_REQUIRED_INC, 
+    DF_REQUIRED_AGE, 
+    DF_REQUIRED_APPLICANT, 
+    DF_CASHBACK, 
+    DF_CASHBACK_CAT, 
+    DF_CASHBACK_INFO, 
+    DF_CASHBACK_RATE, 
+    DF_CASHBACK_CAP, 
+    DF_CASHBACK_BENCHMARK, 
+    DF_CASHBACK_FROM, 
+    DF_CASHBACK_TILL, 
+    DF_CASHBACK_WEEKENDS_COND, 
+    DF_CASHBACK_MONTHLY_COND, 
+    DF_CASHBACK_SINGLE_RECEIPT_COND, 
+    DF_CASHBACK_UNCAPPED_COND, 
+    DF_REWARD, 
+    DF_REWARD_CAT, 
+    DF_REWARD_INFO, 
+    DF_REWARD_POINTS, 
+    DF_EACH_SPENDING, 
+    DF_TRAVEL_BENEFIT, 
+    DF_TRAVEL_BENEFIT_CAT, 
+    DF_TRAVEL_BENEFIT_INFO, 
+    DF_PREMIUM, 
+    DF_PREMIUM_INFO, 
+    DF_PETROL, 
+    DF_PETROL_INFO, 
+)
+
+
+
+# %%
+# --------------------------------------------------------------
+# Logging configuration 
+# --------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+logger, file_handler, stream_handler = setup_logger(logger, LOG_COLUMNAR_STORAGE_FILEPATH)
+
+
+
+# %%
+# -------------------------------------------------------
+# Schema 
+# -------------------------------------------------------
+
+# Tables kept in the columnar store. 
+TABLE_CARD = 'card'
+TABLE_CASHBACK = 'cashback'
+TABLE_REWARD_POINTS = 'reward_points'
+
+# Logical types, following the "Dtype" of the data dictionary (docs/data_dictionary). 
+# Low cardinality text is dictionary encoded as "category". 
+DICT_ARROW_TYPES = {
+    'str': pa.string(),
+    'category': pa.dictionary(pa.int32(), pa.string()),
+    'float': pa.float64(),
+    'bool': pa.bool_(),
+}
+
+# Card metadata shared by every table. 
+_DICT_CARD_META_TYPES = {
+    DF_IMG: 'str',
+    DF_BANK: 'category',
+    DF_CARD_NAME: 'str',
+    DF_CARD_TYPE: 'category',
+    DF_REQUIRED_INC: 'float',
+    DF_REQUIRED_APPLICANT: 'category',
+}
+
+# The data dictionary lists the cap, points and spending as "int", but they are 
+# kept as float since a parsed amount can be fractional or missing. 
+DICT_TABLE_SCHEMAS:Dict[Text, Dict[Text, Text]] = {
+    TABLE_CARD: {
+        DF_URL: 'str',
+        **_DICT_CARD_META_TYPES,
+        DF_IMG_PATH: 'str',
+        DF_IMG_THUMBNAIL_PATH: 'str',
+        DF_LISTING_FINGERPRINT: 'str',
+        DF_SCRAPED_AT: 'str',
+        DF_CARD_NAME_ORIGINAL: 'str',
+        DF_CARD_FEATURE: 'str',
+        DF_CARD_BENEFIT: 'str',
+        DF_COST_CARD_INT_RATE: 'str',
+        DF_COST_FEE: 'str',
+        DF_COST_FEE_COND: 'category',
+        DF_REQUIRED_AGE: 'str',
+        DF_CASHBACK: 'bool',
+        DF_CASHBACK_CAT: 'str',
+        DF_CASHBACK_INFO: 'str',
+        DF_REWARD: 'bool',
+        DF_REWARD_CAT: 'str',
+        DF_REWARD_INFO: 'str',
+        DF_TRAVEL_BENEFIT: 'bool',
+        DF_TRAVEL_BENEFIT_CAT: 'str',
+        DF_TRAVEL_BENEFIT_INFO: 'str',
+        DF_PREMIUM: 'bool',
+        DF_PREMIUM_INFO: 'str',
+        DF_PETROL: 'bool',
+        DF_PETROL_INFO: 'str',
+    },
+    TABLE_CASHBACK: {
+        **_DICT_CARD_META_TYPES,
+        DF_CASHBACK_RATE: 'float',
+        DF_CASHBACK_CAP: 'float',
+        DF_CASHBACK_BENCHMARK: 'str',
+        DF_CASHBACK_CAT: 'category',
+        DF_CASHBACK_FROM: 'float',
+        DF_CASHBACK_TILL: 'float',
+        DF_CASHBACK_WEEKENDS_COND: 'bool',
+        DF_CASHBACK_MONTHLY_COND: 'bool',
+        DF_CASHBACK_SINGLE_RECEIPT_COND: 'bool',
+        DF_CASHBACK_UNCAPPED_COND: 'bool',
+    },
+    TABLE_REWARD_POINTS: {
+        **_DICT_CARD_META_TYPES,
+        DF_REWARD_POINTS: 'float',
+        DF_REWARD_CAT: 'category',
+        DF_EACH_SPENDING: 'float',
+    },
+}
+
+
+def _coerce_column(sr:pd.Series, logical_type:Text) -> pd.Series:
+    # The scraper writes the flags as "True" / "False" text. 
+    if logical_type == 'bool':
+        return sr.map({'True': True, 'False': False, True: True, False: False}).astype('boolean')
+    if logical_type == 'float':
+        return pd.to_numeric(sr, errors='coerce').astype('float64')
+
+    # A text column read back from a CSV may have been parsed as numbers. 
+    sr = sr.map(str, na_action='ignore').astype(object)
+    return sr.astype('category') if logical_type == 'category' else sr
+
+
+def build_schema(df_main:pd.DataFrame, table:Text) -> pa.Schema:
+    '''
+    Purpose :
+        Build the Arrow schema of a table. A column that isn't part of the table
+        schema (e.g. "premium_category") keeps the type inferred from the data.
+
+    Args    :
+        df_main : Dataframe to store.
+        table   : Name of the table, one of (DICT_TABLE_SCHEMAS).
+
+    Output  :
+        The Arrow schema with the columns in the order of the dataframe.
+    '''
+
+    dict_types = DICT_TABLE_SCHEMAS[table]
+    schema_inferred = pa.Schema.from_pandas(df_main, preserve_index=False)
+    return pa.schema([
+        pa.field(col, DICT_ARROW_TYPES[dict_types[col]] if col in dict_types else schema_inferred.field(col).type)
+        for col in df_main.columns
+    ])
+
+
+
+# %%
+# -------------------------------------------------------
+# Storage 
+# -------------------------------------------------------
+
+def save_table(
+        df_main:pd.DataFrame,
+        table:Text,
+        parquet_filepath:Text,
+        csv_filepath:Optional[Text]=None,
+    ) -> None:
+    '''
+    Purpose :
+        Save a table as Parquet with its explicit schema, and as CSV as well if
+        (SAVE_CSV) is on.
+
+    Args    :
+        df_main          : Dataframe to store.
+        table            : Name of the table, one of (DICT_TABLE_SCHEMAS).
+        parquet_filepath : Path to the Parquet file.
+        csv_filepath     : Path to the CSV file.
+    '''
+
+    dict_types = DICT_TABLE_SCHEMAS[table]
+    df_main = df_main.reset_index(drop=True)
+    df_typed = df_main.assign(**{
+        col: _coerce_column(df_main[col], dict_types[col]) for col in df_main.columns if col in dict_types
+    })
+
+    os.makedirs(os.path.dirname(parquet_filepath), exist_ok=True)
+    arrow_table = pa.Table.from_pandas(df_typed, schema=build_schema(df_typed, table), preserve_index=False)
+    pq.write_table(arrow_table, parquet_filepath)
+    logger.info(f'Saved the ({table}) table with ({len(df_typed)}) rows to ({parquet_filepath}).')
+
+    if SAVE_CSV and csv_filepath is not None:
+        df_main.to_csv(csv_filepath, index=False)
+
+
+def load_table(
+        filepath:Text,
+        columns:Optional[List[Text]]=None,
+        filters:Optional[List]=None,
+    ) -> pd.DataFrame:
+    '''
+    Purpose :
+        Load a table from the columnar store. Only the columns asked for are read.
+
+    Args    :
+        filepath : Path to the Parquet file.
+        columns  : Columns to read. Default to every column.
+        filters  : Row filters pushed down to the reader, e.g. [("bank", "==", "maybank")].
+
+    Output  :
+        The dataframe. Dictionary encoded columns come back as "category".
+    '''
+
+    return pd.read_parquet(filepath, columns=columns, filters=filters)
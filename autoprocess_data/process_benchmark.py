@@ -0,0 +1,305 @@
+# %%
+import logging
+import datetime as dt
+import gc, json, os, platform, random, resource, subprocess, sys, time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Text
+
+# For data processing and analysis. 
+import numpy as np
+import pandas as pd
+
+# Import personal module. 
+from autoprocess_data.category_explode import LS_CARD_META_COLS
+from config.config_logger import setup_logger
+from config.config import ( 
+    LOG_PROCESS_BENCHMARK_FILEPATH, 
+    CARD_DF_FILEPATH, 
+    PROCESS_BENCHMARK_SIZES, 
+    PROCESS_BENCHMARK_TIME_BUDGET, 
+    PROCESS_BENCHMARK_FILEPATH, 
+)
+from config.config_naming import ( 
+    DF_CARD_NAME, 
+    DF_CASHBACK, 
+    DF_CASHBACK_CAT, 
+    DF_REWARD, 
+    DF_REWARD_CAT, 
+)
+
+
+
+# %%
+# --------------------------------------------------------------
+# Logging configuration 
+# --------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+logger, file_handler, stream_handler = setup_logger(logger, LOG_PROCESS_BENCHMARK_FILEPATH)
+
+
+
+# %%
+# -------------------------------------------------------
+# Synthetic card data 
+# -------------------------------------------------------
+
+# Cashback terms to vary the real categories with, so the payloads don't repeat. 
+LS_SYNTHETIC_CASHBACK_RATES = ['0.2%', '0.5%', '1%', '2%', '5%', '8%', '10%', '15%']
+LS_SYNTHETIC_CASHBACK_CAPS = ['RM10', 'RM15', 'RM30', 'RM50', 'RM100', 'Unlimited']
+LS_SYNTHETIC_REWARD_POINTS = ['1 point on every RM1', '1 point on every RM2', '2 points on every RM1', '5 points on every RM1', '8x points on every RM1']
+
+
+def generate_card_data(
+        rows:int,
+        seed:int=0,
+        filepath:Text=CARD_DF_FILEPATH,
+    ) -> pd.DataFrame:
+    '''
+    Purpose :
+        Generate a synthetic card dataframe of any size from the scraped one. The
+        card metadata is drawn from the real cards, and each "*_category" payload
+        is a fresh JSON object of 1 to 4 real categories (or as many as there are),
+        with the cashback rate, cap and reward points drawn at random so the
+        payloads rarely repeat.
+
+    Args    :
+        rows     : Number of cards.
+        seed     : Seed for the random draws.
+        filepath : Path to the scraped card dataframe to draw from.
+
+    Output  :
+        A card dataframe with the columns read by the processing stage.
+    '''
+
+    rng = np.random.default_rng(seed)
+    df_card = pd.read_csv(filepath)
+
+    # Pools of real (category, values) pairs. 
+    ls_cashback = [
+        (key, values) for payload in df_card[DF_CASHBACK_CAT].dropna()
+        for key, values in json.loads(payload).items()
+    ]
+    ls_reward = [
+        (key, values) for payload in df_card[DF_REWARD_CAT].dropna()
+        for key, values in json.loads(payload).items()
+    ]
+
+    # Python's random is much faster than numpy for one small draw at a time. 
+    rng_payload = random.Random(seed)
+
+    def _cashback_payload() -> Text:
+        return json.dumps({
+            key: [rng_payload.choice(LS_SYNTHETIC_CASHBACK_RATES), rng_payload.choice(LS_SYNTHETIC_CASHBACK_CAPS), values[2]]
+            for key, values in rng_payload.sample(ls_cashback, rng_payload.randint(1, min(4, len(ls_cashback))))
+        })
+
+    def _reward_payload() -> Text:
+        return json.dumps({
+            rng_payload.choice(LS_SYNTHETIC_REWARD_POINTS): values
+            for _, values in rng_payload.sample(ls_reward, rng_payload.randint(1, min(4, len(ls_reward))))
+        })
+
+    df_main = df_card[LS_CARD_META_COLS].iloc[rng.integers(0, len(df_card), size=rows)].reset_index(drop=True)
+    df_main[DF_CARD_NAME] = [f'synthetic_card_{index}' for index in range(rows)]
+
+    # Keep the real share of cards with cashback and reward points. 
+    arr_cashback = rng.random(rows) < df_card[DF_CASHBACK_CAT].notnull().mean()
+    arr_reward = rng.random(rows) < df_card[DF_REWARD_CAT].notnull().mean()
+    df_main[DF_CASHBACK] = np.where(arr_cashback, 'True', 'False')
+    df_main[DF_CASHBACK_CAT] = [_cashback_payload() if flag else np.nan for flag in arr_cashback]
+    df_main[DF_REWARD] = np.where(arr_reward, 'True', 'False')
+    df_main[DF_REWARD_CAT] = [_reward_payload() if flag else np.nan for flag in arr_reward]
+
+    return df_main
+
+
+
+# %%
+# -------------------------------------------------------
+# Benchmark 
+# -------------------------------------------------------
+
+# Processing steps to time. 
+STEP_REWARD_POINTS = 'extract_reward_points_data'
+STEP_CASHBACK = 'extract_cashback_data'
+LS_PROCESS_STEPS = [STEP_REWARD_POINTS, STEP_CASHBACK]
+
+
+def _rss_mb(field:Text) -> Optional[float]:
+    # Read the current (VmRSS) or peak (VmHWM) RSS of this process, on Linux only. 
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+
+
+def _reset_peak_rss() -> bool:
+    # Linux lets a process reset its own peak RSS, so the peak only covers the step. 
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _benchmark_step(step:Text, rows:int, seed:int) -> Dict:
+    '''
+    Purpose :
+        Time a processing step on a synthetic card dataframe. Runs in a process
+        of its own, so the memory of the step isn't mixed up with the other runs.
+    '''
+
+    # Imported here so that the parent process doesn't need the pipeline dependencies. 
+    from autoprocess_data import process_card_data
+
+    df_card = generate_card_data(rows, seed)
+    func = getattr(process_card_data, step)
+    gc.collect()
+
+    peak_resettable = _reset_peak_rss()
+    rss_before = _rss_mb('VmRSS')
+    start = time.perf_counter()
+    df_result = func.run(df_card, save=False)
+    seconds = time.perf_counter() - start
+
+    # Without /proc, fall back to the peak of the whole process. 
+    peak_rss = _rss_mb('VmHWM') if peak_resettable else None
+    if peak_rss is None:
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+
+    return {
+        'step': step,
+        'rows': rows,
+        'status': 'ok' if df_result is not None else 'failed',
+        'output_rows': len(df_result) if df_result is not None else None,
+        'seconds': seconds,
+        'rows_per_s': rows / seconds,
+        'peak_rss_mb': peak_rss,
+        'peak_rss_delta_mb': peak_rss - rss_before if rss_before is not None else None,
+    }
+
+
+def _git_commit() -> Optional[Text]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_process_benchmark(
+        ls_sizes:List[int]=PROCESS_BENCHMARK_SIZES,
+        ls_steps:List[Text]=LS_PROCESS_STEPS,
+        time_budget:float=PROCESS_BENCHMARK_TIME_BUDGET,
+        seed:int=0,
+        filepath:Optional[Text]=PROCESS_BENCHMARK_FILEPATH,
+    ) -> pd.DataFrame:
+    '''
+    Purpose :
+        Time each processing step on synthetic card dataframes of growing size, and
+        append the results to the results file, tagged with the commit, so that the
+        runs can be compared across commits.
+
+    Args    :
+        ls_sizes    : Number of cards to try, from the smallest.
+        ls_steps    : Processing steps to time.
+        time_budget : Seconds a step may take. Once over it, or once it fails, the
+                      larger sizes are skipped for that step.
+        seed        : Seed for the synthetic data, so every run times the same data.
+        filepath    : Path to the results file (JSON). Nothing is saved if None.
+
+    Output  :
+        One row per step and size with the status, the wall time, the rows per
+        second and the peak RSS in MB during the step (and its growth over the
+        RSS before the step).
+
+    Notice  :
+        The steps run without saving the tables. A step that runs out of memory
+        kills its process and is recorded as "crashed".
+    '''
+
+    ls_rows = []
+    context = multiprocessing.get_context('spawn')
+
+    for step in ls_steps:
+        for rows in sorted(ls_sizes):
+            try:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    dict_row = executor.submit(_benchmark_step, step, rows, seed).result()
+            except BrokenProcessPool:
+                dict_row = {'step': step, 'rows': rows, 'status': 'crashed'}
+            except Exception as error:
+                dict_row = {'step': step, 'rows': rows, 'status': 'failed', 'error': repr(error)}
+
+            logger.info(f'({step}) x ({rows}) rows: {dict_row}')
+            ls_rows.append(dict_row)
+
+            # Find where the step falls over without waiting on the larger sizes. 
+            if dict_row['status'] != 'ok' or dict_row['seconds'] > time_budget:
+                logger.warning(f'Skipped the larger sizes for ({step}) after ({rows}) rows.')
+                break
+
+    df_results = pd.DataFrame(ls_rows)
+
+    if filepath is not None:
+        ls_runs = []
+        if os.path.exists(filepath):
+            with open(filepath) as f:
+                ls_runs = json.load(f)
+
+        ls_runs.append({
+            'timestamp': dt.datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'results': json.loads(df_results.to_json(orient='records')),
+        })
+
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'w') as f:
+            json.dump(ls_runs, f, indent=2)
+        logger.info(f'Saved the results to ({filepath}).')
+
+    return df_results
+
+
+def load_process_benchmark(filepath:Text=PROCESS_BENCHMARK_FILEPATH) -> pd.DataFrame:
+    '''
+    Purpose :
+        Load every run of the results file as one dataframe, e.g. to compare commits with
+        df.pivot_table(index=['step', 'rows'], columns='commit', values='rows_per_s').
+    '''
+
+    with open(filepath) as f:
+        ls_runs = json.load(f)
+
+    return pd.DataFrame([
+        {**{key: value for key, value in run.items() if key != 'results'}, **result}
+        for run in ls_runs for result in run['results']
+    ])
+
+
+
+# %%
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark the processing stage on synthetic card data.')
+    parser.add_argument('--sizes', nargs='+', type=int, default=PROCESS_BENCHMARK_SIZES)
+    parser.add_argument('--steps', nargs='+', default=LS_PROCESS_STEPS, choices=LS_PROCESS_STEPS)
+    parser.add_argument('--time-budget', type=float, default=PROCESS_BENCHMARK_TIME_BUDGET)
+    parser.add_argument('--output', default=PROCESS_BENCHMARK_FILEPATH)
+    args = parser.parse_args()
+
+    df_results = run_process_benchmark(args.sizes, args.steps, args.time_budget, filepath=args.output)
+    print(df_results.to_string(index=False, float_format='{:.2f}'.format))
@@ -1,33 +1,30 @@
 # %%
 import logging
-import datetime as dt
-
-# For building data pipeline. 
-from prefect import task
-from prefect.engine.results import LocalResult
+from typing import List, Text
 
 # For data processing and analysis. 
-import json
 import pandas as pd 
 
 # Import personal module. 
+from autoprocess_data.category_explode import LS_CARD_META_COLS, explode_category_column
+from autoprocess_data.benchmark_parser import parse_cashback_columns
+from autoprocess_data.columnar_storage import TABLE_CASHBACK, TABLE_REWARD_POINTS, save_table
 from config.config_logger import setup_logger
+from config.config_task_cache import lazy_task, task_target
+from config.config_metrics import traced
 from config.config import (
     LOG_PROCESS_CARD_DATA_FILEPATH, 
     CASHBACK_DF_FILEPATH, 
+    CASHBACK_PARQUET_FILEPATH, 
     CASHBACK_SAVE_DIR, 
     INCLUDED_QUALIFIED_APPLICANTS, 
     REWARD_POINTS_DF_FILEPATH, 
+    REWARD_POINTS_PARQUET_FILEPATH, 
     REWARD_POINTS_SAVE_DIR, 
 )
 from config.config_naming import (
     DF_REWARD_CAT, 
-    DF_IMG, 
-    DF_BANK, 
-    DF_CARD_NAME, 
-    DF_CARD_TYPE, 
     DF_REWARD_POINTS, 
-    DF_REQUIRED_INC, 
     DF_REQUIRED_APPLICANT, 
     DF_EACH_SPENDING, 
     DF_CASHBACK_RATE, 
@@ -36,9 +33,6 @@ from config.config_naming import (
     DF_CASHBACK_CAT, 
     DF_CASHBACK_FROM, 
     DF_CASHBACK_TILL, 
-    DF_CASHBACK_WEEKENDS_COND, 
-    DF_CASHBACK_MONTHLY_COND, 
-    DF_CASHBACK_SINGLE_RECEIPT_COND, 
 )
 
 
@@ -58,55 +52,27 @@ logger, file_handler, stream_handler = setup_logger(logger, LOG_PROCESS_CARD_DAT
 # Data processing for card (reward points)
 # -------------------------------------------------------
 
-@task(
-    cache_for=dt.timedelta(days=1), 
-    result=LocalResult(dir="result_config"), 
-    checkpoint=True, 
-    target="{task_name}–{date}", 
+@lazy_task(
+    target=task_target(
+        ls_inputs=['df_main', 'save'], 
+        ls_config=['INCLUDED_QUALIFIED_APPLICANTS', 'DF_REWARD_POINTS_VERSION', 'PIPELINE_VERSION'], 
+        ls_code=['autoprocess_data.process_card_data', 'autoprocess_data.category_explode'], 
+    ), 
 )
-def extract_reward_points_data(df_main:pd.DataFrame) -> pd.DataFrame: 
+@traced('task.extract_reward_points_data')
+def extract_reward_points_data(df_main:pd.DataFrame, save:bool=True) -> pd.DataFrame: 
     '''
     Purpose : 
         Extract the reward points for credit cards. 
 
     Args    : 
         df_main : Credit card dataframe. 
+        save    : Save the dataframe to the reward points directory. 
 
     Output  :
         DataFrame with the reward points for each category. 
     '''
 
-    def _extract_data_from_json(row):
-        # If the category column is NaN, ignore this row. 
-        if isinstance(row[DF_REWARD_CAT], float): 
-            return row 
-
-        # Extract the points and category from "reward_category" column. 
-        dict_data = json.loads(row[DF_REWARD_CAT])  
-        for points, category in dict_data.items(): 
-            dict_reward_points_data[DF_IMG].append(row[DF_IMG])
-            dict_reward_points_data[DF_BANK].append(row[DF_BANK])
-            dict_reward_points_data[DF_CARD_NAME].append(row[DF_CARD_NAME])
-            dict_reward_points_data[DF_CARD_TYPE].append(row[DF_CARD_TYPE])
-            dict_reward_points_data[DF_REQUIRED_INC].append(row[DF_REQUIRED_INC])
-            dict_reward_points_data[DF_REQUIRED_APPLICANT].append(row[DF_REQUIRED_APPLICANT])
-            dict_reward_points_data[DF_REWARD_POINTS].append(points)
-            dict_reward_points_data[DF_REWARD_CAT].append(category[0])
-            logger.debug(f'----- Appended to list for reward data -- Category ({category}) -- Points ({points})') 
-        return row
-
-    # Prepare the variable. 
-    dict_reward_points_data = {
-        DF_IMG: [], 
-        DF_BANK: [],
-        DF_CARD_NAME: [],
-        DF_CARD_TYPE: [],
-        DF_REQUIRED_INC: [],
-        DF_REQUIRED_APPLICANT: [],
-        DF_REWARD_POINTS: [],
-        DF_REWARD_CAT: [], 
-    }
-
     try: 
         logger.info('Start extracting the reward points data!') 
 
@@ -116,8 +82,7 @@ def extract_reward_points_data(df_main:pd.DataFrame) -> pd.DataFrame:
         logger.debug('----- Filtered the dataframe.') 
 
         # Extract data from the "reward_category" column. 
-        _ = df_main.apply(_extract_data_from_json, axis=1) 
-        df_extracted_data = pd.DataFrame(dict_reward_points_data) 
+        df_extracted_data = explode_category_column(df_main, DF_REWARD_CAT) 
         logger.debug('----- Extracted the reward points data.') 
         
         # Extract string. 
@@ -140,8 +105,9 @@ def extract_reward_points_data(df_main:pd.DataFrame) -> pd.DataFrame:
         logger.debug('----- Transformed the dtypes for reward points and each spending values.') 
 
         # Save the dataframe. 
-        df_extracted_data.to_csv(REWARD_POINTS_DF_FILEPATH) 
-        logger.info(f'Saved the dataframe to ({REWARD_POINTS_SAVE_DIR}) directory')
+        if save: 
+            save_table(df_extracted_data, TABLE_REWARD_POINTS, REWARD_POINTS_PARQUET_FILEPATH, REWARD_POINTS_DF_FILEPATH) 
+            logger.info(f'Saved the dataframe to ({REWARD_POINTS_SAVE_DIR}) directory')
         return df_extracted_data 
     
     except Exception: 
@@ -154,59 +120,27 @@ def extract_reward_points_data(df_main:pd.DataFrame) -> pd.DataFrame:
 # Data processing for card (cashback) 
 # -------------------------------------------------------
 
-@task(
-    cache_for=dt.timedelta(days=1), 
-    result=LocalResult(dir="result_config"), 
-    checkpoint=True, 
-    target="{task_name}–{date}", 
+@lazy_task(
+    target=task_target(
+        ls_inputs=['df_main', 'save'], 
+        ls_config=['INCLUDED_QUALIFIED_APPLICANTS', 'DF_CASHBACK_VERSION', 'PIPELINE_VERSION'], 
+        ls_code=['autoprocess_data.process_card_data', 'autoprocess_data.category_explode', 'autoprocess_data.benchmark_parser'], 
+    ), 
 )
-def extract_cashback_data(df_main:pd.DataFrame) -> pd.DataFrame:
+@traced('task.extract_cashback_data')
+def extract_cashback_data(df_main:pd.DataFrame, save:bool=True) -> pd.DataFrame:
     '''
     Purpose : 
         Extract the cashback for credit cards. 
 
     Args    : 
         df_main : Credit card dataframe. 
+        save    : Save the dataframe to the cashback directory. 
 
     Output  :
         DataFrame with the cashback for each category. 
     '''
 
-    def _extract_data_from_json(row):
-        # If the category column is NaN, ignore this row. 
-        if isinstance(row[DF_CASHBACK_CAT], float): 
-            return row 
-
-        # Extract the points and category from "cashback_category" column. 
-        dict_data = json.loads(row[DF_CASHBACK_CAT]) 
-        for category, cashback in dict_data.items():
-            dict_cashback_data[DF_IMG].append(row[DF_IMG])
-            dict_cashback_data[DF_BANK].append(row[DF_BANK])
-            dict_cashback_data[DF_CARD_NAME].append(row[DF_CARD_NAME])
-            dict_cashback_data[DF_CARD_TYPE].append(row[DF_CARD_TYPE])
-            dict_cashback_data[DF_REQUIRED_INC].append(row[DF_REQUIRED_INC])
-            dict_cashback_data[DF_REQUIRED_APPLICANT].append(row[DF_REQUIRED_APPLICANT])
-            dict_cashback_data[DF_CASHBACK_RATE].append(cashback[0])
-            dict_cashback_data[DF_CASHBACK_CAP].append(cashback[1])
-            dict_cashback_data[DF_CASHBACK_BENCHMARK].append(cashback[2])
-            dict_cashback_data[DF_CASHBACK_CAT].append(category)
-            logger.debug(f'----- Appended to list for cashback data -- Category ({category}) -- Cashback ({cashback})') 
-        return row 
-
-    # Prepare the variable. 
-    dict_cashback_data = {
-        DF_IMG: [], 
-        DF_BANK: [],
-        DF_CARD_NAME: [],
-        DF_CARD_TYPE: [],
-        DF_REQUIRED_INC: [],
-        DF_REQUIRED_APPLICANT: [],
-        DF_CASHBACK_RATE: [],
-        DF_CASHBACK_CAP: [], 
-        DF_CASHBACK_BENCHMARK: [], 
-        DF_CASHBACK_CAT: [], 
-    }
-
     try: 
         logger.info('Start extracting the cashback data!') 
 
@@ -221,42 +155,20 @@ def extract_cashback_data(df_main:pd.DataFrame) -> pd.DataFrame:
         logger.debug('----- Filtered the card(s).') 
 
         # Extract data from the "cashback_category" column. 
-        _ = df_main.apply(_extract_data_from_json, axis=1) 
-        df_extracted_data = pd.DataFrame(dict_cashback_data) 
+        df_extracted_data = explode_category_column(df_main, DF_CASHBACK_CAT) 
+        df_extracted_data = df_extracted_data[[
+            *LS_CARD_META_COLS, DF_CASHBACK_RATE, DF_CASHBACK_CAP, DF_CASHBACK_BENCHMARK, DF_CASHBACK_CAT, 
+        ]]
         logger.debug('----- Extracted the cashback data.') 
 
-        # Extract data. 
-        df_extracted_data[DF_CASHBACK_FROM] = df_extracted_data[DF_CASHBACK_BENCHMARK].str.extract(r'from RM([\d\W]+)')
-        df_extracted_data[DF_CASHBACK_TILL] = df_extracted_data[DF_CASHBACK_BENCHMARK].str.extract(r'up to RM([\d\W]+)')
-        df_extracted_data[DF_CASHBACK_WEEKENDS_COND] = df_extracted_data[DF_CASHBACK_BENCHMARK].str.contains('weekends') 
-        df_extracted_data[DF_CASHBACK_MONTHLY_COND] = df_extracted_data[DF_CASHBACK_BENCHMARK].str.contains('monthly') 
-        df_extracted_data[DF_CASHBACK_SINGLE_RECEIPT_COND] = df_extracted_data[DF_CASHBACK_BENCHMARK].str.contains('single receipt') 
-        logger.debug('----- Extracted the cashback rate, cap, and range values') 
-
-        # Process the data. 
-        boo_no_benchmark = df_extracted_data[DF_CASHBACK_BENCHMARK].str.contains('any amount') 
-        df_extracted_data.loc[boo_no_benchmark, DF_CASHBACK_FROM] = '0'
-        df_extracted_data[DF_CASHBACK_FROM] = df_extracted_data[DF_CASHBACK_FROM].str.replace(',', '') 
-        df_extracted_data[DF_CASHBACK_TILL] = df_extracted_data[DF_CASHBACK_TILL].str.replace(',', '') 
-        df_extracted_data[DF_CASHBACK_RATE] = df_extracted_data[DF_CASHBACK_RATE].str.replace('%', '') 
-        df_extracted_data[DF_CASHBACK_CAP] = df_extracted_data[DF_CASHBACK_CAP].str.replace('RM', '') 
-        df_extracted_data[DF_CASHBACK_CAP] = df_extracted_data[DF_CASHBACK_CAP].str.replace(',', '') 
-        df_extracted_data[DF_CASHBACK_CAP] = df_extracted_data[DF_CASHBACK_CAP].str.replace('uncapped', '1e+10') 
-        logger.debug('----- Processed the cashback rate, cap, and range values') 
+        # Parse the rate, cap and benchmark into typed values in one pass. 
+        df_terms = parse_cashback_columns(df_extracted_data) 
+        df_extracted_data[df_terms.columns] = df_terms 
+        logger.debug('----- Parsed the cashback rate, cap, and range values') 
 
         # Transform string to lowercase. 
         df_extracted_data[DF_CASHBACK_CAT] = df_extracted_data[DF_CASHBACK_CAT].astype('str').str.lower() 
 
-        # Transform dtype to integer. 
-        df_extracted_data[DF_CASHBACK_FROM] = pd.to_numeric(df_extracted_data[DF_CASHBACK_FROM], downcast='integer') 
-        df_extracted_data[DF_CASHBACK_TILL] = pd.to_numeric(df_extracted_data[DF_CASHBACK_TILL], downcast='integer') 
-        df_extracted_data[DF_CASHBACK_RATE] = pd.to_numeric(df_extracted_data[DF_CASHBACK_RATE], downcast='integer') 
-        df_extracted_data[DF_CASHBACK_CAP] = pd.to_numeric(df_extracted_data[DF_CASHBACK_CAP], downcast='integer') 
-        logger.debug('----- Transformed the dtypes for cashback rate, cap, and spending range.') 
-
-        # Fill in the null value. 
-        df_extracted_data.loc[df_extracted_data[DF_CASHBACK_FROM].isnull(), DF_CASHBACK_FROM] = 0 
-
         # Fix the error. Swap the values if the value of 'cashback_from' is larger than 'cashback_till'. 
         boo_range_error = df_extracted_data[DF_CASHBACK_FROM] > df_extracted_data[DF_CASHBACK_TILL] 
         df_extracted_data['cashback_from_copy'] = df_extracted_data[DF_CASHBACK_FROM] 
@@ -266,9 +178,58 @@ def extract_cashback_data(df_main:pd.DataFrame) -> pd.DataFrame:
         logger.debug('----- Fixed the error for cashback spending range.') 
 
         # Save the dataframe. 
-        df_extracted_data.to_csv(CASHBACK_DF_FILEPATH, index=False) 
-        logger.info(f'Saved the dataframe to ({CASHBACK_SAVE_DIR}) directory') 
+        if save: 
+            save_table(df_extracted_data, TABLE_CASHBACK, CASHBACK_PARQUET_FILEPATH, CASHBACK_DF_FILEPATH) 
+            logger.info(f'Saved the dataframe to ({CASHBACK_SAVE_DIR}) directory') 
         return df_extracted_data
 
     except Exception: 
         logger.exception('Exception occurs while processing the cashback data.') 
+
+
+
+# %%
+# -------------------------------------------------------
+# Combine the processed data of each bank 
+# -------------------------------------------------------
+
+# Where to save each processed table. 
+DICT_TABLE_FILEPATHS = {
+    TABLE_REWARD_POINTS: (REWARD_POINTS_PARQUET_FILEPATH, REWARD_POINTS_DF_FILEPATH), 
+    TABLE_CASHBACK: (CASHBACK_PARQUET_FILEPATH, CASHBACK_DF_FILEPATH), 
+}
+
+
+@lazy_task(
+    target=task_target(
+        ls_inputs=['ls_df', 'table'], 
+        ls_config=['DF_CASHBACK_VERSION', 'DF_REWARD_POINTS_VERSION', 'PIPELINE_VERSION'], 
+        ls_code=['autoprocess_data.process_card_data'], 
+    ), 
+)
+@traced('task.combine_processed_data')
+def combine_processed_data(ls_df:List[pd.DataFrame], table:Text) -> pd.DataFrame: 
+    '''
+    Purpose : 
+        Combine the processed data of each bank, e.g. from (extract_cashback_data) 
+        mapped over the banks, and save the table. 
+
+    Args    : 
+        ls_df : The processed dataframe of each bank. The banks that failed to 
+                process (None) are left out. 
+        table : Name of the table to save, (TABLE_CASHBACK) or (TABLE_REWARD_POINTS). 
+
+    Output  :
+        The combined dataframe. 
+    '''
+
+    ls_df = [df for df in ls_df if df is not None]
+    if not ls_df: 
+        logger.warning(f'No processed data to combine for ({table}).') 
+        return None
+
+    df_combined = pd.concat(ls_df, ignore_index=True) 
+    parquet_filepath, csv_filepath = DICT_TABLE_FILEPATHS[table]
+    save_table(df_combined, table, parquet_filepath, csv_filepath) 
+    logger.info(f'Saved the combined ({table}) table of ({len(ls_df)}) banks to ({parquet_filepath}).') 
+    return df_combined
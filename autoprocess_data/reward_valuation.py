@@ -0,0 +1,208 @@
+# %%
+import logging
+import datetime as dt
+from typing import Dict, List, Optional, Sequence, Text, Tuple
+
+# For data processing and analysis. 
+import numpy as np
+import pandas as pd
+
+# Import personal module. 
+from autoprocess_data.cashback_simulator import match_spending_categories
+from config.config_logger import setup_logger
+from config.config import ( 
+    LOG_REWARD_VALUATION_FILEPATH, 
+    REWARD_CATALOGUE_FILEPATH, 
+    DICT_SPENDING_CATEGORY_KEYWORDS, 
+)
+from config.config_naming import ( 
+    DF_BANK, 
+    DF_CARD_NAME, 
+    DF_REWARD_CAT, 
+    DF_REWARD_POINTS, 
+    DF_EACH_SPENDING, 
+    DF_CATALOGUE_ITEM_PTS, 
+    DF_CATALOGUE_TILL_DATE, 
+    DF_CATALOGUE_ITEM_VALUE, 
+    DF_POINT_VALUE, 
+)
+
+
+
+# %%
+# --------------------------------------------------------------
+# Logging configuration 
+# --------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+logger, file_handler, stream_handler = setup_logger(logger, LOG_REWARD_VALUATION_FILEPATH)
+
+
+
+# %%
+# -------------------------------------------------------
+# Points conversion 
+# -------------------------------------------------------
+
+def load_point_values(
+        filepath:Text=REWARD_CATALOGUE_FILEPATH,
+        aggfunc:Text='max',
+        on_date:Optional[dt.date]=None,
+    ) -> pd.Series:
+    '''
+    Purpose :
+        Build the points to RM conversion table from the reward catalogue. The
+        catalogue has one row per redeemable item with the (DF_CATALOGUE_*) columns,
+        the bank and the value of the item in RM (DF_CATALOGUE_ITEM_VALUE).
+
+    Args    :
+        filepath : Path to the reward catalogue (CSV).
+        aggfunc  : How to combine the items of a bank, e.g. "max" for the best
+                   redemption or "median" for a typical one.
+        on_date  : Leave out the items that expire before this date. Default to today.
+
+    Output  :
+        The value of a point in RM for each bank.
+    '''
+
+    df_catalogue = pd.read_csv(filepath)
+    on_date = on_date or dt.date.today()
+
+    # Items without an end date are always available. 
+    if DF_CATALOGUE_TILL_DATE in df_catalogue:
+        sr_till = pd.to_datetime(df_catalogue[DF_CATALOGUE_TILL_DATE], errors='coerce')
+        df_catalogue = df_catalogue[sr_till.isnull() | (sr_till.dt.date >= on_date)]
+
+    sr_points = pd.to_numeric(df_catalogue[DF_CATALOGUE_ITEM_PTS], errors='coerce')
+    sr_value = pd.to_numeric(df_catalogue[DF_CATALOGUE_ITEM_VALUE], errors='coerce')
+    df_catalogue = df_catalogue.assign(**{DF_POINT_VALUE: sr_value / sr_points.where(sr_points > 0)})
+
+    sr_point_values = df_catalogue.groupby(DF_BANK)[DF_POINT_VALUE].agg(aggfunc).dropna()
+    logger.info(f'Loaded the value of a point for ({len(sr_point_values)}) banks from ({filepath}).')
+    return sr_point_values
+
+
+
+# %%
+# -------------------------------------------------------
+# Reward valuation 
+# -------------------------------------------------------
+
+class RewardValuation:
+    '''
+    Purpose :
+        Work out the monthly value in RM of the reward points of every card for
+        many spending profiles at once. It shares the interface of the cashback
+        simulator (card_names, ls_categories, payout), so reward cards and cashback
+        cards can be ranked together with (rank_cards).
+
+        The earn rate of each card (points per RM) by spending category is built
+        once as a dense (cards x categories) array, taking the best rate among the
+        reward categories that cover it, and converted to RM with the value of a
+        point of the bank. Scoring a batch of customers is then one matrix product.
+
+    Args    :
+        df_reward       : Processed reward points dataframe (extract_reward_points_data).
+        sr_point_values : Value of a point in RM for each bank (load_point_values).
+        ls_categories   : Spending categories. Default to (DICT_SPENDING_CATEGORY_KEYWORDS).
+        dict_keywords   : Words that identify each spending category.
+    '''
+
+    def __init__(
+            self,
+            df_reward:pd.DataFrame,
+            sr_point_values:pd.Series,
+            ls_categories:Optional[List[Text]]=None,
+            dict_keywords:Dict[Text, List[Text]]=DICT_SPENDING_CATEGORY_KEYWORDS,
+        ):
+        self.ls_categories = list(dict_keywords) if ls_categories is None else ls_categories
+
+        codes, self.card_names = pd.factorize(df_reward[DF_CARD_NAME])
+        arr_match = match_spending_categories(df_reward[DF_REWARD_CAT], self.ls_categories, dict_keywords)
+
+        # Points earned per RM spent, e.g. 5 points for every RM2 is 2.5. 
+        sr_points = pd.to_numeric(df_reward[DF_REWARD_POINTS], errors='coerce')
+        sr_spending = pd.to_numeric(df_reward[DF_EACH_SPENDING], errors='coerce')
+        arr_rate = (sr_points / sr_spending.where(sr_spending > 0)).fillna(0).to_numpy(np.float32)
+
+        # Best earn rate of each card for each category. 
+        self.earn_rates = np.zeros((len(self.card_names), len(self.ls_categories)), dtype=np.float32)
+        arr_rows, arr_cats = np.nonzero(arr_match)
+        np.maximum.at(self.earn_rates, (codes[arr_rows], arr_cats), arr_rate[arr_rows])
+
+        # Value of a point for each card, from its bank. 
+        sr_card_banks = df_reward.groupby(DF_CARD_NAME, sort=False)[DF_BANK].first().reindex(self.card_names)
+        sr_card_values = sr_card_banks.map(sr_point_values)
+        ls_missing = sorted(sr_card_banks[sr_card_values.isnull()].unique())
+        if ls_missing:
+            logger.warning(f'No points conversion for ({ls_missing}), their cards are valued at 0.')
+        self.point_values = sr_card_values.fillna(0).to_numpy(np.float32)
+
+        # RM earned per RM spent, by card and category. 
+        self._value_rates = self.earn_rates * self.point_values[:, None]
+        logger.info(f'Built the reward valuation for ({len(self.card_names)}) cards.')
+
+    def payout(self, spending:np.ndarray, chunk_size:int=100_000) -> np.ndarray:
+        '''
+        Purpose :
+            Work out the monthly value of the reward points of every card for each
+            spending profile.
+
+        Args    :
+            spending   : Monthly spending in RM of shape (customers x spending categories).
+            chunk_size : Number of customers per batch, to bound the memory used.
+
+        Output  :
+            Monthly value in RM of shape (customers x cards), with the cards in the
+            order of (card_names).
+        '''
+
+        spending = np.asarray(spending, dtype=np.float32)
+        if spending.ndim != 2 or spending.shape[1] != len(self.ls_categories):
+            raise ValueError(f'Expected a spending matrix with ({len(self.ls_categories)}) columns, got ({spending.shape}).')
+
+        arr_payout = np.empty((len(spending), len(self.card_names)), dtype=np.float32)
+        for start in range(0, len(spending), chunk_size):
+            arr_payout[start:start + chunk_size] = spending[start:start + chunk_size] @ self._value_rates.T
+        return arr_payout
+
+
+
+# %%
+# -------------------------------------------------------
+# Ranking 
+# -------------------------------------------------------
+
+def rank_cards(
+        spending:np.ndarray,
+        engines:Sequence,
+        top_n:int=5,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Purpose :
+        Rank the cards of several engines (e.g. a cashback simulator and a reward
+        valuation) together for each spending profile.
+
+    Args    :
+        spending : Monthly spending in RM of shape (customers x spending categories).
+        engines  : Engines sharing the same spending categories.
+        top_n    : Number of cards to keep for each customer.
+
+    Output  :
+        The names of every card across the engines, and for each customer the
+        indexes (into the names) and the monthly payouts of the best (top_n) cards.
+    '''
+
+    arr_names = np.concatenate([np.asarray(engine.card_names, dtype=object) for engine in engines])
+    arr_payout = np.hstack([engine.payout(spending) for engine in engines])
+
+    # Partially sort for the top cards, then order only those. 
+    top_n = min(top_n, arr_payout.shape[1])
+    arr_top = np.argpartition(-arr_payout, top_n - 1, axis=1)[:, :top_n]
+    arr_top_payout = np.take_along_axis(arr_payout, arr_top, axis=1)
+    arr_order = np.argsort(-arr_top_payout, axis=1)
+    return (
+        arr_names,
+        np.take_along_axis(arr_top, arr_order, axis=1),
+        np.take_along_axis(arr_top_payout, arr_order, axis=1),
+    )
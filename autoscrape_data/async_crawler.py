@@ -0,0 +1,178 @@
+# %%
+import logging
+import asyncio, threading
+from concurrent.futures import Future
+from typing import Any, Callable, Coroutine, Optional, Text
+
+# For fetching the webpages. 
+import aiohttp
+
+# Import personal module. 
+from autoscrape_data.rate_limiting import AsyncTokenBucket, AsyncHostLimiter
+from autoscrape_data.snapshot_store import save_snapshot
+from config.config_logger import setup_logger
+from config.config_metrics import metrics
+from config.config import (
+    LOG_ASYNC_CRAWLER_FILEPATH, 
+    CRAWL_RATE_LIMIT, 
+    CRAWL_BURST, 
+    CRAWL_MAX_IN_FLIGHT, 
+    CRAWL_MAX_IN_FLIGHT_PER_HOST, 
+    HTTP_TIMEOUT, 
+    HTTP_RETRIES, 
+    HTTP_USER_AGENT, 
+    SAVE_SNAPSHOTS, 
+)
+
+
+
+# %%
+# --------------------------------------------------------------
+# Logging configuration
+# --------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+logger, file_handler, stream_handler = setup_logger(logger, LOG_ASYNC_CRAWLER_FILEPATH)
+
+
+
+# %%
+# -------------------------------------------------------
+# Crawl engine
+# -------------------------------------------------------
+
+# Crawl engines. 
+CRAWL_ENGINE_THREADS = 'threads'
+CRAWL_ENGINE_ASYNCIO = 'asyncio'
+
+# Status codes worth retrying. 
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class AsyncCrawler:
+    '''
+    Purpose :
+        Keep many requests in flight on an event loop running in its own thread.
+        Requests are paced by a global token bucket and capped per host, so the
+        crawl runs at the polite rate instead of idling between blocking sleeps.
+
+        It is used like an executor: "submit" schedules a coroutine function and
+        returns a future, so the scraping procedures can collect the results in
+        the same way as with a thread pool.
+
+    Args    :
+        rate           : Number of requests allowed per second across all hosts.
+        burst          : Maximum number of requests allowed in a burst.
+        max_in_flight  : Maximum number of open connections.
+        per_host       : Maximum number of requests in flight per host.
+        save_snapshots : Keep the raw HTML of every page in the snapshot store.
+    '''
+
+    def __init__(
+            self,
+            rate:float=CRAWL_RATE_LIMIT,
+            burst:float=CRAWL_BURST,
+            max_in_flight:int=CRAWL_MAX_IN_FLIGHT,
+            per_host:int=CRAWL_MAX_IN_FLIGHT_PER_HOST,
+            save_snapshots:bool=SAVE_SNAPSHOTS,
+        ):
+        self.max_in_flight = max_in_flight
+        self.save_snapshots = save_snapshots
+        self._bucket = AsyncTokenBucket(rate, burst)
+        self._host_limiter = AsyncHostLimiter(per_host)
+        self._loop:Optional[asyncio.AbstractEventLoop] = None
+        self._thread:Optional[threading.Thread] = None
+        self._session:Optional[aiohttp.ClientSession] = None
+
+    def __enter__(self) -> 'AsyncCrawler':
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='async_crawler', daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._open_session(), self._loop).result()
+        logger.info('Started the async crawler.')
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        logger.info('Stopped the async crawler.')
+
+    async def _open_session(self) -> None:
+        # The session has to be created inside the running loop. 
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_in_flight),
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+            headers={'User-Agent': HTTP_USER_AGENT, 'Accept-Encoding': 'gzip, deflate'},
+        )
+
+    def submit(self, func:Callable[..., Coroutine], *args:Any) -> Future:
+        '''
+        Purpose :
+            Schedule a coroutine function on the event loop.
+
+        Args    :
+            func : Coroutine function to run.
+            args : Arguments for the function.
+
+        Output  :
+            A future holding the result of the coroutine.
+        '''
+
+        return asyncio.run_coroutine_threadsafe(func(*args), self._loop)
+
+    async def run_blocking(self, func:Callable, *args:Any) -> Any:
+        '''
+        Purpose :
+            Run a blocking function (e.g. parsing or the browser fallback) in a
+            worker thread so that it doesn't stall the other requests.
+        '''
+
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def fetch_html(self, url:Text, retries:int=HTTP_RETRIES) -> Text:
+        '''
+        Purpose :
+            Fetch the raw HTML of a webpage once a token and a host slot are free.
+
+        Args    :
+            url     : URL of the webpage.
+            retries : Number of retries for transient errors.
+
+        Output  :
+            Raw HTML of the webpage. Raise an error once the retries are used up.
+        '''
+
+        for attempt in range(retries + 1):
+            await self._bucket.acquire()
+            try:
+                async with self._host_limiter.slot(url):
+                    with metrics.span('http.fetch', url=url, attempt=attempt):
+                        async with self._session.get(url) as response:
+                            response.raise_for_status()
+                            html = await response.text()
+                break
+            # Only retry the errors that may go away, e.g. not a missing webpage. 
+            except aiohttp.ClientResponseError as error:
+                if error.status not in RETRY_STATUSES or attempt == retries:
+                    raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                if isinstance(error, asyncio.TimeoutError):
+                    metrics.increment('timeouts', stage='asyncio')
+                if attempt == retries:
+                    raise
+            logger.warning(f'Retry ({attempt + 1} / {retries}) for ({url}).')
+            metrics.increment('retries', backend='asyncio')
+            await asyncio.sleep(0.5 * 2 ** attempt)
+
+        logger.debug(f'----- Fetched ({url}) -- ({len(html)} characters)')
+
+        # Keep the raw HTML so the data can be parsed again without the live site. 
+        if self.save_snapshots:
+            try:
+                await self.run_blocking(save_snapshot, url, html)
+            except Exception:
+                logger.exception(f'Unable to save the snapshot for ({url}).')
+
+        return html
@@ -0,0 +1,554 @@
+# %%
+import logging
+from typing import Optional, List, Dict, Text, Tuple
+from urllib.parse import urljoin, urlsplit, parse_qs
+
+# For parsing the raw HTML. 
+from bs4 import BeautifulSoup
+
+# For data processing and analysis. 
+import hashlib, json, re
+import numpy as np
+import pandas as pd
+
+# Import personal module. 
+from autoscrape_data.card_record import CardRecord, records_to_dataframe
+from autoscrape_data.snapshot_store import (
+    SNAPSHOT_BANK_MENU, 
+    SNAPSHOT_LISTING, 
+    load_snapshot,
+    load_snapshot_manifest,
+)
+from config.config_logger import setup_logger
+from config.config import (
+    LOG_CARD_PARSING_FILEPATH, 
+    CARD_TYPE,
+    HTML_PARSER, 
+    URL_CARD, 
+)
+from config.config_naming import (
+    DF_IMG, 
+    DF_REQUIRED_INC, 
+    DF_COST_FEE, 
+    DF_COST_FEE_COND, 
+    DF_COST_CARD_INT_RATE, 
+    DF_REQUIRED_AGE, 
+    DF_REQUIRED_APPLICANT, 
+    DF_REWARD, 
+    DF_CASHBACK, 
+    DF_TRAVEL_BENEFIT, 
+    DF_PREMIUM, 
+    DF_PETROL, 
+    DF_CARD_NAME_ORIGINAL, 
+    DF_LISTING_FINGERPRINT, 
+    DF_BANK, 
+    DF_CARD_NAME, 
+    DF_URL, 
+    DF_CARD_TYPE, 
+)
+
+
+
+# %%
+# --------------------------------------------------------------
+# Logging configuration
+# --------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+logger, file_handler, stream_handler = setup_logger(logger, LOG_CARD_PARSING_FILEPATH)
+
+
+
+# %%
+# -------------------------------------------------------
+# Card webpage layout
+# -------------------------------------------------------
+
+# Location of each section on the card webpage. 
+XPATH_CARD_IMG = '''/html/body/main/header/img'''
+XPATH_CARD_SUMMARY = '''/html/body/main/section[1]'''
+XPATH_CARD_REQUIREMENTS = '''//*[@id="requirements"]'''
+
+# Requirement headers and the designated columns. 
+LS_REQUIREMENT_HEADERS = ['Mininum Age', 'Who Can Apply']
+LS_REQUIREMENT_COLS = [DF_REQUIRED_AGE, DF_REQUIRED_APPLICANT]
+
+# Designated column for each table and its HTML id tag. 
+LS_CARD_TABLES = [
+    (DF_REWARD, 'rewards'),
+    (DF_CASHBACK, 'cashback'),
+    (DF_TRAVEL_BENEFIT, 'travel'),
+    (DF_PREMIUM, 'premium'),
+    (DF_PETROL, 'petrol'),
+]
+
+# The same locations as CSS selectors for parsing the raw HTML. 
+CSS_CARD_IMG = '''html > body > main > header > img'''
+CSS_CARD_SUMMARY = '''html > body > main > section:nth-of-type(1)'''
+CSS_CARD_REQUIREMENTS = '''#requirements'''
+
+# Location of the bank menu and the card listing on the listing webpage. 
+XPATH_BANK_MENU = '''/html/body/main/section/form/label/select'''
+XPATH_CARD_LISTING = '''/html/body/main/section/ul'''
+CSS_BANK_MENU = '''html > body > main > section > form > label > select'''
+CSS_CARD_LISTING = '''html > body > main > section > ul'''
+
+
+
+# %%
+# -------------------------------------------------------
+# Card document
+# -------------------------------------------------------
+
+# A card document holds every section of a card webpage: 
+#   {
+#       "img"          : {"src": ..., "alt": ...},
+#       "summary"      : [{"header": ..., "text": ..., "span": ...}, ...],
+#       "requirements" : [{"header": ..., "items": [...]}, ...],
+#       "tables"       : {id_tag: {"info": ..., "rows": [[cell, ...], ...]}, ...},
+#   }
+# A section that doesn't exist on the webpage is null. It is built either by the
+# browser in one round trip or by parsing the raw HTML, and filled the same way. 
+
+def _fill_img_from_document(card_row:CardRecord, dict_img:Optional[Dict]) -> CardRecord:
+    if dict_img is None:
+        logger.warning('Unable to extract the image because it does not exist.')
+        return card_row
+
+    card_row[DF_IMG] = re.sub(r'®|¬Æ', '', dict_img['src'])
+    logger.debug(f'''----- Added an image ({dict_img['alt']})!''')
+    return card_row
+
+
+def _fill_summary_from_document(card_row:CardRecord, ls_summary:Optional[List[Dict]]) -> CardRecord:
+    for item in ls_summary or []:
+        header, text = item['header'], item['text']
+
+        if re.match(r'(?i)Min\. Income\*?', header):
+            # Leave the income empty when it isn't an amount, e.g. "Free" or no span at all. 
+            try:
+                processed_value = float( str(item['span']).replace('RM', '').replace(',', '') )
+            except ValueError:
+                logger.warning(f'''Unable to read ({header}) from ({item['span']}), left it empty.''')
+                continue
+            card_row[DF_REQUIRED_INC] = processed_value
+            logger.debug(f'----- Added ({header}) with the value ({processed_value})!')
+
+        elif re.match(r'(?i)Annual Fee\*?', header):
+            card_row[DF_COST_FEE] = text
+            card_row[DF_COST_FEE_COND] = 'not_free'
+            if re.match(r'(?i)Free\*?', text):
+                card_row[DF_COST_FEE] = '0'
+                card_row[DF_COST_FEE_COND] = text.lower()
+            logger.debug(f'----- Added ({header}) with the value ({text})!')
+
+        elif re.match(r'(?i)Interest Rate\*?', header):
+            card_row[DF_COST_CARD_INT_RATE] = text
+            logger.debug(f'----- Added ({header}) with the value ({text})!')
+
+    return card_row
+
+
+def _fill_list_from_document(
+        card_row:CardRecord, ls_items:Optional[List[Dict]], ls_headers:List, ls_cols:List,
+    ) -> CardRecord:
+    for item in ls_items or []:
+        for compared_header, col in zip(ls_headers, ls_cols):
+            if item['header'] == compared_header:
+                card_row[f'{col}'] = ' | '.join(item['items'])
+                logger.debug(f'''----- Added ({item['header']}) with the value ({item['items']})!''')
+
+    return card_row
+
+
+def _fill_table_from_document(card_row:CardRecord, col:Text, dict_table:Optional[Dict]) -> CardRecord:
+    # Set a default value. 
+    card_row[col] = 'False'
+    if dict_table is None:
+        logger.warning(f'Unable to extract full data for ({col}) due to exception or data not exist.')
+        return card_row
+
+    card_row[col] = 'True'
+    if dict_table['info'] is None:
+        logger.warning(f'Unable to extract full data for ({col}) due to exception or data not exist.')
+        return card_row
+    card_row[f'{col}_info'] = dict_table['info']
+
+    # Only keep the categories if every row has at least one cell, as the per element path does. 
+    ls_rows = dict_table['rows']
+    if ls_rows is None or not all(ls_rows):
+        logger.warning(f'Unable to extract full data for ({col}) due to exception or data not exist.')
+        return card_row
+    card_row[f'{col}_category'] = json.dumps({row[0]: row[1:] for row in ls_rows})
+    logger.debug(f'----- Added ({col}) info and categories!')
+
+    return card_row
+
+
+def fill_row_from_card_document(card_row:CardRecord, dict_document:Dict) -> CardRecord:
+    '''
+    Purpose :
+        Assign the data of a card webpage to the designated columns.
+
+    Args    :
+        card_row      : Card record to assign the values to.
+        dict_document : The JSON document returned by (JS_EXTRACT_CARD_DOCUMENT).
+
+    Output  :
+        Updated card record after assigning the values.
+    '''
+
+    card_row = _fill_img_from_document(card_row, dict_document['img'])
+    card_row = _fill_summary_from_document(card_row, dict_document['summary'])
+    card_row = _fill_list_from_document(
+        card_row, dict_document['requirements'], LS_REQUIREMENT_HEADERS, LS_REQUIREMENT_COLS,
+    )
+    for col, id_tag in LS_CARD_TABLES:
+        card_row = _fill_table_from_document(card_row, col, dict_document['tables'][id_tag])
+
+    return card_row
+
+
+def fill_row_from_listing(card_row:CardRecord, dict_listing:Dict) -> CardRecord:
+    '''
+    Purpose :
+        Assign the image and the summary shown on the bank listing page, and the
+        fingerprint of the listing. The card webpage, once scraped, overwrites the
+        image and the summary.
+
+    Args    :
+        card_row     : Card record to assign the values to.
+        dict_listing : The record returned by (parse_listing_records).
+
+    Output  :
+        Updated card record after assigning the values.
+    '''
+
+    card_row[DF_LISTING_FINGERPRINT] = dict_listing['fingerprint']
+    if dict_listing['img'] is not None:
+        card_row = _fill_img_from_document(card_row, dict_listing['img'])
+    return _fill_summary_from_document(card_row, dict_listing['summary'])
+
+
+def compile_initial_data_for_card(
+        card_row:CardRecord,
+        url:Text,
+        bank:Text,
+        card:Text,
+        href:Optional[Text]=None,
+    ) -> Tuple[CardRecord, Text]:
+    '''
+    Purpose :
+        Compile the data known before opening the card webpage.
+
+    Args    :
+        card_row : Card record to assign the values to.
+        url      : URL to scrape the data from.
+        bank     : Bank name.
+        card     : Card name as listed on the bank listing page.
+        href     : URL of the card webpage as linked from the listing page, if any.
+
+    Output  :
+        Updated card record after assigning the values and the URL to the card webpage.
+    '''
+
+    # Keep a record of the original (unprocessed) card name in the card record. 
+    card_row[DF_CARD_NAME_ORIGINAL] = card
+
+    # Follow the link of the listing page. Without one, convert the card name to 
+    # slug format to guess the url to the card webpage. 
+    card_url = href
+    if card_url is None:
+        card_slug = card.replace("'", '').replace(' &', '').replace(' -', '').replace(':', '').replace('®', '').replace('¬Æ', '')
+        card_slug = card_slug.replace(' ', '-')
+        card_url = ''.join([url, f'{card_slug}.html'])
+    processed_card_str = card.lower().replace(' ', '_').replace('_-', '').replace('-', '_')
+
+    # Assign the data to the designated column. 
+    card_row[DF_BANK] = bank.lower().replace(' ', '_')
+    card_row[DF_CARD_NAME] = processed_card_str
+    card_row[DF_URL] = card_url
+    logger.debug(f'----- Added ({processed_card_str}) and ({card_url}) for ({bank})!')
+
+    # Extract and assign the card type to the designated column. 
+    ls_splitted_card_str = processed_card_str.split('_')
+    for splitted_card_str in ls_splitted_card_str:
+        if splitted_card_str in CARD_TYPE:
+            card_row[DF_CARD_TYPE] = splitted_card_str
+            break
+        else:
+            card_row[DF_CARD_TYPE] = np.nan
+
+    return card_row, card_url
+
+
+
+# %%
+# -------------------------------------------------------
+# Raw HTML parser
+# -------------------------------------------------------
+
+def _text(element) -> Optional[Text]:
+    # Collapse the whitespace the same way the browser renders the text. 
+    if element is None:
+        return None
+    return ' '.join(element.get_text().split())
+
+
+def _pairs(element) -> Optional[List]:
+    if element is None:
+        return None
+    return list(zip(element.find_all('dt'), element.find_all('dd')))
+
+
+def parse_card_document(html:Text, url:Text) -> Dict:
+    '''
+    Purpose :
+        Build the card document from the raw HTML of a card webpage,
+        without a browser.
+
+    Args    :
+        html : Raw HTML of the card webpage.
+        url  : URL of the card webpage, to resolve relative links.
+
+    Output  :
+        A JSON document with the image, summary, requirements and tables.
+    '''
+
+    soup = BeautifulSoup(html, HTML_PARSER)
+    element_img = soup.select_one(CSS_CARD_IMG)
+    ls_summary = _pairs(soup.select_one(CSS_CARD_SUMMARY))
+    ls_requirements = _pairs(soup.select_one(CSS_CARD_REQUIREMENTS))
+
+    dict_tables = {}
+    for _, id_tag in LS_CARD_TABLES:
+        element_main = soup.find(id=id_tag)
+        if element_main is None:
+            dict_tables[id_tag] = None
+            continue
+        element_body = element_main.find('tbody')
+        dict_tables[id_tag] = {
+            'info': _text(element_main.find('p')),
+            'rows': [
+                [_text(data) for data in element_row.find_all('td')] for element_row in element_body.find_all('tr')
+            ] if element_body is not None else None,
+        }
+
+    return {
+        'img': {
+            'src': urljoin(url, element_img.get('src', '')),
+            'alt': element_img.get('alt'),
+        } if element_img is not None else None,
+        'summary': [
+            {'header': _text(header), 'text': _text(data), 'span': _text(data.find('span'))}
+            for header, data in ls_summary
+        ] if ls_summary is not None else None,
+        'requirements': [
+            {'header': _text(header), 'items': [_text(item) for item in data.find_all('li')]}
+            for header, data in ls_requirements
+        ] if ls_requirements is not None else None,
+        'tables': dict_tables,
+    }
+
+
+def is_valid_card_document(dict_document:Dict) -> bool:
+    '''
+    Purpose :
+        Check that a card document parsed from the raw HTML has the sections every
+        card webpage has, i.e. the image and a summary with the minimum income.
+        Otherwise the webpage is likely rendered by JavaScript or blocked, and has
+        to be loaded in a browser instead.
+    '''
+
+    ls_summary = dict_document['summary'] or []
+    return (
+        dict_document['img'] is not None
+        and any(re.match(r'(?i)Min\. Income\*?', item['header'] or '') for item in ls_summary)
+    )
+
+
+def parse_bank_names(html:Text) -> List[Text]:
+    '''
+    Purpose :
+        Extract the bank names from the bank menu, except for the first option: 'All bank'.
+    '''
+
+    element_bank_menu = BeautifulSoup(html, HTML_PARSER).select_one(CSS_BANK_MENU)
+    if element_bank_menu is None:
+        return []
+    return [element.get('value') for element in element_bank_menu.find_all('option')[1:]]
+
+
+def fingerprint_listing_card(card:Text, img:Optional[Text], text:Optional[Text], href:Optional[Text]=None) -> Text:
+    '''
+    Purpose :
+        Fingerprint a card from what the bank listing page shows of it: the name, the
+        image, the link and the text of its listing item. The whitespace is left out,
+        since the browser and the raw HTML lay the text out differently.
+
+    Output  :
+        A short hash that only changes when the listing of the card changes.
+    '''
+
+    ls_content = [card, img or '', ''.join((text or '').split())] + ([href] if href else [])
+    return hashlib.sha256(json.dumps(ls_content).encode('utf-8')).hexdigest()[:16]
+
+
+def build_listing_record(
+        card:Text,
+        href:Optional[Text],
+        img:Optional[Text],
+        ls_summary:Optional[List[Dict]],
+        text:Optional[Text],
+    ) -> Dict:
+    '''
+    Purpose :
+        Build the record of a card on a bank listing page, the same way from the raw
+        HTML and from the browser.
+
+    Args    :
+        card       : Card name, i.e. the "alt" of its image.
+        href       : Absolute URL of the card webpage, if the listing links to it.
+        img        : Absolute URL of the card image.
+        ls_summary : Summary shown on the listing, in the format of the card document.
+        text       : Text of the whole listing item.
+
+    Output  :
+        A JSON document with the card name, the link, the image, the summary and the
+        fingerprint.
+    '''
+
+    return {
+        'card': card,
+        'href': href,
+        'img': {'src': img, 'alt': card} if img else None,
+        'summary': ls_summary,
+        'fingerprint': fingerprint_listing_card(card, img, text, href),
+    }
+
+
+def index_listing_records(ls_records:List[Dict]) -> Dict[Text, Dict]:
+    '''
+    Purpose :
+        Key the listing records by the link to the card webpage, or by the card name
+        when the listing has no link, so that two cards listed under the same name
+        are both kept.
+
+    Output  :
+        The records keyed by card in the listing order.
+    '''
+
+    dict_cards = {}
+    for record in ls_records:
+        key = record['href'] or record['card']
+        if key in dict_cards:
+            logger.warning(f'''Skipped a duplicate listing of ({record['card']}) -- ({key}).''')
+            continue
+        dict_cards[key] = record
+    return dict_cards
+
+
+def parse_listing_records(html:Text, url:Text=URL_CARD) -> Dict[Text, Dict]:
+    '''
+    Purpose :
+        Extract the record of every card from a bank listing webpage in one pass: the
+        link to its webpage, its image and the summary fields the listing shows.
+
+    Args    :
+        html : Raw HTML of the bank listing webpage.
+        url  : URL of the webpage, to resolve the relative links against.
+
+    Output  :
+        The records in the listing order (see build_listing_record), keyed by card
+        (see index_listing_records).
+    '''
+
+    element_cards_section = BeautifulSoup(html, HTML_PARSER).select_one(CSS_CARD_LISTING)
+    if element_cards_section is None:
+        return {}
+
+    ls_records = []
+    for element_img in element_cards_section.find_all('img'):
+        card = element_img.get('alt')
+        element_item = element_img.find_parent('li') or element_img.parent
+        element_link = element_img.find_parent('a', href=True) or element_item.find('a', href=True)
+        ls_summary = _pairs(element_item.find('dl'))
+
+        ls_records.append(build_listing_record(
+            card,
+            urljoin(url, element_link['href']) if element_link is not None else None,
+            urljoin(url, element_img['src']) if element_img.get('src') else None,
+            [
+                {'header': _text(header), 'text': _text(data), 'span': _text(data.find('span'))}
+                for header, data in ls_summary
+            ] if ls_summary is not None else None,
+            element_item.get_text(),
+        ))
+    return index_listing_records(ls_records)
+
+
+
+# %%
+# -------------------------------------------------------
+# Offline parse engine
+# -------------------------------------------------------
+
+def rebuild_card_data_from_snapshots(
+        url:Text=URL_CARD,
+        since:Optional[Text]=None,
+        until:Optional[Text]=None,
+    ) -> pd.DataFrame:
+    '''
+    Purpose :
+        Rebuild the card dataframe from the stored snapshots instead of scraping
+        the live site. Banks and cards are read from the listing snapshots, and
+        each card is parsed from the snapshot of its webpage.
+
+    Args    :
+        url   : URL the card webpages were scraped from.
+        since : Earliest fetch date of the snapshots to use (ISO format).
+        until : Latest fetch date of the snapshots to use (ISO format, inclusive).
+
+    Output  :
+        The card dataframe with the same columns as the scraped one.
+    '''
+
+    dict_snapshots = load_snapshot_manifest(since, until)
+
+    # Compile the cards of each bank from the listing snapshots. 
+    dict_data = {}
+    for snapshot_url, record in dict_snapshots.items():
+        if record['kind'] == SNAPSHOT_LISTING:
+            bank = parse_qs(urlsplit(snapshot_url).query)['filter'][0]
+            dict_data[bank] = parse_listing_records(load_snapshot(record['digest']), snapshot_url)
+
+    # Follow the order of the bank menu if it was stored. 
+    ls_banks = list(dict_data)
+    if url in dict_snapshots and dict_snapshots[url]['kind'] == SNAPSHOT_BANK_MENU:
+        ls_menu = parse_bank_names(load_snapshot(dict_snapshots[url]['digest']))
+        ls_banks = [bank for bank in ls_menu if bank in dict_data] + [bank for bank in ls_banks if bank not in ls_menu]
+    logger.info(f'Start rebuilding the card data for ({len(ls_banks)}) banks from the snapshots!')
+
+    ls_records = []
+    for bank in ls_banks:
+        for dict_listing in dict_data[bank].values():
+            card = dict_listing['card']
+            card_row = CardRecord()
+            card_row, card_url = compile_initial_data_for_card(card_row, url, bank, card, dict_listing['href'])
+
+            if card_url not in dict_snapshots:
+                logger.warning(f'Skipped ({bank}) -- ({card}) because its webpage has no snapshot.')
+                continue
+
+            # Leave a card out if its snapshot can't be read or parsed, so that it doesn't 
+            # hold back the other cards, the same way as when scraping the live site. 
+            try:
+                card_row = fill_row_from_listing(card_row, dict_listing)
+                html = load_snapshot(dict_snapshots[card_url]['digest'])
+                ls_records.append(fill_row_from_card_document(card_row, parse_card_document(html, card_url)))
+            except Exception:
+                logger.exception(f'Unable to rebuild ({bank}) -- ({card}) from its snapshot ({card_url}).')
+
+    df_main = records_to_dataframe(ls_records)
+    logger.info(f'Rebuilt ({len(df_main)}) cards from the snapshots!')
+    return df_main
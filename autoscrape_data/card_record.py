@@ -0,0 +1,82 @@
+# %%
+from typing import Any, Dict, Iterable, List, Text
+
+# For data processing and analysis.
+import numpy as np
+import pandas as pd
+
+# Import personal module.
+from config.config import CARD_DATA
+
+
+
+# %%
+# -------------------------------------------------------
+# Card record
+# -------------------------------------------------------
+
+class CardRecord:
+    '''
+    Purpose :
+        A lightweight row of the card dataframe. The values are kept in slots
+        named after the (CARD_DATA) columns and indexed by the column names,
+        e.g. card_row[DF_IMG] = ..., so scraping a card never builds a dataframe.
+        The rows are collected in a list and turned into a dataframe once with
+        (records_to_dataframe).
+
+        A column that isn't part of (CARD_DATA), e.g. "premium_category", is kept
+        aside and becomes an extra column of the dataframe.
+    '''
+
+    __slots__ = (*CARD_DATA, '_extra')
+
+    def __init__(self):
+        for col in CARD_DATA:
+            setattr(self, col, np.nan)
+        self._extra:Dict[Text, Any] = {}
+
+    def __getitem__(self, col:Text) -> Any:
+        if col in CARD_DATA:
+            return getattr(self, col)
+        return self._extra.get(col, np.nan)
+
+    def __setitem__(self, col:Text, value:Any) -> None:
+        if col in CARD_DATA:
+            setattr(self, col, value)
+        else:
+            self._extra[col] = value
+
+    def __repr__(self) -> Text:
+        return f'CardRecord({self.to_dict()})'
+
+    def to_dict(self) -> Dict[Text, Any]:
+        return {**{col: getattr(self, col) for col in CARD_DATA}, **self._extra}
+
+    @classmethod
+    def from_dict(cls, dict_row:Dict[Text, Any]) -> 'CardRecord':
+        card_row = cls()
+        for col, value in dict_row.items():
+            card_row[col] = value
+        return card_row
+
+
+def records_to_dataframe(ls_records:Iterable[CardRecord]) -> pd.DataFrame:
+    '''
+    Purpose :
+        Turn the card records into the card dataframe in one go.
+
+    Args    :
+        ls_records : A list of card records.
+
+    Output  :
+        The card dataframe with the (CARD_DATA) columns followed by any extra column.
+    '''
+
+    ls_dicts = [card_row.to_dict() for card_row in ls_records]
+
+    # Keep the extra columns in the order they first appear.
+    ls_cols:List[Text] = list(CARD_DATA)
+    for dict_row in ls_dicts:
+        ls_cols.extend(col for col in dict_row if col not in ls_cols)
+
+    return pd.DataFrame.from_records(ls_dicts, columns=ls_cols)
@@ -1,46 +1,73 @@
 # %%
 import logging 
+import os, sys
 import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from typing import Optional, List, Dict, Text, Tuple
 from selenium.webdriver.chrome.webdriver import WebDriver
 
-# For building data pipeline. 
-from prefect import task
-from prefect.engine.results import LocalResult
-
 # For data processing and analysis. 
 import json, re
 import numpy as np
 import pandas as pd 
 
 # Import personal module. 
-from autoscrape_data.selenium_loader import wait_for_webpage_to_load 
+from autoscrape_data.card_record import CardRecord, records_to_dataframe
+from autoprocess_data.columnar_storage import TABLE_CARD, load_table, save_table
+from autoscrape_data.selenium_loader import wait_for_webpage_to_load, PAGE_STAGE_CARD 
+from autoscrape_data.http_loader import FETCH_BACKEND_HTTP, fetch_html
+from autoscrape_data.async_crawler import CRAWL_ENGINE_ASYNCIO, AsyncCrawler
+from autoscrape_data.card_parsing import (
+    XPATH_CARD_IMG, 
+    XPATH_CARD_SUMMARY, 
+    XPATH_CARD_REQUIREMENTS, 
+    LS_REQUIREMENT_HEADERS, 
+    LS_REQUIREMENT_COLS, 
+    LS_CARD_TABLES, 
+    compile_initial_data_for_card, 
+    fill_row_from_card_document, 
+    fill_row_from_listing, 
+    is_valid_card_document, 
+    parse_card_document, 
+)
 from config.config_logger import setup_logger
+from config.config_task_cache import lazy_task, task_target
+from config.config_metrics import metrics, traced
 from config.config import (
+    TASK_CACHE_SCRAPE_PERIOD, 
     LOG_CARD_SCRAPING_FILEPATH, 
-    CARD_DATA, CARD_TYPE, 
     CARD_CHECKPOINT_DIR, 
+    CARD_CHECKPOINT_FILEPATH, 
+    CARD_CHECKPOINT_RESUME, 
+    CARD_CHECKPOINT_MAX_AGE_HOURS, 
+    SCRAPE_INCREMENTAL, 
+    SCRAPE_MAX_AGE_DAYS, 
+    SCRAPE_LISTING_ONLY, 
     CARD_DF_FILEPATH, 
+    CARD_PARQUET_FILEPATH, 
     DF_CARD_VERSION, 
+    CARD_SCRAPING_WORKERS, 
+    FETCH_BACKEND, 
+    CRAWL_ENGINE, 
+    TASK_MAX_RETRIES, 
+    TASK_RETRY_DELAY, 
+    CARD_DATA, 
 )
 from config.config_naming import (
     DF_IMG, 
+    DF_BANK, 
+    DF_LISTING_FINGERPRINT, 
+    DF_SCRAPED_AT, 
     DF_REQUIRED_INC, 
     DF_COST_FEE, 
     DF_COST_FEE_COND, 
     DF_COST_CARD_INT_RATE, 
-    DF_REQUIRED_AGE, 
-    DF_REQUIRED_APPLICANT, 
     DF_REWARD, 
     DF_CASHBACK, 
     DF_TRAVEL_BENEFIT, 
     DF_PREMIUM, 
     DF_PETROL, 
-    DF_CARD_NAME_ORIGINAL, 
-    DF_BANK, 
-    DF_CARD_NAME, 
-    DF_URL, 
-    DF_CARD_TYPE, 
 )
 
 
@@ -60,38 +87,39 @@ logger, file_handler, stream_handler = setup_logger(logger, LOG_CARD_SCRAPING_FI
 # Helper function
 # -------------------------------------------------------
 
+@traced()
 def _extract_table_data_for_card(
-        df_row:pd.DataFrame, col:Text, id_tag:Text, browser:WebDriver,
-    ) -> pd.DataFrame:
+        card_row:CardRecord, col:Text, id_tag:Text, browser:WebDriver,
+    ) -> CardRecord:
     '''
     Purpose :
         Helper function for extracting data from a table within HTML. 
 
     Args    : 
-        df_row  : Dataframe to append the values to. 
-        col     : Name of the dataframe column to assign the data to. 
-        id_tag  : HTML id tag. 
-        browser : A Selenium object to open the browser. 
+        card_row : Card record to assign the values to. 
+        col      : Name of the dataframe column to assign the data to. 
+        id_tag   : HTML id tag. 
+        browser  : A Selenium object to open the browser. 
 
     Output  : 
-        Updated dataframe after appending the values. 
+        Updated card record after assigning the values. 
     '''
 
     logger.info(f'Start scraping ({id_tag})!')
 
     # Set a default value. 
-    df_row[col] = 'False'
+    card_row[col] = 'False'
 
     try:
         # Find the text element inside the HTML tags.  
         element_main = browser.find_element_by_id(id_tag)
 
         # Assign value to the designated column name. 
-        df_row[col] = 'True'
+        card_row[col] = 'True'
         logger.debug(f'----- Added ({col})!')  
 
         # Assign value to the designated column named with info. 
-        df_row[f'{col}_info'] = element_main.find_element_by_tag_name('p').text
+        card_row[f'{col}_info'] = element_main.find_element_by_tag_name('p').text
         logger.debug(f'----- Added ({col}) info!') 
 
         # Find the table element inside the HTML tags. 
@@ -103,31 +131,32 @@ def _extract_table_data_for_card(
                 data.text for data in element_row.find_elements_by_tag_name('td')[1:] 
             ] for element_row in element_rows 
         }
-        df_row[f'{col}_category'] = json.dumps(dict_data)
+        card_row[f'{col}_category'] = json.dumps(dict_data)
         logger.debug(f'----- Added ({col}) categories!') 
             
     except Exception: 
         logger.warn(f'Unable to extract full data for ({col}) due to exception or data not exist.') 
 
-    return df_row
+    return card_row
 
 
+@traced()
 def _extract_list_data_for_card(
-        df_row:pd.DataFrame, ls_headers:List, ls_cols:List, xpath:Text, browser:WebDriver
-    ) -> pd.DataFrame: 
+        card_row:CardRecord, ls_headers:List, ls_cols:List, xpath:Text, browser:WebDriver
+    ) -> CardRecord: 
     '''
     Purpose :
         Helper function for extracting data from a list within HTML. 
 
     Args    : 
-        df_row      : Dataframe to append the values to. 
+        card_row    : Card record to assign the values to. 
         ls_headers  : A list of header names to extract the data from. 
         ls_cols     : A list of dataframe column names to assign the data to. 
         xpath       : Path to the HTML tags. 
         browser     : A Selenium object to open the browser. 
 
     Output  : 
-        Updated dataframe after appending the values. 
+        Updated card record after assigning the values. 
     '''
 
     logger.info('Start scraping (Requirements)!')
@@ -144,55 +173,56 @@ def _extract_list_data_for_card(
                 logger.debug(f'----- Check the header name -- ({header.text}) vs ({compared_header})!') 
                 if header.text == compared_header: 
                     ls_data = [data.text for data in element_data.find_elements_by_tag_name('li')] 
-                    df_row[f'{col}'] = ' | '.join(ls_data) 
+                    card_row[f'{col}'] = ' | '.join(ls_data) 
                     logger.debug(f'----- Added ({header.text}) with the value ({ls_data})!') 
 
     except Exception: 
         logger.warn(f'Unable to extract full data for ({col}) due to exception or data not exist.') 
 
-    return df_row
+    return card_row
 
 
-def _extract_img_for_card(df_row:pd.DataFrame, xpath:Text, browser:WebDriver): 
+@traced()
+def _extract_img_for_card(card_row:CardRecord, xpath:Text, browser:WebDriver) -> CardRecord: 
     '''
     Purpose :
         Helper function for extracting data from a list within HTML. 
 
     Args    : 
-        df_row      : Dataframe to append the values to. 
+        card_row    : Card record to assign the values to. 
         xpath       : Path to the HTML tags. 
         browser     : A Selenium object to open the browser. 
 
     Output  : 
-        Updated dataframe after appending the values. 
+        Updated card record after assigning the values. 
     '''
 
     # Extract card image and assign value to the designated column. 
     logger.info('Start scraping (Image)!')
     element_img = browser.find_element_by_xpath(xpath)
-    df_row[DF_IMG] = element_img.get_attribute('src')
-    df_row[DF_IMG] = df_row[DF_IMG].str.replace(r'®|¬Æ', '') 
+    card_row[DF_IMG] = re.sub(r'®|¬Æ', '', element_img.get_attribute('src')) 
     logger.debug(f'''----- Added an image ({element_img.get_attribute('alt')})!''')
 
-    return df_row
+    return card_row
 
 
+@traced()
 def _extract_summary_data_for_card(
-        df_row:pd.DataFrame, 
+        card_row:CardRecord, 
         xpath:Text, 
         browser:WebDriver
-    ) -> pd.DataFrame: 
+    ) -> CardRecord: 
     '''
     Purpose :
         Helper function for extracting data from a list within HTML. 
 
     Args    : 
-        df_row      : Dataframe to append the values to. 
+        card_row    : Card record to assign the values to. 
         xpath       : Path to the HTML tags. 
         browser     : A Selenium object to open the browser. 
 
     Output  : 
-        Updated dataframe after appending the values. 
+        Updated card record after assigning the values. 
     '''
 
     logger.debug('Start scraping (Summary)!')
@@ -205,116 +235,351 @@ def _extract_summary_data_for_card(
         if re.match(r'(?i)Min\. Income\*?', header.text):
             data = data.find_element_by_tag_name('span')
             processed_value = float( str(data.text).replace('RM', '').replace(',', '') )
-            df_row[DF_REQUIRED_INC] = processed_value
+            card_row[DF_REQUIRED_INC] = processed_value
             logger.debug(f'----- Added ({header.text}) with the value ({processed_value})!')
 
         elif re.match(r'(?i)Annual Fee\*?', header.text):
-            df_row[DF_COST_FEE] = data.text
-            df_row[DF_COST_FEE_COND] = 'not_free'
+            card_row[DF_COST_FEE] = data.text
+            card_row[DF_COST_FEE_COND] = 'not_free'
             if re.match(r'(?i)Free\*?', data.text): 
-                df_row[DF_COST_FEE] = '0'
-                df_row[DF_COST_FEE_COND] = data.text.lower()
+                card_row[DF_COST_FEE] = '0'
+                card_row[DF_COST_FEE_COND] = data.text.lower()
             logger.debug(f'----- Added ({header.text}) with the value ({data.text})!')
 
         elif re.match(r'(?i)Interest Rate\*?', header.text):
-            df_row[DF_COST_CARD_INT_RATE] = data.text
+            card_row[DF_COST_CARD_INT_RATE] = data.text
             logger.debug(f'----- Added ({header.text}) with the value ({data.text})!')
 
-    return df_row
+    return card_row
 
 
-def _compile_initial_data_for_card(
-        df_row:pd.DataFrame, 
-        url:Text, 
+@traced()
+def _extract_card_data_per_element(card_row:CardRecord, browser:WebDriver) -> CardRecord: 
+    '''
+    Purpose :
+        Extract the card data one element at a time. Slower than the batch extraction 
+        as each element is a round trip to the driver, so only used as a fallback. 
+
+    Args    : 
+        card_row : Card record to assign the values to. 
+        browser  : A Selenium object to open the browser. 
+
+    Output  : 
+        Updated card record after assigning the scraped data. 
+    '''
+
+    try:
+        # Extract card image and assign value to the designated column. 
+        card_row = _extract_img_for_card(card_row, xpath=XPATH_CARD_IMG, browser=browser)
+
+        # Extract the data from the summary section and assign value to the designated column. 
+        card_row = _extract_summary_data_for_card(card_row, xpath=XPATH_CARD_SUMMARY, browser=browser) 
+
+        # Extract requirement and assign value to the designated column. 
+        card_row = _extract_list_data_for_card(
+            card_row, 
+            ls_headers=LS_REQUIREMENT_HEADERS, 
+            ls_cols=LS_REQUIREMENT_COLS, 
+            xpath=XPATH_CARD_REQUIREMENTS, 
+            browser=browser, 
+        )
+
+        # Extract reward info and assign value to the designated column. 
+        card_row = _extract_table_data_for_card(card_row, col=DF_REWARD, id_tag='''rewards''', browser=browser)
+
+        # Extract cashback info and assign value to the designated column. 
+        card_row = _extract_table_data_for_card(card_row, col=DF_CASHBACK, id_tag='''cashback''', browser=browser)
+
+        # Extract travel benefit info and assign value to the designated column. 
+        card_row = _extract_table_data_for_card(card_row, col=DF_TRAVEL_BENEFIT, id_tag='''travel''', browser=browser)
+
+        # Extract premium info and assign value to the designated column. 
+        card_row = _extract_table_data_for_card(card_row, col=DF_PREMIUM, id_tag='''premium''', browser=browser)
+
+        # Extract petrol info and assign value to the designated column. 
+        card_row = _extract_table_data_for_card(card_row, col=DF_PETROL, id_tag='''petrol''', browser=browser)
+
+    except Exception:
+        logger.exception('Unable to scrape specific data due to exception.') 
+
+    return card_row
+
+
+
+# %%
+# -------------------------------------------------------
+# Batch extraction
+# -------------------------------------------------------
+
+# Collect every section of the card webpage as a single JSON document so that 
+# the whole page costs one round trip to the driver. 
+#   arguments[0] : XPath to the card image. 
+#   arguments[1] : XPath to the summary section. 
+#   arguments[2] : XPath to the requirements section. 
+#   arguments[3] : A list of HTML id tags for the tables. 
+JS_EXTRACT_CARD_DOCUMENT = '''
+const text = (el) => el ? el.innerText.trim() : null;
+const byXPath = (xpath) => document.evaluate(
+    xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+).singleNodeValue;
+const pairs = (el) => {
+    if (!el) return null;
+    const headers = el.getElementsByTagName('dt');
+    const cells = el.getElementsByTagName('dd');
+    return Array.from(headers).slice(0, cells.length).map((dt, i) => [dt, cells[i]]);
+};
+
+const img = byXPath(arguments[0]);
+const summary = pairs(byXPath(arguments[1]));
+const requirements = pairs(byXPath(arguments[2]));
+
+const tables = {};
+for (const id of arguments[3]) {
+    const el = document.getElementById(id);
+    if (!el) { tables[id] = null; continue; }
+    const tbody = el.querySelector('tbody');
+    tables[id] = {
+        info: text(el.querySelector('p')),
+        rows: tbody ? Array.from(tbody.getElementsByTagName('tr')).map(
+            (tr) => Array.from(tr.getElementsByTagName('td')).map(text)
+        ) : null,
+    };
+}
+
+return {
+    img: img ? {src: img.src, alt: img.getAttribute('alt')} : null,
+    summary: summary ? summary.map(([dt, dd]) => ({
+        header: text(dt), text: text(dd), span: text(dd.querySelector('span')),
+    })) : null,
+    requirements: requirements ? requirements.map(([dt, dd]) => ({
+        header: text(dt), items: Array.from(dd.getElementsByTagName('li')).map(text),
+    })) : null,
+    tables: tables,
+};
+'''
+
+
+@traced()
+def _extract_card_document(browser:WebDriver) -> Dict: 
+    '''
+    Purpose :
+        Collect the whole card webpage in a single round trip to the driver. 
+
+    Args    : 
+        browser : A Selenium object to open the browser. 
+
+    Output  : 
+        A JSON document with the image, summary, requirements and tables. 
+    '''
+
+    return browser.execute_script(
+        JS_EXTRACT_CARD_DOCUMENT, 
+        XPATH_CARD_IMG, 
+        XPATH_CARD_SUMMARY, 
+        XPATH_CARD_REQUIREMENTS, 
+        [id_tag for _, id_tag in LS_CARD_TABLES], 
+    )
+
+
+
+# %%
+# -------------------------------------------------------
+# Checkpoint
+# -------------------------------------------------------
+
+def _checkpoint_filepath(bank:Text, filepath:Text=CARD_CHECKPOINT_FILEPATH) -> Text: 
+    # Name the log after the bank the same way as the bank column. 
+    return filepath.format(bank=bank.lower().replace(' ', '_'))
+
+
+def _load_checkpoint(
         bank:Text, 
-        card:Text
-    ) -> Tuple[pd.DataFrame, Text]: 
-
-    # Keep a record of the original (unprocessed) card name in the dataframe. 
-    df_row[DF_CARD_NAME_ORIGINAL] = [card] 
-
-    # Convert url str value to slug format to get the url to the card webpage. 
-    card_slug = card.replace("'", '').replace(' &', '').replace(' -', '').replace(':', '').replace('®', '').replace('¬Æ', '')
-    card_slug = card_slug.replace(' ', '-') 
-    card_url = ''.join([url, f'{card_slug}.html'])
-    processed_card_str = card.lower().replace(' ', '_').replace('_-', '').replace('-', '_') 
-
-    # Assign the data to the designated column. 
-    df_row[DF_BANK] = [bank.lower().replace(' ', '_')]
-    df_row[DF_CARD_NAME] = [processed_card_str] 
-    df_row[DF_URL] = [card_url] 
-    logger.debug(f'----- Added ({processed_card_str}) and ({card_url}) for ({bank})!') 
-
-    # Extract and assign the card type to the designated column. 
-    ls_splitted_card_str = processed_card_str.split('_') 
-    for splitted_card_str in ls_splitted_card_str:
-        if splitted_card_str in CARD_TYPE: 
-            df_row[DF_CARD_TYPE] = splitted_card_str 
-            break
-        else: 
-            df_row[DF_CARD_TYPE] = np.nan 
+        max_age_hours:float=CARD_CHECKPOINT_MAX_AGE_HOURS, 
+        filepath:Text=CARD_CHECKPOINT_FILEPATH, 
+    ) -> Dict[Tuple[Text, Text], CardRecord]: 
+    '''
+    Purpose :
+        Read the cards of a bank already scraped from its checkpoint log. 
 
-    return df_row, card_url
+    Args    : 
+        bank          : Bank name. 
+        max_age_hours : Leave out the cards logged more than this many hours ago. 
+        filepath      : Path to the checkpoint logs, with a "{bank}" placeholder. 
 
+    Output  : 
+        The card records keyed by bank name and card name. 
+    '''
 
-def _save_data_for_card(
-        df_main:pd.DataFrame, 
-        dict_data:Dict[Text, List[Text]], 
-        idx_bank:int, 
-        idx_item:int, 
-        ls_banks:List[Text], 
+    dict_records = {}
+    filepath = _checkpoint_filepath(bank, filepath)
+    if not os.path.exists(filepath): 
+        return dict_records
+
+    oldest = (dt.datetime.now() - dt.timedelta(hours=max_age_hours)).isoformat(timespec='seconds')
+    stale = 0
+    line = '\n'
+    with open(filepath) as f: 
+        for line in f: 
+            # Skip a line cut short by a crash while it was being written. 
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f'Skipped a partial line in the checkpoint log ({filepath}).') 
+                continue
+            if record['timestamp'] < oldest: 
+                stale += 1
+                continue
+            dict_records[(record['bank'], record['card'])] = CardRecord.from_dict(record['row'])
+
+    # Terminate the partial line so that the next card starts on a line of its own. Only 
+    # the task of the bank writes to its log, and it hasn't started scraping yet. 
+    if not line.endswith('\n'): 
+        with open(filepath, 'a') as f: 
+            f.write('\n')
+
+    if stale: 
+        logger.warning(f'Left out ({stale}) cards logged before ({oldest}) in the checkpoint log ({filepath}).') 
+    logger.info(f'Loaded ({len(dict_records)}) cards of ({bank}) from the checkpoint log!') 
+    return dict_records
+
+
+def _remove_checkpoint(bank:Text, filepath:Text=CARD_CHECKPOINT_FILEPATH) -> None: 
+    # Only remove the log of the bank, the other banks may still be writing to theirs. 
+    filepath = _checkpoint_filepath(bank, filepath)
+    if os.path.exists(filepath): 
+        os.remove(filepath)
+
+
+@traced('checkpoint.append')
+def _append_checkpoint(
+        card_row:CardRecord, 
         bank:Text, 
-    ) -> Tuple[pd.DataFrame, bool]: 
+        card:Text, 
+        filepath:Text=CARD_CHECKPOINT_FILEPATH, 
+    ) -> None: 
+    '''
+    Purpose :
+        Append a scraped card to the checkpoint log. Only the new card is 
+        written, so a checkpoint costs the same regardless of the progress. 
 
+    Args    : 
+        card_row : Card record with the scraped data. 
+        bank     : Bank name. 
+        card     : Key of the card on the bank listing page (see card_parsing.parse_listing_records). 
+        filepath : Path to the checkpoint logs, with a "{bank}" placeholder. 
+    '''
+
+    record = {
+        'timestamp': dt.datetime.now().isoformat(timespec='seconds'), 
+        'bank': bank, 
+        'card': card, 
+        'row': card_row.to_dict(), 
+    }
+    with open(_checkpoint_filepath(bank, filepath), 'a') as f: 
+        f.write(json.dumps(record, default=str) + '\n')
+        f.flush()
+    logger.debug(f'----- Saved the checkpoint for ({bank}) -- ({card})!') 
+
+
+def _load_previous_card_data(
+        bank:Text, 
+        parquet_filepath:Text=CARD_PARQUET_FILEPATH, 
+        csv_filepath:Text=CARD_DF_FILEPATH, 
+    ) -> Optional[pd.DataFrame]: 
+    # Read the rows of the bank from the last saved card data, from the CSV if the 
+    # card data hasn't been saved as Parquet yet. 
+    bank_key = bank.lower().replace(' ', '_')
+    if os.path.exists(parquet_filepath): 
+        df_previous = load_table(parquet_filepath, filters=[(DF_BANK, '==', bank_key)])
+    elif os.path.exists(csv_filepath): 
+        df_previous = pd.read_csv(csv_filepath, dtype=str)
+        df_previous = df_previous[df_previous[DF_BANK] == bank_key]
+    else: 
+        return None
+
+    # Keep the values as plain objects, like the scraped ones. 
+    df_previous = df_previous.astype(object)
+    return df_previous.where(df_previous.notnull(), np.nan)
+
+
+@traced('checkpoint.carry_forward')
+def _carry_forward_cards(
+        bank:Text, 
+        dict_cards:Dict[Text, Dict], 
+        max_age_days:int=SCRAPE_MAX_AGE_DAYS, 
+    ) -> Dict[Tuple[Text, Text], CardRecord]: 
     '''
     Purpose :
-        Start scraping card data. 
+        Find the cards of the last saved card data whose listing hasn't changed, so 
+        that their webpage isn't scraped again. 
 
     Args    : 
-        df_main     : The main
-        dict_data : A dict obj containing the bank names and card names.  
-                    Example: 
-                        {
-                            bank_name: [
-                                card_name_1, 
-                                card_name_2, 
-                                card_name_3
-                            ]
-                        }
-        idx_bank    : The current list index of the bank name. 
-        idx_item    : The current list index of the card. 
-        ls_banks    : A list of banks to scrape the relevant data from.
-        bank        : Bank name. 
+        bank         : Bank name. 
+        dict_cards   : Listing records of the cards of the bank keyed by card, with the 
+                       fingerprint of each. 
+        max_age_days : Scrape a card again once its row is older than this many days. 
 
     Output  : 
-        Updated dataframe (partially completed or completed) and a boolean
-        to indicate whether the scraping has completed or not. 
+        The card records to reuse, keyed by bank name and card like the checkpoint. 
     '''
 
-    # Save the scraping checkpoint. 
-    scrape_completed = False
-    df_main.to_csv(f'{CARD_CHECKPOINT_DIR}/df_card_checkpoint_{idx_bank}_{idx_item}.csv', index=False) 
-    logger.info(f'Saved the checkpoint ({idx_bank}) -- ({idx_item})!') 
+    df_previous = _load_previous_card_data(bank)
+    if df_previous is None or DF_LISTING_FINGERPRINT not in df_previous.columns: 
+        return {}
 
-    # Save the complete dataframe if the scraping procedure has completed. 
-    if (idx_bank == len(ls_banks) - 1) and (idx_item == len(dict_data[bank]) - 1):
-        scrape_completed = True
-        df_main.to_csv(CARD_DF_FILEPATH, index=False)  
-        logger.info(f'Saved the complete dataframe as version ({DF_CARD_VERSION})!') 
+    # The fingerprint covers the name and the link of the card, so a row is matched to 
+    # its card by the fingerprint alone. 
+    dict_keys = {dict_listing['fingerprint']: key for key, dict_listing in dict_cards.items()}
+    oldest = (dt.date.today() - dt.timedelta(days=max_age_days)).isoformat()
+    dict_records = {}
+    for dict_row in df_previous.to_dict('records'): 
+        key = dict_keys.get(dict_row[DF_LISTING_FINGERPRINT])
+        if key is not None and isinstance(dict_row.get(DF_SCRAPED_AT), str) and dict_row[DF_SCRAPED_AT] >= oldest: 
+            dict_records[(bank, key)] = CardRecord.from_dict(dict_row)
 
-    return df_main, scrape_completed
+    logger.info(f'Carried forward ({len(dict_records)} / {len(dict_cards)}) unchanged cards of ({bank}).') 
+    metrics.increment('carried_cards', len(dict_records))
+    return dict_records
 
 
+@traced('checkpoint.save')
+def _save_data_for_card(
+        df_main:pd.DataFrame, 
+        ls_banks:List[Text], 
+        filepath:Text=CARD_CHECKPOINT_FILEPATH, 
+    ) -> pd.DataFrame: 
+    '''
+    Purpose :
+        Save the complete dataframe once the scraping procedure has completed. 
+
+    Args    : 
+        df_main  : The card dataframe of every bank. 
+        ls_banks : Banks in the dataframe, whose checkpoint log is removed once it is saved. 
+        filepath : Path to the checkpoint logs, with a "{bank}" placeholder. 
+
+    Output  : 
+        The complete dataframe. 
+    '''
+
+    save_table(df_main, TABLE_CARD, CARD_PARQUET_FILEPATH, CARD_DF_FILEPATH)  
+    logger.info(f'Saved the complete dataframe as version ({DF_CARD_VERSION})!') 
+
+    # The next run starts from scratch now that the checkpoints aren't needed anymore. 
+    for bank in ls_banks: 
+        _remove_checkpoint(bank, filepath)
+
+    return df_main
+
 
 # %%
 # -------------------------------------------------------
 # Card scraper 
 # -------------------------------------------------------
 
-@wait_for_webpage_to_load
+@wait_for_webpage_to_load(stage=PAGE_STAGE_CARD)
 def _scrape_card_data(
         url:Text, xpath:Text, browser:Optional[WebDriver]=None, **kwargs
-    ) -> pd.DataFrame: 
+    ) -> CardRecord: 
     '''
     Purpose :
         Start scraping card data. 
@@ -325,10 +590,10 @@ def _scrape_card_data(
         browser : A Selenium object to open the browser. 
 
     Output  : 
-        Updated dataframe after appending the scraped data to a single row. 
+        Updated card record after assigning the scraped data. 
 
     Notice  :
-        You must assign a dataframe as an additional argument to this function 
+        You must assign a card record as an additional argument to this function 
         via "**kwargs" as a workaround. The reason it is not listed as part of the 
         required arguments is because the wrapper function will throw an error if an 
         additional argument is provided. Even if I make it a required argument for 
@@ -336,54 +601,259 @@ def _scrape_card_data(
         throw an error. 
     '''
 
-    df_row = kwargs['df_row'] 
+    card_row = kwargs['card_row'] 
 
     try:
-        # Extract card image and assign value to the designated column. 
-        df_row = _extract_img_for_card(df_row, xpath='''/html/body/main/header/img''', browser=browser)
+        # Extract every section of the webpage in one round trip and assign the values. 
+        dict_document = _extract_card_document(browser)
+        card_row = fill_row_from_card_document(card_row, dict_document)
 
-        # Extract the data from the summary section and assign value to the designated column. 
-        df_row = _extract_summary_data_for_card(df_row, xpath='''/html/body/main/section[1]''', browser=browser) 
+    except Exception:
+        logger.exception('Unable to extract the card data in one round trip. Fall back to per element extraction.') 
+        card_row = _extract_card_data_per_element(card_row, browser)
 
-        # Extract requirement and assign value to the designated column. 
-        df_row = _extract_list_data_for_card(
-            df_row, 
-            ls_headers=['Mininum Age', 'Who Can Apply'], 
-            ls_cols=[DF_REQUIRED_AGE, DF_REQUIRED_APPLICANT], 
-            xpath='''//*[@id="requirements"]''', 
-            browser=browser, 
-        )
+    return card_row
 
-        # Extract reward info and assign value to the designated column. 
-        df_row = _extract_table_data_for_card(df_row, col=DF_REWARD, id_tag='''rewards''', browser=browser)
 
-        # Extract cashback info and assign value to the designated column. 
-        df_row = _extract_table_data_for_card(df_row, col=DF_CASHBACK, id_tag='''cashback''', browser=browser)
+def _fetch_card_document(card_url:Text) -> Optional[Dict]: 
+    '''
+    Purpose :
+        Fetch and parse the card webpage without a browser. 
 
-        # Extract travel benefit info and assign value to the designated column. 
-        df_row = _extract_table_data_for_card(df_row, col=DF_TRAVEL_BENEFIT, id_tag='''travel''', browser=browser)
+    Args    : 
+        card_url : URL to the card webpage. 
 
-        # Extract premium info and assign value to the designated column. 
-        df_row = _extract_table_data_for_card(df_row, col=DF_PREMIUM, id_tag='''premium''', browser=browser)
+    Output  : 
+        The card document, or None if the webpage fails to load or validate. 
+    '''
 
-        # Extract petrol info and assign value to the designated column. 
-        df_row = _extract_table_data_for_card(df_row, col=DF_PETROL, id_tag='''petrol''', browser=browser)
+    try:
+        html = fetch_html(card_url)
+    except Exception:
+        logger.exception(f'Unable to fetch ({card_url}) without a browser.') 
+        return None
+
+    dict_document = parse_card_document(html, card_url)
+    if not is_valid_card_document(dict_document): 
+        logger.warning(f'The webpage ({card_url}) fails validation without a browser.') 
+        return None
+
+    return dict_document
+
+
+def _compile_card_from_listing(
+        url:Text, bank:Text, card:Text, dict_listing:Optional[Dict]=None, 
+    ) -> Tuple[CardRecord, Text]: 
+    '''
+    Purpose :
+        Compile the initial data for a card and fill in what its bank listing shows. 
+
+    Args    : 
+        url          : URL to scrape the data from. 
+        bank         : Bank name. 
+        card         : Card name as listed on the bank listing page. 
+        dict_listing : The listing record of the card (see card_parsing.parse_listing_records). 
 
+    Output  : 
+        The card record and the URL to the card webpage, i.e. the link of the listing 
+        if it has one. 
+    '''
+
+    card_row = CardRecord()
+    if dict_listing is None: 
+        return compile_initial_data_for_card(card_row, url, bank, card)
+
+    card_row, card_url = compile_initial_data_for_card(card_row, url, bank, card, dict_listing['href'])
+    return fill_row_from_listing(card_row, dict_listing), card_url
+
+
+def _scrape_single_card(
+        url:Text, bank:Text, card:Text, dict_listing:Optional[Dict]=None, backend:Text=FETCH_BACKEND, 
+    ) -> CardRecord: 
+    '''
+    Purpose :
+        Compile the initial data for a card and scrape its webpage. 
+
+    Args    : 
+        url          : URL to scrape the data from. 
+        bank         : Bank name. 
+        card         : Card name as listed on the bank listing page. 
+        dict_listing : The listing record of the card, to follow its link. 
+        backend      : Fetch the raw HTML over HTTP ("http") or load it in a browser ("selenium"). 
+
+    Output  : 
+        A card record with the scraped data. 
+    '''
+
+    logger.info(f'Start collecting data for ({bank}) -- ({card})!') 
+
+    # Compile the initial data first before scraping the data. 
+    card_row, card_url = _compile_card_from_listing(url, bank, card, dict_listing)
+
+    logger.info(f'Start scraping ({bank}) -- ({card})!')
+
+    # Fetching the raw HTML is much cheaper than a browser, so only fall back to 
+    # the browser when the webpage can't be read that way. 
+    if backend == FETCH_BACKEND_HTTP: 
+        dict_document = _fetch_card_document(card_url)
+        if dict_document is not None: 
+            return fill_row_from_card_document(card_row, dict_document)
+        logger.warning(f'Fall back to the browser for ({card_url}).') 
+        metrics.increment('browser_fallbacks')
+
+    # REFINE: Refine the function for (_scrape_card_data) regarding the (**kwargs). 
+    # For further detail, read the 'Notice' section documented under that function. 
+    return _scrape_card_data(url=card_url, xpath=XPATH_CARD_SUMMARY, card_row=card_row)
+
+
+async def _crawl_single_card(
+        crawler:AsyncCrawler, url:Text, bank:Text, card:Text, dict_listing:Optional[Dict]=None, 
+    ) -> CardRecord: 
+    '''
+    Purpose :
+        Same as (_scrape_single_card) but for the asyncio engine. The webpage is 
+        fetched on the event loop and only the parsing or the browser fallback 
+        runs in a worker thread. 
+
+    Args    : 
+        crawler      : The running async crawler. 
+        url          : URL to scrape the data from. 
+        bank         : Bank name. 
+        card         : Card name as listed on the bank listing page. 
+        dict_listing : The listing record of the card, to follow its link. 
+
+    Output  : 
+        A card record with the scraped data. 
+    '''
+
+    logger.info(f'Start crawling ({bank}) -- ({card})!') 
+
+    # Compile the initial data first before scraping the data. 
+    card_row, card_url = _compile_card_from_listing(url, bank, card, dict_listing)
+
+    try:
+        html = await crawler.fetch_html(card_url)
+        dict_document = await crawler.run_blocking(parse_card_document, html, card_url)
+        if is_valid_card_document(dict_document): 
+            return fill_row_from_card_document(card_row, dict_document)
+        logger.warning(f'The webpage ({card_url}) fails validation without a browser.') 
     except Exception:
-        logger.exception('Unable to scrape specific data due to exception.') 
-    
-    browser.quit()
-    return df_row
+        logger.exception(f'Unable to fetch ({card_url}) without a browser.') 
+
+    logger.warning(f'Fall back to the browser for ({card_url}).') 
+    metrics.increment('browser_fallbacks')
+    return await crawler.run_blocking(
+        partial(_scrape_card_data, url=card_url, xpath=XPATH_CARD_SUMMARY, card_row=card_row)
+    )
+
+
+def _scrape_cards(
+        url:Text, 
+        ls_banks:List[Text], 
+        dict_data:Dict[Text, Dict[Text, Dict]], 
+        dict_checkpoint:Dict[Tuple[Text, Text], CardRecord], 
+        workers:int=CARD_SCRAPING_WORKERS, 
+        engine:Text=CRAWL_ENGINE, 
+        listing_only:bool=SCRAPE_LISTING_ONLY, 
+    ) -> Tuple[List[CardRecord], List[Tuple[Text, Text]]]: 
+    '''
+    Purpose :
+        Scrape the cards of the banks, skipping the cards already in the checkpoint. 
+
+    Args    : 
+        url             : URL to scrape the data from. 
+        ls_banks        : A list of banks to scrape the relevant data from. 
+        dict_data       : A dict obj containing the listing records of the cards of each bank, 
+                          keyed by link (see card_parsing.index_listing_records). 
+        dict_checkpoint : The cards scraped by a previous run, keyed by (bank, key) likewise. 
+        workers         : Number of cards to scrape in parallel. 
+        engine          : Scrape with a thread pool ("threads") or an event loop ("asyncio"). 
+        listing_only    : Build the rows from the listing records without opening the card webpages. 
 
+    Output  : 
+        The card records in the listing order, and the (bank, key) pairs of the cards that 
+        failed, keyed like the checkpoint. 
+    '''
+
+    ls_records:List[CardRecord] = []
+    ls_failed:List[Tuple[Text, Text]] = []
+
+    # The card name and the listing record of a card, from its key. 
+    listing = lambda bank, key: (dict_data[bank][key]['card'], dict_data[bank][key])
+
+    # Both engines return a future for each card, so the rows are collected the same way. 
+    if listing_only: 
+        # Nothing is fetched, so a single thread builds the rows from the listing records. 
+        executor = ThreadPoolExecutor(max_workers=1)
+        submit = lambda bank, key: executor.submit(lambda: _compile_card_from_listing(url, bank, *listing(bank, key))[0])
+    elif engine == CRAWL_ENGINE_ASYNCIO: 
+        executor = AsyncCrawler()
+        submit = lambda bank, key: executor.submit(_crawl_single_card, executor, url, bank, *listing(bank, key))
+    else: 
+        executor = ThreadPoolExecutor(max_workers=workers)
+        submit = lambda bank, key: executor.submit(_scrape_single_card, url, bank, *listing(bank, key))
+
+    with executor: 
+        # Submit every card up front so the workers don't idle between banks. 
+        # And only scrape from banks that are confirmed by the client. 
+        dict_futures = {
+            bank: [
+                None if (bank, key) in dict_checkpoint else submit(bank, key) 
+                for key in dict_data[bank]
+            ] for bank in ls_banks
+        }
 
-@task(
-    cache_for=dt.timedelta(days=1), 
-    result=LocalResult(dir="result_config"), 
-    checkpoint=True, 
-    target="{task_name}–{date}", 
+        # Collect the rows in the listing order so the output is deterministic 
+        # regardless of which card finishes first. 
+        for bank in ls_banks:
+            for key, future in zip(dict_data[bank], dict_futures[bank]):
+                card = dict_data[bank][key]['card']
+
+                # Reuse the card scraped by a previous run. 
+                if future is None: 
+                    ls_records.append(dict_checkpoint[(bank, key)])
+                    continue
+
+                # NOTICE: 
+                #   You can choose to include code to send an email / a notification 
+                #   of the error message if the scraping fails. 
+                try:
+                    card_row = future.result()
+
+                    # Collect the row, the dataframe is only built once at the end. A row 
+                    # built from the listing alone is cheap to build again, so it isn't kept. 
+                    ls_records.append(card_row)
+                    if not listing_only: 
+                        _append_checkpoint(card_row, bank, key)
+                    logger.debug(f'----- Added a new row to (ls_records)!') 
+
+                except Exception:
+                    # Leave the card out so that it doesn't hold back the other cards. 
+                    logger.exception(f'Unable to scrape ({bank}) -- ({card}) -- ({key}) due to exception.') 
+                    metrics.increment('failed_cards')
+                    ls_failed.append((bank, key))
+
+            logger.info(f'Completed ({bank}) -- ({len(ls_records)}) cards so far!') 
+
+    return ls_records, ls_failed
+
+
+@lazy_task(
+    target=task_target(
+        ls_inputs=['url', 'ls_banks', 'dict_data'], 
+        ls_config=['CARD_TYPE', 'CARD_DATA', 'HTML_PARSER', 'DF_CARD_VERSION', 'PIPELINE_VERSION'], 
+        ls_code=['autoscrape_data.card_scraping', 'autoscrape_data.card_parsing', 'autoscrape_data.card_record'], 
+        period=TASK_CACHE_SCRAPE_PERIOD, 
+    ), 
 )
+@traced('task.card_scraping_procedure')
 def card_scraping_procedure(
-        url:Text, ls_banks:List[Text], dict_data:Dict[Text, List], 
+        url:Text, 
+        ls_banks:List[Text], 
+        dict_data:Dict[Text, Dict[Text, Dict]], 
+        workers:int=CARD_SCRAPING_WORKERS, 
+        engine:Text=CRAWL_ENGINE, 
+        resume:bool=CARD_CHECKPOINT_RESUME, 
     ) -> pd.DataFrame: 
 
     '''
@@ -393,57 +863,140 @@ def card_scraping_procedure(
     Args    : 
         url       : URL to scrape the data from. 
         ls_banks  : A list of banks to scrape the relevant data from.  
-        dict_data : A dict obj containing the bank names and card names.  
+        dict_data : A dict obj containing the bank names and the listing records of 
+                    their cards (see card_parsing.parse_listing_records). 
                     Example: 
                         {
-                            bank_name: [
-                                card_name_1, 
-                                card_name_2, 
-                                card_name_3
-                            ]
+                            bank_name: {
+                                card_url_1: {"card": card_name_1, "href": card_url_1, "img": ..., "summary": ..., "fingerprint": ...}, 
+                                card_url_2: {"card": card_name_2, "href": card_url_2, "img": ..., "summary": ..., "fingerprint": ...}, 
+                            }
                         }
+        workers   : Number of cards to scrape in parallel. Pages on the same host are 
+                    further capped by (MAX_CONCURRENT_REQUESTS_PER_HOST). 
+        engine    : Scrape with a thread pool of (workers) threads ("threads") or keep 
+                    many requests in flight on an event loop ("asyncio"). 
+        resume    : Skip the cards already in the checkpoint log, e.g. after a crash. 
+                    Otherwise start a new checkpoint log. 
     
     Output  : 
         The complete dataframe containing all the scraped data for each bank. 
     '''
 
-    df_main = pd.DataFrame(CARD_DATA)
-    save_df = True
+    # Every scraped card is appended to the checkpoint log, so a rerun only 
+    # scrapes the cards that are missing from it. 
+    os.makedirs(CARD_CHECKPOINT_DIR, exist_ok=True)
+    dict_checkpoint = {}
+    for bank in ls_banks: 
+        if resume: 
+            dict_checkpoint.update(_load_checkpoint(bank))
+        else: 
+            _remove_checkpoint(bank)
+
+    ls_records, _ = _scrape_cards(url, ls_banks, dict_data, dict_checkpoint, workers, engine)
+    return _save_data_for_card(records_to_dataframe(ls_records), ls_banks) 
 
-    # Compile the relevant data for each credit card for each bank. 
-    # And only scrape from banks that are confirmed by the client. 
-    for idx_bank, bank in enumerate(ls_banks):
-        for idx_card, card in enumerate(dict_data[bank]):
-            # NOTICE: 
-            #   You can choose to include code to send an email / a notification 
-            #   of the error message if the scraping fails. 
-            try:
-                logger.info(f'Start collecting data for ({bank}) -- ({card})!') 
-
-                # Compile the initial data first before scraping the data. 
-                df_row = pd.DataFrame(CARD_DATA)
-                df_row, card_url = _compile_initial_data_for_card(df_row, url, bank, card)
-
-                logger.info(f'Start scraping ({idx_card}) -- ({card})!')
-
-                # REFINE: Refine the function for (_scrape_card_data) regarding the (**kwargs). 
-                # For further detail, read the 'Notice' section documented under that function. 
-                df_row = _scrape_card_data(url=card_url, xpath='''/html/body/main/section[1]''', df_row=df_row)
-                
-                # Append a new row to the main dataframe. 
-                df_main = pd.concat([df_main, df_row], ignore_index=True).copy() 
-                logger.debug(f'----- Added a new row to (df_main)!') 
-
-            except Exception:
-                # Don't save the dataframe if there's an error / exception. 
-                save_df = False
-                logger.exception('Unable to complete the scraping procedure due to exception.') 
-                break 
-
-        if save_df: 
-            df_main, scrape_completed = _save_data_for_card(df_main, dict_data, idx_bank, idx_card, ls_banks, bank)
-            if scrape_completed: 
-                return df_main 
-        else:
-            logger.error('Skipped file save due to exception. Please resolve the error to proceed.') 
-            break 
+
+@lazy_task(
+    target=task_target(
+        ls_inputs=['url', 'bank', 'dict_cards'], 
+        ls_config=['CARD_TYPE', 'CARD_DATA', 'HTML_PARSER', 'DF_CARD_VERSION', 'PIPELINE_VERSION', 'SCRAPE_INCREMENTAL', 'SCRAPE_MAX_AGE_DAYS', 'SCRAPE_LISTING_ONLY'], 
+        ls_code=['autoscrape_data.card_scraping', 'autoscrape_data.card_parsing', 'autoscrape_data.card_record'], 
+        period=TASK_CACHE_SCRAPE_PERIOD, 
+    ), 
+    max_retries=TASK_MAX_RETRIES, 
+    retry_delay=dt.timedelta(seconds=TASK_RETRY_DELAY), 
+)
+@traced('task.scrape_cards_for_bank')
+def scrape_cards_for_bank(
+        url:Text, 
+        bank:Text, 
+        dict_cards:Dict[Text, Dict], 
+        workers:int=CARD_SCRAPING_WORKERS, 
+        engine:Text=CRAWL_ENGINE, 
+        incremental:bool=SCRAPE_INCREMENTAL, 
+        listing_only:bool=SCRAPE_LISTING_ONLY, 
+    ) -> pd.DataFrame: 
+    '''
+    Purpose :
+        Same as (card_scraping_procedure) but for a single bank, so that the flow can 
+        map it over the banks and process each bank as soon as its cards are scraped. 
+
+    Args    : 
+        url         : URL to scrape the data from. 
+        bank        : Bank name. 
+        dict_cards   : Listing records of the cards of the bank (see card_parsing.parse_listing_records). 
+        workers      : Number of cards to scrape in parallel. 
+        engine       : Scrape with a thread pool ("threads") or an event loop ("asyncio"). 
+        incremental  : Only scrape the cards that are new or whose listing has changed since 
+                       the last saved card data, and keep the rows of the others. 
+        listing_only : Build the rows of the new and changed cards from their listing record 
+                       alone, without opening their webpage. 
+
+    Output  : 
+        The card dataframe of the bank. 
+
+    Notice  :
+        The cards that fail make the task fail while it has retries left. Every 
+        scraped card is in the checkpoint log, so a retry only scrapes the cards 
+        that failed. The last attempt keeps the cards it could scrape. 
+    '''
+
+    os.makedirs(CARD_CHECKPOINT_DIR, exist_ok=True)
+    dict_checkpoint = _load_checkpoint(bank)
+
+    # The unchanged cards are skipped the same way as the ones in the checkpoint. 
+    if incremental: 
+        dict_checkpoint = {**_carry_forward_cards(bank, dict_cards), **dict_checkpoint}
+
+    ls_records, ls_failed = _scrape_cards(url, [bank], {bank: dict_cards}, dict_checkpoint, workers, engine, listing_only)
+
+    # Each row keeps the fingerprint of its listing to compare with on the next run. A 
+    # carried forward card keeps the date it was scraped on. A row built from the listing 
+    # alone is left without a fingerprint, so that a full run scrapes its webpage. 
+    today = dt.date.today().isoformat()
+    for card_row in ls_records: 
+        if not isinstance(card_row[DF_SCRAPED_AT], str): 
+            card_row[DF_SCRAPED_AT] = today
+            if listing_only: 
+                card_row[DF_LISTING_FINGERPRINT] = np.nan
+
+    # Prefect is only loaded once the task runs in a flow. Run on its own (run), the 
+    # task has no retry left, so it keeps the cards it could scrape. 
+    prefect = sys.modules.get('prefect')
+    run_count = prefect.context.get('task_run_count') if prefect is not None else None
+    if ls_failed and run_count is not None and run_count <= TASK_MAX_RETRIES: 
+        metrics.increment('retries', backend='bank')
+        ls_keys = [key for _, key in ls_failed]
+        raise RuntimeError(f'Unable to scrape ({len(ls_failed)}) cards of ({bank}) -- ({ls_keys}), retry the bank.')
+
+    return records_to_dataframe(ls_records)
+
+
+@lazy_task(
+    target=task_target(
+        ls_inputs=['ls_df_card'], 
+        ls_config=['DF_CARD_VERSION', 'PIPELINE_VERSION'], 
+        ls_code=['autoscrape_data.card_scraping', 'autoscrape_data.card_record'], 
+    ), 
+)
+@traced('task.save_card_data')
+def save_card_data(ls_df_card:List[pd.DataFrame]) -> pd.DataFrame: 
+    '''
+    Purpose :
+        Combine the card dataframes of each bank and save the complete dataframe. 
+
+    Args    : 
+        ls_df_card : The card dataframe of each bank. 
+
+    Output  : 
+        The complete dataframe. 
+    '''
+
+    if not ls_df_card: 
+        return _save_data_for_card(records_to_dataframe([]), [])
+
+    # Keep the (CARD_DATA) columns first, like a dataframe built from the records. 
+    df_main = pd.concat(ls_df_card, ignore_index=True, sort=False)
+    df_main = df_main[[*CARD_DATA, *(col for col in df_main.columns if col not in CARD_DATA)]]
+    return _save_data_for_card(df_main, list(df_main[DF_BANK].dropna().unique()))
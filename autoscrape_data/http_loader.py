@@ -0,0 +1,144 @@
+# %%
+import logging 
+import threading
+from typing import Optional, Text
+
+# For fetching the webpages. 
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Import personal module. 
+from autoscrape_data.rate_limiting import host_slot
+from autoscrape_data.snapshot_store import save_snapshot
+from config.config_logger import setup_logger
+from config.config_metrics import metrics
+from config.config import (
+    LOG_HTTP_FILEPATH, 
+    MAX_CONCURRENT_REQUESTS_PER_HOST, 
+    HTTP_TIMEOUT, 
+    HTTP_RETRIES, 
+    HTTP_POOL_CONNECTIONS, 
+    HTTP_POOL_MAXSIZE, 
+    HTTP_USER_AGENT, 
+    SAVE_SNAPSHOTS, 
+)
+
+
+
+# %%
+# --------------------------------------------------------------
+# Logging configuration 
+# --------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+logger, file_handler, stream_handler = setup_logger(logger, LOG_HTTP_FILEPATH) 
+
+
+
+# %%
+# -------------------------------------------------------
+# Session
+# -------------------------------------------------------
+
+# Fetch backends. 
+FETCH_BACKEND_HTTP = 'http'
+FETCH_BACKEND_SELENIUM = 'selenium'
+
+_session:Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session: 
+    '''
+    Purpose :
+        Get the session shared by every scraper in this process. Connections are 
+        kept alive and reused from a bounded pool, responses are gzip encoded, and 
+        transient errors are retried with a backoff. 
+    '''
+
+    global _session
+    with _session_lock: 
+        if _session is None: 
+            retry = Retry(
+                total=HTTP_RETRIES, 
+                backoff_factor=0.5, 
+                status_forcelist=[429, 500, 502, 503, 504], 
+            )
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_CONNECTIONS, 
+                pool_maxsize=HTTP_POOL_MAXSIZE, 
+                pool_block=True, 
+                max_retries=retry, 
+            )
+            _session = requests.Session()
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+            _session.headers.update({
+                'User-Agent': HTTP_USER_AGENT, 
+                'Accept-Encoding': 'gzip, deflate', 
+                'Connection': 'keep-alive', 
+            })
+        return _session
+
+
+def close_http_session() -> None: 
+    '''
+    Purpose :
+        Close the pooled connections of the shared session. 
+    '''
+
+    global _session
+    with _session_lock: 
+        if _session is not None: 
+            _session.close()
+            _session = None
+
+
+
+# %%
+# -------------------------------------------------------
+# Loader
+# -------------------------------------------------------
+
+def fetch_html(
+        url:Text, 
+        timeout:float=HTTP_TIMEOUT, 
+        per_host:int=MAX_CONCURRENT_REQUESTS_PER_HOST, 
+        save_snapshots:bool=SAVE_SNAPSHOTS, 
+    ) -> Text: 
+    '''
+    Purpose :
+        Fetch the raw HTML of a webpage without a browser. 
+
+    Args    : 
+        url            : URL of the webpage. 
+        timeout        : Seconds to wait for the server. 
+        per_host       : Maximum number of concurrent page loads per host. 
+        save_snapshots : Keep the raw HTML in the snapshot store. 
+
+    Output  : 
+        Raw HTML of the webpage. Raise an HTTPError for an error status. 
+    '''
+
+    with host_slot(url, per_host), metrics.span('http.fetch', url=url): 
+        try:
+            response = get_http_session().get(url, timeout=timeout)
+        except requests.Timeout:
+            metrics.increment('timeouts', stage='http')
+            raise
+    response.raise_for_status()
+
+    # The session retries on its own, so count the retries it took. 
+    if response.raw.retries is not None and response.raw.retries.history: 
+        metrics.increment('retries', len(response.raw.retries.history), backend='http')
+    logger.debug(f'----- Fetched ({url}) -- ({len(response.content)} bytes) in ({response.elapsed.total_seconds()}s)')
+
+    # Keep the raw HTML so the data can be parsed again without the live site. 
+    if save_snapshots: 
+        try:
+            save_snapshot(url, response.text)
+        except Exception:
+            logger.exception(f'Unable to save the snapshot for ({url}).')
+
+    return response.text
@@ -0,0 +1,324 @@
+# %%
+import logging
+import datetime as dt
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Text, Tuple
+from urllib.parse import urljoin, urlsplit
+
+# For storing the images. 
+import os, hashlib, json, mimetypes, threading
+
+# For data processing and analysis. 
+import pandas as pd
+
+# Import personal module. 
+from autoscrape_data.http_loader import get_http_session
+from autoscrape_data.rate_limiting import SLOT_IMAGE, host_slot
+from autoprocess_data.columnar_storage import TABLE_CARD, save_table
+from config.config_logger import setup_logger
+from config.config_metrics import metrics, traced
+from config.config_task_cache import lazy_task, task_target
+from config.config import ( 
+    LOG_IMAGE_STORE_FILEPATH, 
+    IMAGE_DIR, 
+    IMAGE_MANIFEST_FILEPATH, 
+    IMAGE_DOWNLOAD_WORKERS, 
+    IMAGE_THUMBNAIL_SIZE, 
+    IMAGE_THUMBNAIL_WORKERS, 
+    HTTP_TIMEOUT, 
+    CARD_DF_FILEPATH, 
+    CARD_PARQUET_FILEPATH, 
+    TASK_CACHE_SCRAPE_PERIOD, 
+)
+from config.config_naming import ( 
+    DF_URL, 
+    DF_IMG, 
+    DF_IMG_PATH, 
+    DF_IMG_THUMBNAIL_PATH, 
+)
+
+
+
+# %%
+# --------------------------------------------------------------
+# Logging configuration 
+# --------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+logger, file_handler, stream_handler = setup_logger(logger, LOG_IMAGE_STORE_FILEPATH)
+
+
+
+# %%
+# -------------------------------------------------------
+# Image store 
+# -------------------------------------------------------
+
+def _image_filepath(digest:Text, ext:Text, image_dir:Text) -> Text:
+    # Fan out by the first 2 characters so that no folder holds too many files. 
+    return f'{image_dir}/objects/{digest[:2]}/{digest}{ext}'
+
+
+def _thumbnail_filepath(digest:Text, size:Tuple[int, int], image_dir:Text) -> Text:
+    return f'{image_dir}/thumbnails/{size[0]}x{size[1]}/{digest[:2]}/{digest}.jpg'
+
+
+def _write_atomic(filepath:Text, content:bytes) -> None:
+    # Write to a temporary file first so that a crash never leaves a partial file. 
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    tmp_filepath = f'{filepath}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_filepath, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_filepath, filepath)
+
+
+def load_image_manifest(manifest_filepath:Text=IMAGE_MANIFEST_FILEPATH) -> Dict[Text, Dict]:
+    '''
+    Purpose :
+        Read the manifest of the downloaded images, i.e. the content hash, the file
+        extension and the validators (ETag, Last-Modified) of each image URL.
+    '''
+
+    if not os.path.exists(manifest_filepath):
+        return {}
+    with open(manifest_filepath) as f:
+        return json.load(f)
+
+
+def save_image_manifest(dict_manifest:Dict[Text, Dict], manifest_filepath:Text=IMAGE_MANIFEST_FILEPATH) -> None:
+    _write_atomic(manifest_filepath, json.dumps(dict_manifest, indent=1, sort_keys=True).encode('utf-8'))
+
+
+def fetch_image(
+        url:Text,
+        dict_record:Optional[Dict]=None,
+        image_dir:Text=IMAGE_DIR,
+        timeout:float=HTTP_TIMEOUT,
+        per_host:int=IMAGE_DOWNLOAD_WORKERS,
+    ) -> Dict:
+    '''
+    Purpose :
+        Download an image into the store, keyed by its content hash so that the same
+        image behind several URLs is only stored once. An image already in the store
+        is revalidated with a conditional request and isn't downloaded again unless
+        it has changed.
+
+    Args    :
+        url         : URL of the image.
+        dict_record : Manifest record of the last download of the URL, if any.
+        image_dir   : Directory of the image store.
+        timeout     : Seconds to wait for the server.
+        per_host    : Maximum number of concurrent downloads per host, apart from the
+                      cap on the pages (MAX_CONCURRENT_REQUESTS_PER_HOST).
+
+    Output  :
+        The manifest record of the URL. Raise an HTTPError for an error status.
+    '''
+
+    # Only revalidate when the stored file is still there to fall back on. 
+    headers = {}
+    if dict_record and os.path.exists(_image_filepath(dict_record['digest'], dict_record['ext'], image_dir)):
+        if dict_record.get('etag'):
+            headers['If-None-Match'] = dict_record['etag']
+        if dict_record.get('last_modified'):
+            headers['If-Modified-Since'] = dict_record['last_modified']
+
+    with host_slot(url, per_host, SLOT_IMAGE), metrics.span('image.fetch', url=url):
+        response = get_http_session().get(url, headers=headers, timeout=timeout)
+
+    if response.status_code == 304:
+        metrics.increment('image_requests', status='not_modified')
+        logger.debug(f'----- Image not modified -- ({url})')
+        return {**dict_record, 'checked': dt.datetime.now().isoformat(timespec='seconds')}
+    response.raise_for_status()
+
+    content = response.content
+    digest = hashlib.sha256(content).hexdigest()
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+    ext = mimetypes.guess_extension(content_type) or os.path.splitext(urlsplit(url).path)[1].lower()
+
+    filepath = _image_filepath(digest, ext, image_dir)
+    if not os.path.exists(filepath):
+        _write_atomic(filepath, content)
+        logger.debug(f'----- Stored a new image ({digest}) for ({url})!')
+
+    metrics.increment('image_requests', status='downloaded')
+    metrics.increment('image_bytes', len(content))
+    now = dt.datetime.now().isoformat(timespec='seconds')
+    return {
+        'digest': digest,
+        'ext': ext,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'fetched': now,
+        'checked': now,
+    }
+
+
+def make_thumbnail(src_filepath:Text, dst_filepath:Text, size:Tuple[int, int]=IMAGE_THUMBNAIL_SIZE) -> Optional[Text]:
+    '''
+    Purpose :
+        Resize an image to fit within (size), keeping its aspect ratio, and save it as
+        a JPEG. Runs in a worker process, since the resizing is bound by the CPU.
+
+    Output  :
+        Path to the thumbnail, or None if the image can't be read (e.g. an SVG).
+    '''
+
+    # Imported here so that only the thumbnail workers need Pillow. 
+    from PIL import Image
+
+    try:
+        with Image.open(src_filepath) as image:
+            image.thumbnail(size)
+
+            # JPEG has no transparency, so lay the image over a white background. 
+            if image.mode in ('RGBA', 'LA', 'P'):
+                image = image.convert('RGBA')
+                background = Image.new('RGB', image.size, 'white')
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+            elif image.mode != 'RGB':
+                image = image.convert('RGB')
+
+            os.makedirs(os.path.dirname(dst_filepath), exist_ok=True)
+            tmp_filepath = f'{dst_filepath}.{os.getpid()}.tmp'
+            image.save(tmp_filepath, format='JPEG', quality=85, optimize=True)
+        os.replace(tmp_filepath, dst_filepath)
+        return dst_filepath
+    except OSError:
+        return None
+
+
+def download_images(
+        ls_urls:List[Text],
+        workers:int=IMAGE_DOWNLOAD_WORKERS,
+        thumbnail_workers:Optional[int]=IMAGE_THUMBNAIL_WORKERS,
+        size:Tuple[int, int]=IMAGE_THUMBNAIL_SIZE,
+        image_dir:Text=IMAGE_DIR,
+        manifest_filepath:Text=IMAGE_MANIFEST_FILEPATH,
+    ) -> Dict[Text, Tuple[Optional[Text], Optional[Text]]]:
+    '''
+    Purpose :
+        Download every unique image URL on a bounded pool of threads, then make the
+        missing thumbnails on a pool of processes.
+
+    Args    :
+        ls_urls           : URLs of the images, duplicates included.
+        workers           : Number of concurrent downloads.
+        thumbnail_workers : Number of processes to make the thumbnails with (None for one per core).
+        size              : Width and height the thumbnails fit within.
+        image_dir         : Directory of the image store.
+        manifest_filepath : Path to the manifest file.
+
+    Output  :
+        Path to the image and to its thumbnail for each URL. Both are None for an
+        image that has never been downloaded, and the thumbnail is None for an image
+        that can't be resized.
+    '''
+
+    ls_unique_urls = list(dict.fromkeys(url for url in ls_urls if isinstance(url, str) and url))
+    dict_manifest = load_image_manifest(manifest_filepath)
+
+    def _fetch(url:Text) -> Tuple[Text, Optional[Dict]]:
+        try:
+            return url, fetch_image(url, dict_manifest.get(url), image_dir)
+        except Exception:
+            metrics.increment('image_requests', status='failed')
+            logger.exception(f'Unable to download the image ({url}).')
+            return url, None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for url, dict_record in executor.map(_fetch, ls_unique_urls):
+            if dict_record is not None:
+                dict_manifest[url] = dict_record
+
+    save_image_manifest(dict_manifest, manifest_filepath)
+
+    # Resize each stored image once, however many URLs point to it. 
+    dict_images = {
+        (record['digest'], record['ext']) for url, record in dict_manifest.items() if url in ls_unique_urls
+    }
+    ls_missing = [
+        (_image_filepath(digest, ext, image_dir), _thumbnail_filepath(digest, size, image_dir))
+        for digest, ext in sorted(dict_images)
+        if not os.path.exists(_thumbnail_filepath(digest, size, image_dir))
+    ]
+    if ls_missing:
+        # Spawn the workers so they don't inherit the locks held by the threads of the flow. 
+        with metrics.span('image.thumbnails', count=len(ls_missing)), ProcessPoolExecutor(
+            max_workers=thumbnail_workers, mp_context=multiprocessing.get_context('spawn'),
+        ) as executor:
+            ls_thumbnails = list(executor.map(make_thumbnail, *zip(*ls_missing), [size] * len(ls_missing)))
+        logger.info(f'Made ({sum(path is not None for path in ls_thumbnails)} / {len(ls_missing)}) thumbnails.')
+
+    dict_paths = {}
+    for url in ls_unique_urls:
+        dict_record = dict_manifest.get(url)
+        if dict_record is None:
+            dict_paths[url] = (None, None)
+            continue
+        thumbnail_filepath = _thumbnail_filepath(dict_record['digest'], size, image_dir)
+        dict_paths[url] = (
+            _image_filepath(dict_record['digest'], dict_record['ext'], image_dir),
+            thumbnail_filepath if os.path.exists(thumbnail_filepath) else None,
+        )
+
+    logger.info(f'Stored ({len(dict_images)}) images for ({len(ls_unique_urls)}) URLs.')
+    return dict_paths
+
+
+
+# %%
+# -------------------------------------------------------
+# Card images 
+# -------------------------------------------------------
+
+def add_image_paths(df_main:pd.DataFrame, **kwargs) -> pd.DataFrame:
+    '''
+    Purpose :
+        Download the card images and add the local path to each image and to its
+        thumbnail, next to the image URL.
+
+    Args    :
+        df_main : The card dataframe.
+        kwargs  : Arguments of (download_images).
+
+    Output  :
+        The card dataframe with (DF_IMG_PATH) and (DF_IMG_THUMBNAIL_PATH).
+    '''
+
+    df_main = df_main.drop(columns=[DF_IMG_PATH, DF_IMG_THUMBNAIL_PATH], errors='ignore')
+
+    # An image parsed from the raw HTML can be relative to the card webpage. 
+    sr_urls = pd.Series([
+        urljoin(page_url, img) if isinstance(page_url, str) and isinstance(img, str) else img
+        for page_url, img in zip(df_main[DF_URL], df_main[DF_IMG])
+    ], index=df_main.index, dtype=object)
+
+    dict_paths = download_images(sr_urls.tolist(), **kwargs)
+    position = df_main.columns.get_loc(DF_IMG) + 1
+    df_main.insert(position, DF_IMG_PATH, sr_urls.map(lambda url: dict_paths.get(url, (None, None))[0]))
+    df_main.insert(position + 1, DF_IMG_THUMBNAIL_PATH, sr_urls.map(lambda url: dict_paths.get(url, (None, None))[1]))
+    return df_main
+
+
+@lazy_task(
+    target=task_target(
+        ls_inputs=['df_card'],
+        ls_config=['IMAGE_DIR', 'IMAGE_THUMBNAIL_SIZE', 'DF_CARD_VERSION'],
+        ls_code=['autoscrape_data.image_store'],
+        period=TASK_CACHE_SCRAPE_PERIOD,
+    ),
+)
+@traced('task.download_card_images')
+def download_card_images(df_card:pd.DataFrame) -> pd.DataFrame:
+    '''
+    Purpose :
+        Download the card images and save the card dataframe with their local paths.
+    '''
+
+    df_card = add_image_paths(df_card)
+    save_table(df_card, TABLE_CARD, CARD_PARQUET_FILEPATH, CARD_DF_FILEPATH)
+    return df_card
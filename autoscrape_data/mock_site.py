@@ -0,0 +1,358 @@
+# %%
+import logging
+import base64, hashlib, multiprocessing, random, threading, time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Text, Tuple, Union
+from urllib.parse import urlsplit, parse_qs
+
+# Import personal module. 
+from autoscrape_data.card_record import CardRecord
+from autoscrape_data.card_parsing import compile_initial_data_for_card
+from config.config_logger import setup_logger
+from config.config import ( 
+    LOG_MOCK_SITE_FILEPATH, 
+    MOCK_SITE_BANKS, 
+    MOCK_SITE_CARDS_PER_BANK, 
+    MOCK_SITE_LATENCY, 
+    MOCK_SITE_JITTER, 
+    MOCK_SITE_FAILURE_RATE, 
+)
+
+
+
+# %%
+# --------------------------------------------------------------
+# Logging configuration 
+# --------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+logger, file_handler, stream_handler = setup_logger(logger, LOG_MOCK_SITE_FILEPATH)
+
+
+
+# %%
+# -------------------------------------------------------
+# Synthetic webpages 
+# -------------------------------------------------------
+
+# Path of the card listing, as on the live site. 
+MOCK_SITE_PATH = '/en/credit-card/'
+
+# Card art served for every image path, a 1x1 GIF with a fixed ETag. 
+MOCK_SITE_IMG_PATH = '/img/'
+MOCK_SITE_IMG = base64.b64decode('R0lGODlhAQABAIAAAP///wAAACH5BAEAAAAALAAAAAABAAEAAAICRAEAOw==')
+MOCK_SITE_IMG_ETAG = f'"{hashlib.sha256(MOCK_SITE_IMG).hexdigest()[:16]}"'
+
+# Values to draw the synthetic cards from. 
+LS_MOCK_CARD_TYPES = ['Visa', 'Mastercard', 'American Express']
+LS_MOCK_TIERS = ['Classic', 'Gold', 'Platinum', 'Signature', 'Infinite', 'World']
+LS_MOCK_APPLICANTS = ['Anybody', 'Malaysians Only', 'Malaysians and Permanent Residents']
+LS_MOCK_INCOMES = [2000, 2500, 3000, 4000, 5000, 8333.33, 10000, 20833.33]
+LS_MOCK_CASHBACK = [
+    ('Groceries', '5%', 'RM50', 'up to RM2,000 monthly'),
+    ('Petrol transactions on Sunday', '5%', 'RM15', 'up to RM500 monthly on weekends only'),
+    ('Online & Overseas Spending', '2%', 'RM15', 'any amount monthly'),
+    ('Dining', '8%', 'RM30', 'from RM1,000 monthly'),
+    ('All retail spend', '0.2%', 'Unlimited', 'any amount monthly'),
+]
+LS_MOCK_REWARDS = [
+    ('5 points on every RM1', 'for dining and groceries'),
+    ('2 points on every RM1', 'for overseas spending'),
+    ('1 point on every RM1', 'on other transactions'),
+    ('1 point on every RM2', 'for e-wallet reloads'),
+]
+LS_MOCK_TRAVEL = [
+    ('Travel Insurance', 'Up to RM1,000,000'),
+    ('Delayed Flight', 'Up to RM600'),
+    ('Lost Luggage', 'Up to RM250'),
+]
+
+
+def _table_section(id_tag:Text, info:Text, ls_rows:List[Tuple]) -> Text:
+    rows = ''.join('<tr>' + ''.join(f'<td>{escape(cell)}</td>' for cell in row) + '</tr>' for row in ls_rows)
+    return f'<section id="{id_tag}"><h2>{id_tag.title()}</h2><p>{escape(info)}</p><table><tbody>{rows}</tbody></table></section>'
+
+
+def render_card_summary(rng:random.Random) -> Text:
+    '''
+    Purpose :
+        Render the summary of a card, shown on both its webpage and the listing.
+    '''
+
+    income = rng.choice(LS_MOCK_INCOMES)
+    annual_fee = rng.choice(['Free', 'Free for the first year', 'RM250', 'RM600'])
+    return (
+        f'<dl>'
+        f'<dt>Min. Income</dt><dd><span>RM{income:,.0f}</span> monthly</dd>'
+        f'<dt>Annual Fee</dt><dd>{annual_fee}</dd>'
+        f'<dt>Interest Rate</dt><dd>{rng.choice(["15% p.a.", "17% p.a.", "18% p.a."])}</dd>'
+        f'</dl>'
+    )
+
+
+def render_card_page(card:Text, summary:Text, rng:random.Random) -> Text:
+    '''
+    Purpose :
+        Render a synthetic card webpage with the sections the scrapers read:
+        the image under the header, the summary in the first section, the
+        requirements (#requirements) and the tables (#rewards, #cashback, ...).
+    '''
+
+    summary = f'<section>{summary}</section>'
+    requirements = (
+        f'<section id="requirements"><dl>'
+        f'<dt>Mininum Age</dt><dd><ul><li>21 years old</li></ul></dd>'
+        f'<dt>Who Can Apply</dt><dd><ul><li>{rng.choice(LS_MOCK_APPLICANTS)}</li></ul></dd>'
+        f'</dl></section>'
+    )
+
+    # Each card offers either cashback or reward points, and maybe travel benefits. 
+    ls_tables = []
+    if rng.random() < 0.5:
+        ls_tables.append(_table_section('cashback', f'Earn cashback with the {card}.', rng.sample(LS_MOCK_CASHBACK, 3)))
+    else:
+        ls_tables.append(_table_section('rewards', f'Collect points with the {card}.', rng.sample(LS_MOCK_REWARDS, 2)))
+    if rng.random() < 0.3:
+        ls_tables.append(_table_section('travel', 'Complimentary travel coverage.', LS_MOCK_TRAVEL))
+
+    slug = card.lower().replace(' ', '-')
+    return (
+        f'<!DOCTYPE html><html><head><title>{escape(card)}</title></head><body><main>'
+        f'<header><h1>{escape(card)}</h1><img src="/img/card-400/{slug}.jpg" alt="{escape(card)}"></header>'
+        f'{summary}{requirements}{"".join(ls_tables)}'
+        f'</main></body></html>'
+    )
+
+
+def render_listing_page(dict_cards:Dict[Text, Dict[Text, Tuple[Text, Text]]], bank:Optional[Text]=None) -> Text:
+    '''
+    Purpose :
+        Render the card listing with the bank menu. Without a bank, every card is listed.
+        Each card links to its webpage and shows its summary.
+    '''
+
+    options = ''.join(f'<option value="{escape(value)}">{escape(value)}</option>' for value in dict_cards)
+    ls_cards = list(dict_cards.get(bank, {}).items()) if bank is not None else [item for dict_items in dict_cards.values() for item in dict_items.items()]
+    items = ''.join(
+        f'<li><a href="{escape(path)}"><img src="/img/card-400/{index}.jpg" alt="{escape(card)}"></a>{summary}</li>'
+        for index, (card, (path, summary)) in enumerate(ls_cards)
+    )
+    return (
+        f'<!DOCTYPE html><html><head><title>Credit Cards</title></head><body><main><section>'
+        f'<form><label>Bank <select name="filter"><option value="">All Banks</option>{options}</select></label></form>'
+        f'<ul>{items}</ul>'
+        f'</section></main></body></html>'
+    )
+
+
+def build_mock_site(
+        banks:int=MOCK_SITE_BANKS,
+        cards_per_bank:int=MOCK_SITE_CARDS_PER_BANK,
+        seed:int=0,
+    ) -> Tuple[Dict[Text, Dict[Text, Tuple[Text, Text]]], Dict[Text, Text]]:
+    '''
+    Purpose :
+        Build the synthetic banks, cards and card webpages.
+
+    Args    :
+        banks          : Number of banks in the bank menu.
+        cards_per_bank : Number of cards listed for each bank.
+        seed           : Seed for the synthetic content, so every run serves the same site.
+
+    Output  :
+        The cards of each bank with the path and the summary shown on the listing,
+        and the card webpages keyed by their path. The path follows the slug the
+        scrapers build from the card name when the listing has no link.
+    '''
+
+    rng = random.Random(seed)
+    dict_cards:Dict[Text, Dict[Text, Tuple[Text, Text]]] = {}
+    dict_pages:Dict[Text, Text] = {}
+
+    for index_bank in range(1, banks + 1):
+        bank = f'mockbank{index_bank}'
+        dict_cards[bank] = {}
+        for index_card in range(1, cards_per_bank + 1):
+            card = f'Mock Bank {index_bank} {rng.choice(LS_MOCK_CARD_TYPES)} {rng.choice(LS_MOCK_TIERS)} {index_card}'
+            _, card_url = compile_initial_data_for_card(CardRecord(), MOCK_SITE_PATH, bank, card)
+            summary = render_card_summary(rng)
+            dict_cards[bank][card] = (card_url, summary)
+            dict_pages[card_url] = render_card_page(card, summary, rng)
+
+    return dict_cards, dict_pages
+
+
+
+# %%
+# -------------------------------------------------------
+# Server 
+# -------------------------------------------------------
+
+class _MockSiteHandler(BaseHTTPRequestHandler):
+    # Keep the connections alive so the pooled sessions behave as on the live site, and 
+    # send the headers and the body in one write so they don't wait on a delayed ACK. 
+    protocol_version = 'HTTP/1.1'
+    wbufsize = -1
+
+    def do_GET(self) -> None:
+        server = self.server
+        time.sleep(max(0.0, server.latency + server.draw(-server.jitter, server.jitter)))
+
+        # Fail a share of the requests with a transient error. 
+        if server.draw(0, 1) < server.failure_rate:
+            return self._respond(503, 'Service Unavailable')
+
+        parts = urlsplit(self.path)
+        if parts.path == MOCK_SITE_PATH:
+            bank = parse_qs(parts.query).get('filter', [None])[0]
+            return self._respond(200, render_listing_page(server.dict_cards, bank))
+        if parts.path in server.dict_pages:
+            return self._respond(200, server.dict_pages[parts.path])
+        if parts.path.startswith(MOCK_SITE_IMG_PATH):
+            if self.headers.get('If-None-Match') == MOCK_SITE_IMG_ETAG:
+                return self._respond(304, b'', dict_headers={'ETag': MOCK_SITE_IMG_ETAG})
+            return self._respond(200, MOCK_SITE_IMG, 'image/gif', {'ETag': MOCK_SITE_IMG_ETAG})
+        return self._respond(404, 'Not Found')
+
+    def _respond(self, status:int, body:Union[Text, bytes], content_type:Text='text/html; charset=utf-8', dict_headers:Optional[Dict]=None) -> None:
+        content = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        for header, value in (dict_headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format:Text, *args) -> None:
+        logger.debug(f'----- {self.address_string()} -- {format % args}')
+
+
+class _MockSiteServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address:Tuple[Text, int], dict_cards:Dict, dict_pages:Dict, latency:float, jitter:float, failure_rate:float, seed:int):
+        super().__init__(address, _MockSiteHandler)
+        self.dict_cards = dict_cards
+        self.dict_pages = dict_pages
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def draw(self, low:float, high:float) -> float:
+        with self._rng_lock:
+            return self._rng.uniform(low, high)
+
+
+def serve_mock_site(
+        port:int=0,
+        banks:int=MOCK_SITE_BANKS,
+        cards_per_bank:int=MOCK_SITE_CARDS_PER_BANK,
+        latency:float=MOCK_SITE_LATENCY,
+        jitter:float=MOCK_SITE_JITTER,
+        failure_rate:float=MOCK_SITE_FAILURE_RATE,
+        seed:int=0,
+        conn=None,
+    ) -> None:
+    '''
+    Purpose :
+        Serve the mock site until the process is stopped.
+
+    Args    :
+        port           : Port to listen on. Default to any free port.
+        banks          : Number of banks in the bank menu.
+        cards_per_bank : Number of cards listed for each bank.
+        latency        : Seconds each response is held back by, to stand in for the network.
+        jitter         : Latency varies uniformly by up to this many seconds.
+        failure_rate   : Share of the requests answered with a 503.
+        seed           : Seed for the synthetic content and the injected failures.
+        conn           : Pipe to send the bound port through, once the server listens.
+    '''
+
+    dict_cards, dict_pages = build_mock_site(banks, cards_per_bank, seed)
+    server = _MockSiteServer(('127.0.0.1', port), dict_cards, dict_pages, latency, jitter, failure_rate, seed)
+    logger.info(f'Serving the mock site with ({len(dict_pages)}) cards on port ({server.server_port})!')
+
+    if conn is not None:
+        conn.send(server.server_port)
+        conn.close()
+    server.serve_forever()
+
+
+class MockSite:
+    '''
+    Purpose :
+        Stand in for ringgitplus.com with synthetic bank listings and card webpages
+        that follow the same layout, so the scrapers can run without the live site.
+        The server runs in its own process so that it doesn't compete with the
+        scrapers being measured.
+
+            with MockSite(banks=5, latency=0.05) as site:
+                html = fetch_html(site.bank_url(site.banks[0]))
+
+    Args    :
+        Same as (serve_mock_site).
+    '''
+
+    def __init__(
+            self,
+            banks:int=MOCK_SITE_BANKS,
+            cards_per_bank:int=MOCK_SITE_CARDS_PER_BANK,
+            latency:float=MOCK_SITE_LATENCY,
+            jitter:float=MOCK_SITE_JITTER,
+            failure_rate:float=MOCK_SITE_FAILURE_RATE,
+            seed:int=0,
+        ):
+        self._kwargs = dict(
+            banks=banks, cards_per_bank=cards_per_bank, latency=latency,
+            jitter=jitter, failure_rate=failure_rate, seed=seed,
+        )
+        self.dict_cards, _ = build_mock_site(banks, cards_per_bank, seed)
+        self.url:Optional[Text] = None
+        self._process:Optional[multiprocessing.Process] = None
+
+    @property
+    def banks(self) -> List[Text]:
+        return list(self.dict_cards)
+
+    def bank_url(self, bank:Text) -> Text:
+        return f'{self.url}?filter={bank}'
+
+    def __enter__(self) -> 'MockSite':
+        # Spawn rather than fork, so the server doesn't inherit the threads of the caller. 
+        context = multiprocessing.get_context('spawn')
+        conn_parent, conn_child = context.Pipe(duplex=False)
+        self._process = context.Process(target=serve_mock_site, kwargs={**self._kwargs, 'conn': conn_child}, daemon=True)
+        self._process.start()
+        self.url = f'http://127.0.0.1:{conn_parent.recv()}{MOCK_SITE_PATH}'
+        logger.info(f'Started the mock site at ({self.url}).')
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._process.terminate()
+        self._process.join()
+        logger.info('Stopped the mock site.')
+
+
+
+# %%
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Serve the mock ringgitplus site.')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--banks', type=int, default=MOCK_SITE_BANKS)
+    parser.add_argument('--cards-per-bank', type=int, default=MOCK_SITE_CARDS_PER_BANK)
+    parser.add_argument('--latency', type=float, default=MOCK_SITE_LATENCY)
+    parser.add_argument('--jitter', type=float, default=MOCK_SITE_JITTER)
+    parser.add_argument('--failure-rate', type=float, default=MOCK_SITE_FAILURE_RATE)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    serve_mock_site(
+        port=args.port, banks=args.banks, cards_per_bank=args.cards_per_bank, latency=args.latency,
+        jitter=args.jitter, failure_rate=args.failure_rate, seed=args.seed,
+    )
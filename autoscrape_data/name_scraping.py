@@ -1,23 +1,35 @@
 # %%
 import logging
 import datetime as dt
-from typing import Optional, List, Dict, Text, Tuple
+from functools import partial
+from typing import Callable, Optional, List, Dict, Text, Tuple, Union
 from selenium.webdriver.chrome.webdriver import WebDriver
 
-# For building data pipeline. 
-from prefect import task
-from prefect.engine.results import LocalResult
-
 # For data processing and analysis. 
 import numpy as np
 
 # Import personal module. 
-from autoscrape_data.selenium_loader import wait_for_webpage_to_load 
+from autoscrape_data.selenium_loader import wait_for_webpage_to_load, PAGE_STAGE_LISTING 
+from autoscrape_data.http_loader import FETCH_BACKEND_HTTP, fetch_html
+from autoscrape_data.async_crawler import CRAWL_ENGINE_ASYNCIO, AsyncCrawler
+from autoscrape_data.card_parsing import (
+    build_listing_record, 
+    index_listing_records, 
+    parse_bank_names, 
+    parse_listing_records, 
+)
 from config.config_logger import setup_logger
+from config.config_task_cache import lazy_task, task_target
+from config.config_metrics import traced
 from config.config import (
+    TASK_CACHE_SCRAPE_PERIOD, 
     LOG_NAME_SCRAPING_FILEPATH, 
     URL_CARD,
     VARS_SAVE_DIR, 
+    FETCH_BACKEND, 
+    CRAWL_ENGINE, 
+    TASK_MAX_RETRIES, 
+    TASK_RETRY_DELAY, 
 )
 
 
@@ -34,57 +46,195 @@ logger, file_handler, stream_handler = setup_logger(logger, LOG_NAME_SCRAPING_FI
 
 # %%
 # -------------------------------------------------------
-# Scrape bank names and credit cards
+# Helper function
 # -------------------------------------------------------
 
-@wait_for_webpage_to_load
-@task(
-    cache_for=dt.timedelta(days=1), 
-    result=LocalResult(dir="result_config"), 
-    checkpoint=True, 
-    target="{task_name}–{date}", 
-)
-def compile_bank_names_for_card(url:Text, xpath:Text, browser:Optional[WebDriver]=None) -> List[Text]:
-    logger.info(f"Start compiling the bank_names from ({url})!")
+def _compile_without_browser(url:Text, parse:Callable[[Text], Union[List, Dict]]) -> Optional[Union[List, Dict]]: 
+    '''
+    Purpose :
+        Fetch and parse a listing webpage without a browser. 
+
+    Args    : 
+        url   : URL to scrape the data from. 
+        parse : Function to extract the values from the raw HTML. 
+
+    Output  : 
+        The extracted values, or None if the webpage fails to load or has no value. 
+    '''
+
+    if FETCH_BACKEND != FETCH_BACKEND_HTTP: 
+        return None
+
+    try:
+        ls_values = parse(fetch_html(url))
+    except Exception:
+        logger.exception(f'Unable to fetch ({url}) without a browser.') 
+        return None
+
+    if not ls_values: 
+        logger.warning(f'The webpage ({url}) fails validation without a browser. Fall back to the browser.') 
+        return None
+    return ls_values
+
+
+async def _crawl_listing(crawler:AsyncCrawler, url:Text) -> Optional[Dict[Text, Dict]]: 
+    '''
+    Purpose :
+        Same as (_compile_without_browser) for bank listing webpages but for the asyncio engine. 
+    '''
+
+    try:
+        html = await crawler.fetch_html(url)
+        dict_cards = await crawler.run_blocking(parse_listing_records, html, url)
+    except Exception:
+        logger.exception(f'Unable to fetch ({url}) without a browser.') 
+        return None
+
+    if not dict_cards: 
+        logger.warning(f'The webpage ({url}) fails validation without a browser. Fall back to the browser.') 
+        return None
+    return dict_cards
+
+
+# Read the name, the image, the link, the summary and the listing text of every 
+# card in one round trip, with the whitespace collapsed as in (card_parsing._text). 
+JS_LISTING_CARDS = '''
+const text = element => element ? element.textContent.split(/\\s+/).filter(Boolean).join(' ') : null;
+return Array.from(arguments[0].getElementsByTagName('img')).map(card => {
+    const item = card.closest('li') || card.parentElement;
+    const link = card.closest('a[href]') || item.querySelector('a[href]');
+    const list = item.querySelector('dl');
+    const summary = list ? Array.from(list.getElementsByTagName('dt')).map((header, index) => {
+        const data = list.getElementsByTagName('dd')[index];
+        return {header: text(header), text: text(data), span: text(data && data.querySelector('span'))};
+    }) : null;
+    return [card.getAttribute('alt'), link ? link.href : null, card.getAttribute('src') ? card.src : null, summary, item.textContent];
+});
+'''
+
+
+@wait_for_webpage_to_load(stage=PAGE_STAGE_LISTING)
+def _compile_listing_with_browser(url:Text, xpath:Text, browser:Optional[WebDriver]=None) -> Dict[Text, Dict]:
+    '''
+    Purpose :
+        Compile the credit cards from a bank listing webpage in the browser. The browser 
+        is only borrowed from the pool when this is called. 
+
+    Output  : 
+        The record of each card in the listing order, keyed by card (see card_parsing.parse_listing_records). 
+    '''
+
+    logger.info(f"Start compiling the credit cards from ({url})!")
 
     # Find the element inside the HTML tags. 
-    element_bank_menu = browser.find_element_by_xpath(xpath)
-    element_banks = element_bank_menu.find_elements_by_tag_name('option')
+    element_cards_section = browser.find_element_by_xpath(xpath)
+    ls_cards = browser.execute_script(JS_LISTING_CARDS, element_cards_section)
+
+    # Build each record the same way as from the raw HTML. 
+    return index_listing_records([build_listing_record(*card) for card in ls_cards])
+
 
-    # Loop through each element except for the first index: 'All bank'. 
-    ls_banks = [element.get_attribute('value') for element in element_banks[1:]]
-    logger.debug(f"----- List of banks -- ({ls_banks})")
-    
-    browser.quit()
-    np.save(f'{VARS_SAVE_DIR}/ls_banks_for_card.npy', ls_banks) 
-    return ls_banks
 
+# %%
+# -------------------------------------------------------
+# Scrape bank names and credit cards
+# -------------------------------------------------------
 
-@task(
-    cache_for=dt.timedelta(days=1), 
-    result=LocalResult(dir="result_config"), 
-    checkpoint=True, 
-    target="{task_name}–{date}", 
+@lazy_task(
+    target=task_target(
+        ls_inputs=['url', 'xpath'], 
+        ls_config=['URL_CARD', 'HTML_PARSER', 'FETCH_BACKEND'], 
+        ls_code=['autoscrape_data.name_scraping', 'autoscrape_data.card_parsing'], 
+        period=TASK_CACHE_SCRAPE_PERIOD, 
+    ), 
 )
-def compile_credit_cards(ls_banks:List[Text], xpath:Text) -> Dict[Text, List[Text]]:
+@traced('task.compile_bank_names_for_card')
+def compile_bank_names_for_card(url:Text, xpath:Text) -> List[Text]:
 
-    @wait_for_webpage_to_load
+    # The browser is borrowed from the pool when the task runs rather than 
+    # when the flow is built, so it has to be loaded inside the task. 
+    @wait_for_webpage_to_load(stage=PAGE_STAGE_LISTING)
     def _compile(url:Text, xpath:Text, browser:Optional[WebDriver]=None) -> List[Text]:
-        logger.info(f"Start compiling the credit cards from ({url})!")
+        logger.info(f"Start compiling the bank_names from ({url})!")
 
         # Find the element inside the HTML tags. 
-        element_cards_section = browser.find_element_by_xpath(xpath)
-        element_cards = element_cards_section.find_elements_by_tag_name('img')
+        element_bank_menu = browser.find_element_by_xpath(xpath)
+        element_banks = element_bank_menu.find_elements_by_tag_name('option')
+
+        # Loop through each element except for the first index: 'All bank'. 
+        return [element.get_attribute('value') for element in element_banks[1:]]
+
+    ls_banks = _compile_without_browser(url, parse_bank_names) or _compile(url, xpath)
+    logger.debug(f"----- List of banks -- ({ls_banks})")
+
+    np.save(f'{VARS_SAVE_DIR}/ls_banks_for_card.npy', ls_banks) 
+    return ls_banks
 
-        # Loop through each element to extract the value. 
-        ls_cards = [card.get_attribute('alt') for card in element_cards]
 
-        browser.quit()
-        return ls_cards
+@lazy_task(
+    target=task_target(
+        ls_inputs=['ls_banks', 'xpath', 'engine', 'url'], 
+        ls_config=['URL_CARD', 'HTML_PARSER', 'FETCH_BACKEND', 'CRAWL_ENGINE'], 
+        ls_code=['autoscrape_data.name_scraping', 'autoscrape_data.card_parsing'], 
+        period=TASK_CACHE_SCRAPE_PERIOD, 
+    ), 
+)
+@traced('task.compile_credit_cards')
+def compile_credit_cards(
+        ls_banks:List[Text], xpath:Text, engine:Text=CRAWL_ENGINE, url:Text=URL_CARD, 
+    ) -> Dict[Text, Dict[Text, Dict]]:
 
     logger.debug(f"----- List of banks -- ({ls_banks})")
-    dict_data = {
-        bank: _compile(''.join([URL_CARD, f'?filter={bank}']), xpath) for bank in ls_banks 
-    } 
+    dict_urls = {bank: ''.join([url, f'?filter={bank}']) for bank in ls_banks}
+
+    # Fetch every listing webpage at once on the event loop, then fall back to 
+    # the browser for the ones that can't be read without it. 
+    if engine == CRAWL_ENGINE_ASYNCIO: 
+        with AsyncCrawler() as crawler: 
+            dict_futures = {bank: crawler.submit(_crawl_listing, crawler, url) for bank, url in dict_urls.items()}
+            dict_data = {bank: future.result() or _compile_listing_with_browser(dict_urls[bank], xpath) for bank, future in dict_futures.items()}
+    else: 
+        dict_data = {
+            bank: _compile_without_browser(url, partial(parse_listing_records, url=url)) or _compile_listing_with_browser(url, xpath) 
+            for bank, url in dict_urls.items() 
+        }
+
     np.save(f'{VARS_SAVE_DIR}/dict_cards.npy', dict_data) 
     return dict_data
+
+
+@lazy_task(
+    target=task_target(
+        ls_inputs=['bank', 'xpath', 'url'], 
+        ls_config=['URL_CARD', 'HTML_PARSER', 'FETCH_BACKEND'], 
+        ls_code=['autoscrape_data.name_scraping', 'autoscrape_data.card_parsing'], 
+        period=TASK_CACHE_SCRAPE_PERIOD, 
+    ), 
+    max_retries=TASK_MAX_RETRIES, 
+    retry_delay=dt.timedelta(seconds=TASK_RETRY_DELAY), 
+)
+@traced('task.compile_cards_for_bank')
+def compile_cards_for_bank(bank:Text, xpath:Text, url:Text=URL_CARD) -> Dict[Text, Dict]:
+    '''
+    Purpose :
+        Same as (compile_credit_cards) but for a single bank, so that the flow can map 
+        it over the banks and retry each bank on its own. 
+
+    Args    : 
+        bank  : Bank name. 
+        xpath : Path to the HTML tags of the card list. 
+        url   : URL of the card listing webpage. 
+
+    Output  : 
+        The record of each card of the bank in the listing order, keyed by the link to 
+        its webpage: the card name, its image and summary, and the fingerprint of its 
+        listing, to tell which cards have changed since the last run. 
+    '''
+
+    bank_url = ''.join([url, f'?filter={bank}'])
+    dict_cards = (
+        _compile_without_browser(bank_url, partial(parse_listing_records, url=bank_url)) 
+        or _compile_listing_with_browser(bank_url, xpath)
+    )
+    logger.info(f'Compiled ({len(dict_cards)}) cards for ({bank})!') 
+    return dict_cards
@@ -0,0 +1,117 @@
+# %%
+import asyncio, threading, time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Text, Tuple
+from urllib.parse import urlsplit
+
+# Import personal module. 
+from config.config import (
+    MAX_CONCURRENT_REQUESTS_PER_HOST, 
+    CRAWL_RATE_LIMIT, 
+    CRAWL_BURST, 
+    CRAWL_MAX_IN_FLIGHT_PER_HOST, 
+)
+
+
+
+# %%
+# -------------------------------------------------------
+# Politeness
+# -------------------------------------------------------
+
+# The pages and the card images are capped apart, since the images come from the 
+# same host as the pages but are much cheaper to serve. 
+SLOT_PAGE = "page"
+SLOT_IMAGE = "image"
+
+_host_semaphores:Dict[Tuple[Text, Text, int], threading.BoundedSemaphore] = {}
+_host_semaphores_lock = threading.Lock()
+
+
+@contextmanager
+def host_slot(url:Text, limit:int=MAX_CONCURRENT_REQUESTS_PER_HOST, scope:Text=SLOT_PAGE) -> Iterator[None]: 
+    '''
+    Purpose :
+        Cap the number of pages loaded from the same host at the same time. 
+        Shared by every fetch backend so the cap holds across all of them. 
+
+    Args    : 
+        url   : URL of the page to load. 
+        limit : Maximum number of concurrent page loads per host. 
+        scope : What is loaded, i.e. pages ("page") or images ("image"). 
+
+    Notice  :
+        The calls with the same scope and limit share a cap for each host. Every 
+        fetch backend uses the default limit, so they share one cap for the pages. 
+    '''
+
+    key = (scope, urlsplit(url).netloc, limit)
+    with _host_semaphores_lock: 
+        if key not in _host_semaphores: 
+            _host_semaphores[key] = threading.BoundedSemaphore(limit)
+        semaphore = _host_semaphores[key]
+
+    with semaphore: 
+        yield
+
+
+
+# %%
+# -------------------------------------------------------
+# Rate limiting for the asyncio engine
+# -------------------------------------------------------
+
+class AsyncTokenBucket: 
+    '''
+    Purpose :
+        Pace requests to a steady rate while allowing short bursts. A token is added 
+        every (1 / rate) seconds up to (capacity), and each request takes one token. 
+
+    Args    : 
+        rate     : Number of requests allowed per second. 
+        capacity : Maximum number of requests allowed in a burst. 
+    '''
+
+    def __init__(self, rate:float=CRAWL_RATE_LIMIT, capacity:float=CRAWL_BURST): 
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock:Optional[asyncio.Lock] = None
+
+    async def acquire(self) -> None: 
+        # The lock is created on first use so that it belongs to the running loop. 
+        if self._lock is None: 
+            self._lock = asyncio.Lock()
+
+        # Waiters queue on the lock, so tokens are handed out in arrival order. 
+        async with self._lock: 
+            while True: 
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1: 
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncHostLimiter: 
+    '''
+    Purpose :
+        Cap the number of requests in flight to the same host for the asyncio engine. 
+
+    Args    : 
+        limit : Maximum number of requests in flight per host. 
+    '''
+
+    def __init__(self, limit:int=CRAWL_MAX_IN_FLIGHT_PER_HOST): 
+        self.limit = limit
+        self._semaphores:Dict[Text, asyncio.Semaphore] = {}
+
+    def slot(self, url:Text) -> asyncio.Semaphore: 
+        # Only ever called from the event loop thread, so no lock is needed. 
+        host = urlsplit(url).netloc
+        if host not in self._semaphores: 
+            self._semaphores[host] = asyncio.Semaphore(self.limit)
+        return self._semaphores[host]
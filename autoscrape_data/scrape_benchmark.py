@@ -0,0 +1,313 @@
+# %%
+import logging
+import asyncio, resource, statistics, sys, time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Text, Tuple
+
+# For data processing and analysis. 
+import pandas as pd
+
+# Import personal module. 
+from autoscrape_data.mock_site import MockSite
+from autoscrape_data.card_record import CardRecord
+from autoscrape_data.http_loader import FETCH_BACKEND_HTTP, FETCH_BACKEND_SELENIUM, fetch_html, close_http_session
+from autoscrape_data.async_crawler import CRAWL_ENGINE_ASYNCIO, AsyncCrawler
+from autoscrape_data.card_parsing import ( 
+    XPATH_BANK_MENU, 
+    XPATH_CARD_LISTING, 
+    XPATH_CARD_SUMMARY, 
+    compile_initial_data_for_card, 
+    is_valid_card_document, 
+    parse_bank_names, 
+    parse_card_document, 
+    parse_listing_records, 
+)
+from config.config_logger import setup_logger
+from config.config import ( 
+    LOG_SCRAPE_BENCHMARK_FILEPATH, 
+    SCRAPE_BENCHMARK_BACKENDS, 
+    SCRAPE_BENCHMARK_CONCURRENCY, 
+    MOCK_SITE_BANKS, 
+    MOCK_SITE_CARDS_PER_BANK, 
+    MOCK_SITE_LATENCY, 
+    MOCK_SITE_JITTER, 
+    MOCK_SITE_FAILURE_RATE, 
+)
+
+
+
+# %%
+# --------------------------------------------------------------
+# Logging configuration 
+# --------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+logger, file_handler, stream_handler = setup_logger(logger, LOG_SCRAPE_BENCHMARK_FILEPATH)
+
+
+
+# %%
+# -------------------------------------------------------
+# Page parsers 
+# -------------------------------------------------------
+
+# Each parser raises on a webpage that fails validation, so it counts as a failure. 
+
+def _parse_bank_menu(html:Text, url:Text) -> List[Text]:
+    ls_banks = parse_bank_names(html)
+    if not ls_banks:
+        raise ValueError(f'No bank in the bank menu of ({url}).')
+    return ls_banks
+
+
+def _parse_listing(html:Text, url:Text) -> Dict[Text, Dict]:
+    dict_cards = parse_listing_records(html, url)
+    if not dict_cards:
+        raise ValueError(f'No card on the listing of ({url}).')
+    return dict_cards
+
+
+def _parse_card(html:Text, url:Text) -> Dict:
+    dict_document = parse_card_document(html, url)
+    if not is_valid_card_document(dict_document):
+        raise ValueError(f'The webpage ({url}) fails validation.')
+    return dict_document
+
+
+
+# %%
+# -------------------------------------------------------
+# Fetch backends 
+# -------------------------------------------------------
+
+# A stage fetches and parses a batch of webpages, given as (url, xpath) pairs, and 
+# returns the parsed value (or None on failure) and the latency of each webpage. 
+Stage = Callable[[List[Tuple[Text, Text]], Callable[[Text, Text], Any]], Tuple[List[Any], List[float]]]
+
+
+def _timed_page(load:Callable[[Text, Text], Text], parse:Callable, url:Text, xpath:Text) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    try:
+        value = parse(load(url, xpath), url)
+    except Exception:
+        logger.exception(f'Unable to scrape ({url}).')
+        value = None
+    return value, time.perf_counter() - start
+
+
+def _run_with_threads(load:Callable[[Text, Text], Text], concurrency:int) -> Tuple[Stage, Callable[[], None]]:
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def stage(ls_pages:List[Tuple[Text, Text]], parse:Callable) -> Tuple[List[Any], List[float]]:
+        ls_results = list(executor.map(lambda page: _timed_page(load, parse, *page), ls_pages))
+        return [value for value, _ in ls_results], [seconds for _, seconds in ls_results]
+
+    return stage, partial(executor.shutdown, wait=True)
+
+
+def _http_backend(concurrency:int) -> Tuple[Stage, Callable[[], None]]:
+    # The per host cap is lifted to the concurrency level, the local site doesn't need the politeness. 
+    load = lambda url, xpath: fetch_html(url, per_host=concurrency, save_snapshots=False)
+    stage, close = _run_with_threads(load, concurrency)
+    return stage, lambda: (close(), close_http_session())
+
+
+def _selenium_backend(concurrency:int) -> Tuple[Stage, Callable[[], None]]:
+    # Only imported when asked for, so the other backends run without a browser installed. 
+    from autoscrape_data.selenium_loader import BrowserPool, wait_for_page_readiness
+
+    pool = BrowserPool(size=concurrency)
+
+    def load(url:Text, xpath:Text) -> Text:
+        with pool.browser() as browser:
+            browser.get(url)
+            wait_for_page_readiness(browser, xpath)
+            return browser.page_source
+
+    stage, close = _run_with_threads(load, concurrency)
+    return stage, lambda: (close(), pool.close())
+
+
+def _asyncio_backend(concurrency:int) -> Tuple[Stage, Callable[[], None]]:
+    crawler = AsyncCrawler(
+        rate=1e6, burst=concurrency, max_in_flight=concurrency, per_host=concurrency, save_snapshots=False,
+    ).__enter__()
+
+    # Every page is submitted at once, so only start the clock once the page is let in. 
+    # The semaphore is created on first use so that it belongs to the running loop. 
+    slots:Optional[asyncio.Semaphore] = None
+
+    async def _timed_crawl(parse:Callable, url:Text) -> Tuple[Any, float]:
+        nonlocal slots
+        if slots is None:
+            slots = asyncio.Semaphore(concurrency)
+
+        async with slots:
+            start = time.perf_counter()
+            try:
+                html = await crawler.fetch_html(url)
+                value = await crawler.run_blocking(parse, html, url)
+            except Exception:
+                logger.exception(f'Unable to scrape ({url}).')
+                value = None
+            return value, time.perf_counter() - start
+
+    def stage(ls_pages:List[Tuple[Text, Text]], parse:Callable) -> Tuple[List[Any], List[float]]:
+        ls_futures = [crawler.submit(_timed_crawl, parse, url) for url, _ in ls_pages]
+        ls_results = [future.result() for future in ls_futures]
+        return [value for value, _ in ls_results], [seconds for _, seconds in ls_results]
+
+    return stage, lambda: crawler.__exit__(None, None, None)
+
+
+DICT_BENCHMARK_BACKENDS:Dict[Text, Callable[[int], Tuple[Stage, Callable[[], None]]]] = {
+    FETCH_BACKEND_HTTP: _http_backend,
+    CRAWL_ENGINE_ASYNCIO: _asyncio_backend,
+    FETCH_BACKEND_SELENIUM: _selenium_backend,
+}
+
+
+
+# %%
+# -------------------------------------------------------
+# Benchmark 
+# -------------------------------------------------------
+
+def _peak_rss_mb() -> float:
+    # Linux reports the peak in KB, macOS in bytes. 
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def _benchmark_run(url:Text, backend:Text, concurrency:int) -> Dict:
+    '''
+    Purpose :
+        Scrape the whole mock site the way the pipeline does: the bank menu, then
+        every bank listing, then every card webpage. Runs in a process of its own,
+        so the peak RSS and the pooled sessions belong to this run only.
+    '''
+
+    stage, close = DICT_BENCHMARK_BACKENDS[backend](concurrency)
+    ls_latencies:List[float] = []
+    failures = 0
+    start = time.perf_counter()
+
+    try:
+        ls_values, ls_seconds = stage([(url, XPATH_BANK_MENU)], _parse_bank_menu)
+        ls_banks = ls_values[0] or []
+        ls_latencies += ls_seconds
+
+        ls_values, ls_seconds = stage([(f'{url}?filter={bank}', XPATH_CARD_LISTING) for bank in ls_banks], _parse_listing)
+        ls_latencies += ls_seconds
+        failures += sum(value is None for value in ls_values)
+
+        ls_card_urls = [
+            compile_initial_data_for_card(CardRecord(), url, bank, dict_listing['card'], dict_listing['href'])[1]
+            for bank, dict_cards in zip(ls_banks, ls_values) for dict_listing in (dict_cards or {}).values()
+        ]
+        ls_values, ls_seconds = stage([(card_url, XPATH_CARD_SUMMARY) for card_url in ls_card_urls], _parse_card)
+        ls_latencies += ls_seconds
+        failures += sum(value is None for value in ls_values)
+
+    finally:
+        seconds = time.perf_counter() - start
+        close()
+
+    percentiles = statistics.quantiles(ls_latencies, n=100) if len(ls_latencies) > 1 else ls_latencies * 99
+    return {
+        'backend': backend,
+        'concurrency': concurrency,
+        'pages': len(ls_latencies),
+        'failures': failures,
+        'seconds': seconds,
+        'pages_per_s': len(ls_latencies) / seconds,
+        'p50_ms': percentiles[49] * 1000,
+        'p95_ms': percentiles[94] * 1000,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def run_scrape_benchmark(
+        ls_backends:List[Text]=SCRAPE_BENCHMARK_BACKENDS,
+        ls_concurrency:List[int]=SCRAPE_BENCHMARK_CONCURRENCY,
+        banks:int=MOCK_SITE_BANKS,
+        cards_per_bank:int=MOCK_SITE_CARDS_PER_BANK,
+        latency:float=MOCK_SITE_LATENCY,
+        jitter:float=MOCK_SITE_JITTER,
+        failure_rate:float=MOCK_SITE_FAILURE_RATE,
+        url:Optional[Text]=None,
+    ) -> pd.DataFrame:
+    '''
+    Purpose :
+        Measure the scrape throughput for each fetch backend and concurrency level
+        against the mock site.
+
+    Args    :
+        ls_backends    : Fetch backends: "http", "asyncio" and / or "selenium".
+        ls_concurrency : Number of pages in flight to try for each backend.
+        banks          : Number of banks on the mock site.
+        cards_per_bank : Number of cards listed for each bank.
+        latency        : Seconds each response is held back by.
+        jitter         : Latency varies uniformly by up to this many seconds.
+        failure_rate   : Share of the requests answered with a 503.
+        url            : Scrape a site that is already running instead, e.g. the mock
+                         site started from the command line.
+
+    Output  :
+        One row per backend and concurrency level with the pages scraped, the
+        failures, the pages per second, the p50 / p95 page latency in ms (fetch
+        and parse) and the peak RSS in MB.
+
+    Notice  :
+        The per host caps and the rate limit are lifted to the concurrency level,
+        so the runs show what each backend can sustain rather than the politeness
+        settings. For "selenium", the peak RSS leaves out the browser processes.
+    '''
+
+    site = MockSite(banks, cards_per_bank, latency, jitter, failure_rate) if url is None else None
+    if site is not None:
+        url = site.__enter__().url
+
+    ls_rows = []
+    try:
+        context = multiprocessing.get_context('spawn')
+        for backend in ls_backends:
+            for concurrency in ls_concurrency:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    dict_row = executor.submit(_benchmark_run, url, backend, concurrency).result()
+                logger.info(
+                    f'({backend}) x ({concurrency}): ({dict_row["pages_per_s"]:.1f}) pages/s, '
+                    f'p50 ({dict_row["p50_ms"]:.1f}) ms, p95 ({dict_row["p95_ms"]:.1f}) ms, '
+                    f'peak RSS ({dict_row["peak_rss_mb"]:.1f}) MB, ({dict_row["failures"]}) failures.'
+                )
+                ls_rows.append(dict_row)
+    finally:
+        if site is not None:
+            site.__exit__(None, None, None)
+
+    return pd.DataFrame(ls_rows)
+
+
+
+# %%
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark the scrapers against the mock ringgitplus site.')
+    parser.add_argument('--backends', nargs='+', default=SCRAPE_BENCHMARK_BACKENDS, choices=list(DICT_BENCHMARK_BACKENDS))
+    parser.add_argument('--concurrency', nargs='+', type=int, default=SCRAPE_BENCHMARK_CONCURRENCY)
+    parser.add_argument('--banks', type=int, default=MOCK_SITE_BANKS)
+    parser.add_argument('--cards-per-bank', type=int, default=MOCK_SITE_CARDS_PER_BANK)
+    parser.add_argument('--latency', type=float, default=MOCK_SITE_LATENCY)
+    parser.add_argument('--jitter', type=float, default=MOCK_SITE_JITTER)
+    parser.add_argument('--failure-rate', type=float, default=MOCK_SITE_FAILURE_RATE)
+    parser.add_argument('--url', default=None)
+    args = parser.parse_args()
+
+    df_results = run_scrape_benchmark(
+        args.backends, args.concurrency, args.banks, args.cards_per_bank,
+        args.latency, args.jitter, args.failure_rate, args.url,
+    )
+    print(df_results.to_string(index=False, float_format='{:.1f}'.format))
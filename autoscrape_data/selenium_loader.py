@@ -1,17 +1,32 @@
 import logging 
 import time
-from typing import Text
+import atexit, json, queue, statistics, threading
+import datetime as dt
+from contextlib import contextmanager
+from functools import partial, wraps
+from typing import Callable, Dict, Iterator, Optional, Text
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait 
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.chrome.webdriver import WebDriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
 
 # Import personal module. 
+from autoscrape_data.rate_limiting import host_slot
+from autoscrape_data.snapshot_store import save_snapshot
 from config.config_logger import setup_logger
+from config.config_metrics import metrics
 from config.config import (
     DRIVER_PATH, WEBPAGE_LOADING_TIMEOUT, 
-    LOG_SELENIUM_FILEPATH, SLEEP, 
+    LOG_SELENIUM_FILEPATH, 
+    NETWORK_IDLE_TIME, 
+    READINESS_POLL_FREQUENCY, 
+    PAGE_LOAD_TELEMETRY_FILEPATH, 
+    BROWSER_POOL_SIZE, 
+    BROWSER_MAX_PAGES, 
+    BROWSER_CHECKOUT_TIMEOUT, 
+    BROWSER_BLOCK_RESOURCES, 
+    BROWSER_BLOCKED_PREFS, 
+    BROWSER_BLOCKED_URLS, 
+    SAVE_SNAPSHOTS, 
 )
 
 
@@ -37,29 +52,474 @@ def launch_browser():
     options.add_argument("--incognito")
     options.add_argument("--headless")
 
+    # Turn off the resources that no stage reads, see (BROWSER_BLOCK_RESOURCES). 
+    if BROWSER_BLOCK_RESOURCES: 
+        options.add_experimental_option("prefs", BROWSER_BLOCKED_PREFS)
+
+    # Log the network events to measure the requests and bytes of each page. 
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
     # Set the browser to load the URL. 
-    browser = webdriver.Chrome(executable_path=DRIVER_PATH, options=options)
+    with metrics.span('browser.launch'):
+        browser = webdriver.Chrome(executable_path=DRIVER_PATH, options=options)
+    metrics.increment('browser_launches')
     return browser
 
 
-def wait_for_webpage_to_load(func):
-    def wrapper(url:Text, xpath:Text, **kwargs):
-        # Launch the browser and load the URL. 
-        browser = launch_browser()
-        browser.get(url)
 
-        # You can't scrape the data until the site completes the load. 
-        # So wait for it to load first. 
+# -------------------------------------------------------
+# Resource blocking
+# -------------------------------------------------------
+
+# Stages of the pages loaded in the browser, recorded in the page load telemetry. 
+PAGE_STAGE_LISTING = "listing"
+PAGE_STAGE_CARD = "card"
+
+# Profiles recorded in the page load telemetry. 
+PROFILE_BLOCKING = "blocking"
+PROFILE_FULL = "full"
+
+
+def block_resources(browser:WebDriver) -> None:
+    '''
+    Purpose :
+        Block the requests matching (BROWSER_BLOCKED_URLS) on the next pages. Neither 
+        stage reads images, fonts, media or trackers, so every page blocks the same. 
+    '''
+
+    browser.execute_cdp_cmd('Network.enable', {})
+    browser.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BROWSER_BLOCKED_URLS if BROWSER_BLOCK_RESOURCES else []})
+
+
+def read_network_usage(browser:WebDriver) -> Dict: 
+    '''
+    Purpose :
+        Tally the network events logged by the browser since the last call. 
+
+    Args    : 
+        browser : A Selenium object to open the browser. 
+
+    Output  : 
+        Number of requests sent, bytes transferred and requests blocked. Empty if the 
+        browser doesn't log its network events. 
+    '''
+
+    try:
+        ls_entries = browser.get_log('performance')
+    except WebDriverException:
+        return {}
+
+    set_requests, set_blocked, transferred = set(), set(), 0
+    for entry in ls_entries:
+        message = json.loads(entry['message'])['message']
+        params = message.get('params', {})
+
+        if message['method'] == 'Network.requestWillBeSent': 
+            set_requests.add(params['requestId'])
+        elif message['method'] == 'Network.loadingFinished': 
+            transferred += params.get('encodedDataLength', 0)
+        elif message['method'] == 'Network.loadingFailed' and params.get('blockedReason'): 
+            set_blocked.add(params['requestId'])
+
+    return {
+        'requests': len(set_requests - set_blocked), 
+        'bytes': int(transferred), 
+        'blocked_requests': len(set_blocked), 
+    }
+
+
+
+# -------------------------------------------------------
+# Browser pool
+# -------------------------------------------------------
+
+class BrowserPool:
+    '''
+    Purpose :
+        Keep a fixed number of long-lived browsers so that each page load
+        doesn't pay for a cold Chrome start. Browsers are launched lazily,
+        reset between pages and recycled after serving a number of pages.
+
+    Args    :
+        size      : Maximum number of browsers alive at the same time.
+        max_pages : Number of pages a browser serves before it is relaunched.
+        timeout   : Seconds to wait for an idle browser before giving up.
+    '''
+
+    def __init__(
+            self,
+            size:int=BROWSER_POOL_SIZE,
+            max_pages:int=BROWSER_MAX_PAGES,
+            timeout:float=BROWSER_CHECKOUT_TIMEOUT,
+        ):
+        self.size = size
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._launched = 0
+        self._page_counts:Dict[int, int] = {}
+
+    def checkout(self) -> WebDriver:
+        '''
+        Purpose :
+            Borrow a healthy browser from the pool. Launch a new one if the
+            pool hasn't reached its size yet, otherwise wait for a checkin.
+
+        Output  :
+            A Selenium object to open the browser. Raise a TimeoutError if no
+            browser is free within (timeout) seconds.
+        '''
+
+        while True:
+            try:
+                browser = self._idle.get_nowait()
+            except queue.Empty:
+                browser = self._launch_or_wait()
+
+            if self._is_healthy(browser):
+                return browser
+
+            logger.warning('Discarded an unhealthy browser from the pool.')
+            self._discard(browser)
+
+    def checkin(self, browser:WebDriver, discard:bool=False) -> None:
+        '''
+        Purpose :
+            Return a browser to the pool after use.
+
+        Args    :
+            browser : A Selenium object to open the browser.
+            discard : Quit the browser instead of returning it (e.g. when it crashed).
+        '''
+
+        with self._lock:
+            self._page_counts[id(browser)] = self._page_counts.get(id(browser), 0) + 1
+            recycle = self._page_counts[id(browser)] >= self.max_pages
+
+        if discard or recycle or not self._reset(browser):
+            logger.debug(f'----- Recycled the browser (discard: {discard}, recycle: {recycle}).')
+            self._discard(browser)
+            return
+
+        self._idle.put(browser)
+
+    @contextmanager
+    def browser(self) -> Iterator[WebDriver]:
+        '''
+        Purpose :
+            Check out a browser for the duration of a "with" block. The browser
+            is discarded if the block raises a WebDriver error.
+        '''
+
+        browser = self.checkout()
+        discard = False
+        try:
+            yield browser
+        except WebDriverException:
+            discard = True
+            raise
+        finally:
+            self.checkin(browser, discard=discard)
+
+    def close(self) -> None:
+        '''
+        Purpose :
+            Quit every idle browser. Browsers still checked out are quit on checkin.
+        '''
+
+        while True:
+            try:
+                browser = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(browser)
+        logger.info('Closed the browser pool.')
+
+    def _launch_or_wait(self) -> WebDriver:
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._lock:
+                can_launch = self._launched < self.size
+                if can_launch:
+                    self._launched += 1
+            if can_launch:
+                break
+
+            # Wait for another worker to return a browser. Poll in short steps
+            # because a recycled browser frees a launch slot instead.
+            try:
+                return self._idle.get(timeout=max(0.0, min(1.0, deadline - time.monotonic())))
+            except queue.Empty:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(
+                        f'No browser was returned to the pool within ({self.timeout}s), all '
+                        f'({self.size}) browsers are in use. Raise (BROWSER_POOL_SIZE) or '
+                        f'(BROWSER_CHECKOUT_TIMEOUT).'
+                    ) from None
+
+        try:
+            browser = launch_browser()
+        except Exception:
+            with self._lock:
+                self._launched -= 1
+            raise
+        logger.info(f'Launched a new browser for the pool ({self._launched} / {self.size}).')
+        return browser
+
+    def _discard(self, browser:WebDriver) -> None:
         try:
-            time.sleep(SLEEP)
-            WebDriverWait(browser, WEBPAGE_LOADING_TIMEOUT).until(
-                EC.visibility_of_element_located((By.XPATH, xpath))
-            )
-        # Raise an error if it takes too long. 
-        except TimeoutException:
-            logger.exception(f"Timed out waiting for page to load for ({func}).") 
             browser.quit()
-        
-        # Return the loaded page. 
-        return func(url=url, xpath=xpath, browser=browser, **kwargs)
+        except Exception:
+            logger.warning('Unable to quit the browser cleanly.')
+        with self._lock:
+            self._page_counts.pop(id(browser), None)
+            self._launched -= 1
+
+    @staticmethod
+    def _is_healthy(browser:WebDriver) -> bool:
+        # Any round trip to the driver fails if Chrome has crashed or hung up. 
+        try:
+            browser.execute_script('return 1;')
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _reset(browser:WebDriver) -> bool:
+        # Clear cookies and cache so that a page doesn't leak state into the next one. 
+        try:
+            browser.delete_all_cookies()
+            browser.execute_cdp_cmd('Network.clearBrowserCache', {})
+            return True
+        except Exception:
+            logger.warning('Unable to reset the browser state.')
+            return False
+
+
+_browser_pool:Optional[BrowserPool] = None
+_browser_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    '''
+    Purpose :
+        Get the pool shared by every scraper in this process.
+    '''
+
+    global _browser_pool
+    with _browser_pool_lock:
+        if _browser_pool is None:
+            _browser_pool = BrowserPool()
+        return _browser_pool
+
+
+@atexit.register
+def close_browser_pool() -> None:
+    '''
+    Purpose :
+        Quit the browsers held by the shared pool.
+    '''
+
+    global _browser_pool
+    with _browser_pool_lock:
+        if _browser_pool is not None:
+            _browser_pool.close()
+            _browser_pool = None
+
+
+# -------------------------------------------------------
+# Page readiness
+# -------------------------------------------------------
+
+# Collect every readiness signal in a single round trip to the driver. 
+# The resource count stops changing once the page stops fetching, which 
+# is used as the network idle signal. 
+JS_READINESS_SIGNALS = '''
+const node = document.evaluate(
+    arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+).singleNodeValue;
+return {
+    element_visible: !!node && node.getClientRects().length > 0,
+    ready_state: document.readyState,
+    resource_count: performance.getEntriesByType('resource').length,
+};
+'''
+
+_telemetry_lock = threading.Lock()
+
+
+def wait_for_page_readiness(
+        browser:WebDriver, 
+        xpath:Text, 
+        timeout:float=WEBPAGE_LOADING_TIMEOUT, 
+        network_idle_time:float=NETWORK_IDLE_TIME, 
+        poll_frequency:float=READINESS_POLL_FREQUENCY, 
+    ) -> Dict: 
+    '''
+    Purpose :
+        Wait until the page is ready instead of sleeping for a fixed time. The page 
+        is ready once the element is visible, the document has completed and the 
+        network has been idle for a while. 
+
+    Args    : 
+        browser           : A Selenium object to open the browser. 
+        xpath             : Path to the HTML tags that must be visible. 
+        timeout           : Ceiling in seconds for the whole wait. 
+        network_idle_time : Seconds without a new resource request to count as idle. 
+        poll_frequency    : Seconds between each check. 
+
+    Output  : 
+        Seconds elapsed until each signal was observed, and the overall time to ready. 
+        Raise a TimeoutException if the page isn't ready before the ceiling. 
+    '''
+
+    timings = {'element_visible': None, 'ready_state': None, 'network_idle': None}
+    resource_count, last_request = -1, 0.0
+    start = time.perf_counter()
+
+    while True:
+        elapsed = time.perf_counter() - start
+        signals = browser.execute_script(JS_READINESS_SIGNALS, xpath)
+
+        if timings['element_visible'] is None and signals['element_visible']: 
+            timings['element_visible'] = elapsed
+        if timings['ready_state'] is None and signals['ready_state'] == 'complete': 
+            timings['ready_state'] = elapsed
+
+        # Reset the idle window whenever a new resource shows up. 
+        if signals['resource_count'] != resource_count: 
+            resource_count, last_request = signals['resource_count'], elapsed
+        elif timings['ready_state'] is not None and elapsed - last_request >= network_idle_time: 
+            timings['network_idle'] = last_request
+
+        if all(value is not None for value in timings.values()): 
+            timings['time_to_ready'] = max(timings.values())
+            return timings
+
+        if elapsed >= timeout: 
+            raise TimeoutException(f'Page is not ready after ({timeout}) seconds -- ({timings}).')
+        time.sleep(poll_frequency)
+
+
+def record_page_load_telemetry(
+        url:Text, 
+        func_name:Text, 
+        timings:Dict, 
+        filepath:Text=PAGE_LOAD_TELEMETRY_FILEPATH, 
+    ) -> None: 
+    '''
+    Purpose :
+        Append the observed load timings of a page to the telemetry file. 
+    '''
+
+    record = {
+        'timestamp': dt.datetime.now().isoformat(timespec='seconds'), 
+        'url': url, 
+        'func': func_name, 
+        **timings, 
+    }
+    with _telemetry_lock: 
+        with open(filepath, 'a') as f: 
+            f.write(json.dumps(record) + '\n')
+
+
+def summarise_page_load_telemetry(filepath:Text=PAGE_LOAD_TELEMETRY_FILEPATH) -> Dict: 
+    '''
+    Purpose :
+        Summarise the recorded time to ready so the timeouts can be tuned from data, 
+        and what the resource blocking saves on each page. 
+
+    Args    : 
+        filepath : Path to the telemetry file. 
+
+    Output  : 
+        Count, timeouts and the p50 / p95 / max time to ready in seconds. For each 
+        scraper, the median requests, bytes and navigation time of a page with and 
+        without resource blocking, and the difference (saved per page) once both 
+        have been recorded, e.g. after a run with BROWSER_BLOCK_RESOURCES = False. 
+    '''
+
+    with open(filepath) as f: 
+        ls_records = [json.loads(line) for line in f if line.strip()]
+
+    ls_durations = sorted(record['time_to_ready'] for record in ls_records if not record['timed_out'])
+    dict_summary = {
+        'count': len(ls_records), 
+        'timed_out': sum(record['timed_out'] for record in ls_records), 
+    }
+    if len(ls_durations) > 1: 
+        percentiles = statistics.quantiles(ls_durations, n=100)
+        dict_summary.update({'p50': percentiles[49], 'p95': percentiles[94], 'max': ls_durations[-1]})
+
+    ls_keys = ['requests', 'bytes', 'blocked_requests', 'time_to_navigate']
+    dict_summary['resources'] = {}
+    for func_name in sorted({record['func'] for record in ls_records if 'bytes' in record}): 
+        dict_usage = {}
+        for profile in (PROFILE_BLOCKING, PROFILE_FULL): 
+            ls_usage = [record for record in ls_records if record['func'] == func_name and record.get('profile') == profile and 'bytes' in record]
+            if ls_usage: 
+                dict_usage[profile] = {key: statistics.median(record[key] for record in ls_usage) for key in ls_keys}
+                dict_usage[profile]['pages'] = len(ls_usage)
+
+        if len(dict_usage) == 2: 
+            dict_usage['saved_per_page'] = {key: dict_usage[PROFILE_FULL][key] - dict_usage[PROFILE_BLOCKING][key] for key in ['requests', 'bytes', 'time_to_navigate']}
+        dict_summary['resources'][func_name] = dict_usage
+    return dict_summary
+
+
+
+# -------------------------------------------------------
+# Decorator
+# -------------------------------------------------------
+
+def wait_for_webpage_to_load(func:Optional[Callable]=None, stage:Optional[Text]=None):
+    # Use as "@wait_for_webpage_to_load" or "@wait_for_webpage_to_load(stage=...)" to 
+    # record the stage of the page in the telemetry. 
+    if func is None: 
+        return partial(wait_for_webpage_to_load, stage=stage)
+
+    @wraps(func)
+    def wrapper(url:Text, xpath:Text, **kwargs):
+        # Borrow a browser from the pool and load the URL once the host has a free slot. 
+        with host_slot(url), get_browser_pool().browser() as browser:
+            # Drop the network events of the previous page before loading this one. 
+            read_network_usage(browser)
+            block_resources(browser)
+
+            start = time.perf_counter()
+            with metrics.span('browser.get', url=url):
+                browser.get(url)
+
+            # You can't scrape the data until the site completes the load. 
+            # So wait for it to be ready first. 
+            try:
+                with metrics.span('browser.readiness_wait', url=url):
+                    timings = wait_for_page_readiness(browser, xpath)
+                timings['timed_out'] = False
+            # Carry on with whatever has been loaded if it takes too long. 
+            except TimeoutException:
+                logger.exception(f"Timed out waiting for page to load for ({func}).")
+                metrics.increment('timeouts', stage='readiness_wait')
+                timings = {'time_to_ready': None, 'timed_out': True}
+
+            timings['time_to_navigate'] = time.perf_counter() - start
+
+            # Count what the page fetched and what was blocked. 
+            dict_usage = read_network_usage(browser)
+            timings.update(stage=stage, profile=PROFILE_BLOCKING if BROWSER_BLOCK_RESOURCES else PROFILE_FULL, **dict_usage)
+            metrics.increment('blocked_requests', dict_usage.get('blocked_requests', 0), stage=stage)
+            metrics.increment('transferred_bytes', dict_usage.get('bytes', 0), stage=stage)
+            record_page_load_telemetry(url, func.__name__, timings)
+            logger.debug(f'----- Page is ready -- ({url}) -- ({timings})')
+
+            # Keep the raw HTML so the data can be parsed again without the live site. 
+            if SAVE_SNAPSHOTS: 
+                try:
+                    save_snapshot(url, browser.page_source)
+                except Exception:
+                    logger.exception(f'Unable to save the snapshot for ({url}).')
+
+            # Return the loaded page. 
+            return func(url=url, xpath=xpath, browser=browser, **kwargs)
     return wrapper
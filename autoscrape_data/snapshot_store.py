@@ -0,0 +1,164 @@
+# %%
+import logging
+import datetime as dt
+from typing import Dict, Optional, Text
+from urllib.parse import urlsplit, parse_qs
+
+# For storing the raw HTML. 
+import os, gzip, hashlib, json, threading
+
+# Import personal module. 
+from config.config_logger import setup_logger
+from config.config import (
+    LOG_SNAPSHOT_STORE_FILEPATH, 
+    SNAPSHOT_DIR, 
+    SNAPSHOT_MANIFEST_FILEPATH, 
+)
+
+
+
+# %%
+# --------------------------------------------------------------
+# Logging configuration
+# --------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+logger, file_handler, stream_handler = setup_logger(logger, LOG_SNAPSHOT_STORE_FILEPATH)
+
+
+
+# %%
+# -------------------------------------------------------
+# Snapshot store
+# -------------------------------------------------------
+
+# Kinds of webpage kept in the store. 
+SNAPSHOT_BANK_MENU = 'bank_menu'
+SNAPSHOT_LISTING = 'listing'
+SNAPSHOT_CARD = 'card'
+
+_manifest_lock = threading.Lock()
+
+
+def classify_url(url:Text) -> Text:
+    '''
+    Purpose :
+        Tell the kind of webpage from its URL.
+
+    Args    :
+        url : URL of the webpage.
+
+    Output  :
+        A bank listing page ("?filter=bank"), a card page ("card.html") or the bank menu.
+    '''
+
+    parts = urlsplit(url)
+    if 'filter' in parse_qs(parts.query):
+        return SNAPSHOT_LISTING
+    if parts.path.endswith('.html'):
+        return SNAPSHOT_CARD
+    return SNAPSHOT_BANK_MENU
+
+
+def _snapshot_filepath(digest:Text, snapshot_dir:Text) -> Text:
+    # Fan out by the first 2 characters so that no folder holds too many files. 
+    return f'{snapshot_dir}/objects/{digest[:2]}/{digest}.html.gz'
+
+
+def save_snapshot(
+        url:Text,
+        html:Text,
+        snapshot_dir:Text=SNAPSHOT_DIR,
+        manifest_filepath:Text=SNAPSHOT_MANIFEST_FILEPATH,
+    ) -> Text:
+    '''
+    Purpose :
+        Store the raw HTML of a fetched webpage. The HTML is compressed and keyed by
+        its content hash, so an unchanged page is only stored once across crawls.
+        Every fetch is recorded in the manifest.
+
+    Args    :
+        url               : URL of the webpage.
+        html              : Raw HTML of the webpage.
+        snapshot_dir      : Directory of the snapshot store.
+        manifest_filepath : Path to the manifest file.
+
+    Output  :
+        The content hash of the snapshot.
+    '''
+
+    content = html.encode('utf-8')
+    digest = hashlib.sha256(content).hexdigest()
+    filepath = _snapshot_filepath(digest, snapshot_dir)
+
+    # Write to a temporary file first so that a crash never leaves a partial snapshot. 
+    if not os.path.exists(filepath):
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        tmp_filepath = f'{filepath}.{threading.get_ident()}.tmp'
+        with gzip.open(tmp_filepath, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_filepath, filepath)
+        logger.debug(f'----- Stored a new snapshot ({digest}) for ({url})!')
+
+    record = {
+        'timestamp': dt.datetime.now().isoformat(timespec='seconds'),
+        'url': url,
+        'kind': classify_url(url),
+        'digest': digest,
+    }
+    with _manifest_lock:
+        os.makedirs(os.path.dirname(manifest_filepath), exist_ok=True)
+        with open(manifest_filepath, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+    return digest
+
+
+def load_snapshot(digest:Text, snapshot_dir:Text=SNAPSHOT_DIR) -> Text:
+    '''
+    Purpose :
+        Read the raw HTML of a snapshot.
+
+    Args    :
+        digest       : The content hash of the snapshot.
+        snapshot_dir : Directory of the snapshot store.
+
+    Output  :
+        Raw HTML of the webpage.
+    '''
+
+    with gzip.open(_snapshot_filepath(digest, snapshot_dir), 'rb') as f:
+        return f.read().decode('utf-8')
+
+
+def load_snapshot_manifest(
+        since:Optional[Text]=None,
+        until:Optional[Text]=None,
+        manifest_filepath:Text=SNAPSHOT_MANIFEST_FILEPATH,
+    ) -> Dict[Text, Dict]:
+    '''
+    Purpose :
+        Find the latest snapshot of every URL fetched within a period.
+
+    Args    :
+        since             : Earliest fetch date to include (ISO format, e.g. "2021-03-01").
+        until             : Latest fetch date to include (ISO format, inclusive).
+        manifest_filepath : Path to the manifest file.
+
+    Output  :
+        The latest manifest record for each URL, in the order they were first fetched.
+    '''
+
+    dict_records = {}
+    with open(manifest_filepath) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            date = record['timestamp'][:10]
+            if (since and date < since) or (until and date > until):
+                continue
+            dict_records[record['url']] = record
+
+    logger.info(f'Loaded ({len(dict_records)}) snapshots from the manifest ({since} -- {until}).')
+    return dict_records
@@ -0,0 +1,134 @@
+# %%
+import time
+
+# Time the start up from the first line, before anything else is imported. 
+START_TIME = time.perf_counter()
+
+import argparse, logging, sys
+from typing import List, Optional, Text
+
+# Import personal module. Only the config is imported up front, each stage imports 
+# the heavy modules (pandas, Prefect, Selenium) once it is picked. 
+from config.config_logger import setup_logger
+from config.config import ( 
+    LOG_CLI_FILEPATH, 
+    CARD_DF_FILEPATH, 
+    FLOW_EXECUTOR, 
+    FLOW_EXECUTOR_WORKERS, 
+)
+
+
+
+# %%
+# --------------------------------------------------------------
+# Logging configuration 
+# --------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+logger, file_handler, stream_handler = setup_logger(logger, LOG_CLI_FILEPATH)
+
+
+
+# %%
+# -------------------------------------------------------
+# Stages 
+# -------------------------------------------------------
+
+STAGE_SCRAPE = 'scrape'
+STAGE_PROCESS = 'process'
+STAGE_ALL = 'all'
+LS_STAGES = [STAGE_SCRAPE, STAGE_PROCESS, STAGE_ALL]
+
+
+def run_process_stage(from_csv:Text=CARD_DF_FILEPATH, from_snapshot:Optional[Text]=None) -> bool:
+    '''
+    Purpose :
+        Process the card data without Prefect or a browser, and save the cashback and
+        reward points tables.
+
+    Args    :
+        from_csv      : Path to the card dataframe (CSV) to process.
+        from_snapshot : Rebuild the card dataframe from the snapshots fetched since this
+                        date (ISO format) instead, or from every snapshot if empty.
+
+    Output  :
+        Whether both tables were processed.
+    '''
+
+    from autoprocess_data import process_card_data
+
+    if from_snapshot is not None:
+        from autoscrape_data.card_parsing import rebuild_card_data_from_snapshots
+        df_card = rebuild_card_data_from_snapshots(since=from_snapshot or None)
+    else:
+        import pandas as pd
+        df_card = pd.read_csv(from_csv)
+    logger.info(f'Loaded ({len(df_card)}) cards to process.')
+
+    df_reward = process_card_data.extract_reward_points_data.run(df_card)
+    df_cashback = process_card_data.extract_cashback_data.run(df_card)
+    return df_reward is not None and df_cashback is not None
+
+
+def run_flow_stage(process:bool, executor:Text=FLOW_EXECUTOR, workers:Optional[int]=FLOW_EXECUTOR_WORKERS) -> bool:
+    '''
+    Purpose :
+        Scrape the site with the Prefect flow, and process the data too if (process).
+
+    Output  :
+        Whether the flow succeeded.
+    '''
+
+    import run_pipeline
+
+    flow = run_pipeline.build_flow(process=process)
+    flow_state = run_pipeline.run_flow(flow, run_pipeline.build_executor(executor, workers))
+    return flow_state.is_successful()
+
+
+def _import_stage(stage:Text) -> None:
+    # Import what the stage needs before it starts, so the start up time covers it. 
+    if stage == STAGE_PROCESS:
+        import autoprocess_data.process_card_data
+    else:
+        import run_pipeline
+
+
+
+# %%
+# -------------------------------------------------------
+# Command line 
+# -------------------------------------------------------
+
+def main(argv:Optional[List[Text]]=None) -> int:
+    parser = argparse.ArgumentParser(description='Scrape the bank cards and / or process the card data.')
+    parser.add_argument('stage', choices=LS_STAGES, help='"process" only needs the card data, not the site.')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--from-csv', nargs='?', const=CARD_DF_FILEPATH, metavar='PATH',
+                        help=f'Process the card dataframe at PATH (default: {CARD_DF_FILEPATH}).')
+    source.add_argument('--from-snapshot', nargs='?', const='', metavar='SINCE',
+                        help='Process the card data rebuilt from the snapshots fetched since SINCE (ISO date).')
+    parser.add_argument('--executor', default=FLOW_EXECUTOR, choices=['sequential', 'threads', 'processes'])
+    parser.add_argument('--workers', type=int, default=FLOW_EXECUTOR_WORKERS)
+    args = parser.parse_args(argv)
+
+    if args.stage != STAGE_PROCESS and (args.from_csv is not None or args.from_snapshot is not None):
+        parser.error('--from-csv and --from-snapshot only apply to the "process" stage.')
+
+    _import_stage(args.stage)
+    startup = time.perf_counter() - START_TIME
+    print(f'Started up in ({startup:.3f}s) for the ({args.stage}) stage.', file=sys.stderr)
+    logger.info(f'Started up in ({startup:.3f}s) for the ({args.stage}) stage.')
+
+    start = time.perf_counter()
+    if args.stage == STAGE_PROCESS:
+        succeeded = run_process_stage(args.from_csv or CARD_DF_FILEPATH, args.from_snapshot)
+    else:
+        succeeded = run_flow_stage(args.stage == STAGE_ALL, args.executor, args.workers)
+
+    print(f'Finished the ({args.stage}) stage in ({time.perf_counter() - start:.1f}s).', file=sys.stderr)
+    return 0 if succeeded else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
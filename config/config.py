@@ -10,6 +10,99 @@ DRIVER_PATH = "docs/system/chromedriver_v88"
 SLEEP = 5
 WEBPAGE_LOADING_TIMEOUT = 10 + SLEEP
 
+# Page readiness. A page is ready once the element is visible, the document has 
+# completed and no new resource has been requested for (NETWORK_IDLE_TIME) seconds. 
+# (WEBPAGE_LOADING_TIMEOUT) is the ceiling for the whole wait. 
+NETWORK_IDLE_TIME = 0.5
+READINESS_POLL_FREQUENCY = 0.1
+
+# Crawl engine. "threads" scrapes with a thread pool, "asyncio" keeps many requests in 
+# flight on an event loop. The asyncio engine paces requests with a token bucket of 
+# (CRAWL_RATE_LIMIT) requests per second, allowing bursts of (CRAWL_BURST) requests. 
+CRAWL_ENGINE = "threads"
+CRAWL_RATE_LIMIT = 5
+CRAWL_BURST = 10
+CRAWL_MAX_IN_FLIGHT = 200
+CRAWL_MAX_IN_FLIGHT_PER_HOST = 20
+
+# Browser pool. Each browser is relaunched after serving (BROWSER_MAX_PAGES) pages. 
+BROWSER_POOL_SIZE = 2
+BROWSER_MAX_PAGES = 50
+BROWSER_CHECKOUT_TIMEOUT = 120
+
+# Resource blocking, to cut the bandwidth, the page load time and the memory of each browser. 
+# The Chrome preferences in (BROWSER_BLOCKED_PREFS) turn off images, plugins and pop-ups for 
+# the whole browser. The <img> tags stay in the page, so their "alt" and "src" can still be read. 
+# The requests matching (BROWSER_BLOCKED_URLS) are blocked on each page over CDP, "*" being a 
+# wildcard. Neither the listing nor the card pages read any of them, so every page blocks the 
+# same list. Stylesheets are left alone because the readiness wait checks the layout. 
+BROWSER_BLOCK_RESOURCES = True
+BROWSER_BLOCKED_PREFS = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.managed_default_content_settings.plugins": 2,
+    "profile.managed_default_content_settings.popups": 2,
+    "profile.managed_default_content_settings.notifications": 2,
+    "profile.managed_default_content_settings.geolocation": 2,
+    "profile.managed_default_content_settings.media_stream": 2,
+}
+BROWSER_BLOCKED_URLS = [
+    # Images the preferences miss, e.g. CSS backgrounds and icons. 
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    # Fonts and media. 
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot", "*.mp4", "*.webm", "*.mp3",
+    # Third-party analytics, tag managers, ads and chat widgets. 
+    "*google-analytics.com*", "*googletagmanager.com*", "*googleadservices.com*",
+    "*googlesyndication.com*", "*doubleclick.net*", "*facebook.net*", "*facebook.com/tr*",
+    "*hotjar.com*", "*criteo.*", "*taboola.com*", "*newrelic.com*", "*nr-data.net*",
+    "*intercom.io*", "*zopim.com*", "*tiktok.com*", "*clarity.ms*",
+]
+
+# Concurrency. Keep (BROWSER_POOL_SIZE) at least as large as the number of workers. 
+CARD_SCRAPING_WORKERS = 2
+MAX_CONCURRENT_REQUESTS_PER_HOST = 2
+
+# Flow executor. "sequential" runs one task at a time. "threads" and "processes" run the tasks 
+# mapped over the banks on a LocalDaskExecutor with (FLOW_EXECUTOR_WORKERS) workers (None for one 
+# per core). With "processes", each worker has its own browser pool, host limits and metrics. 
+FLOW_EXECUTOR = "threads"
+FLOW_EXECUTOR_WORKERS = None
+
+# Retries of the tasks mapped over the banks, (TASK_RETRY_DELAY) seconds apart. 
+TASK_MAX_RETRIES = 2
+TASK_RETRY_DELAY = 30
+
+# Fetch backend. "http" fetches the raw HTML over a pooled session and falls back to 
+# the browser when a page fails validation. "selenium" always uses the browser. 
+FETCH_BACKEND = "http"
+HTTP_TIMEOUT = 15
+HTTP_RETRIES = 3
+HTTP_POOL_CONNECTIONS = 4
+HTTP_POOL_MAXSIZE = 8
+HTTP_USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/88.0 Safari/537.36"
+
+# Local stand-in for the live site (autoscrape_data/mock_site.py). Each response is held back 
+# by (MOCK_SITE_LATENCY) +/- (MOCK_SITE_JITTER) seconds and a (MOCK_SITE_FAILURE_RATE) share of 
+# the requests fail with a 503. 
+MOCK_SITE_BANKS = 10
+MOCK_SITE_CARDS_PER_BANK = 20
+MOCK_SITE_LATENCY = 0.05
+MOCK_SITE_JITTER = 0.02
+MOCK_SITE_FAILURE_RATE = 0.0
+
+# Scrape benchmark against the mock site, for each fetch backend and concurrency level. 
+SCRAPE_BENCHMARK_BACKENDS = ["http", "asyncio"]
+SCRAPE_BENCHMARK_CONCURRENCY = [1, 4, 16]
+
+# Processing benchmark on synthetic card data. A step is not tried on the larger sizes 
+# once it takes more than (PROCESS_BENCHMARK_TIME_BUDGET) seconds. 
+PROCESS_BENCHMARK_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+PROCESS_BENCHMARK_TIME_BUDGET = 600
+PROCESS_BENCHMARK_FILEPATH = "docs/benchmarks/process_benchmark.json"
+
+# Raw HTML snapshots of every fetched page, used to rebuild the data offline. 
+SAVE_SNAPSHOTS = True
+HTML_PARSER = "html.parser"
+
 # List of values. 
 CARD_TYPE = set(['mastercard', 'visa', 'american', 'unionpay']) 
 
@@ -20,6 +113,26 @@ EXCLUDED_SUMMARY = ['Balance Transfer', 'Easy Payment Plan', 'Interest-free', 'C
 INCLUDED_SUMMARY = ['Min. Income', 'Annual Fee', 'Interest Rate'] 
 INCLUDED_REQUIREMENTS = ['Minimum Age', 'Who Can Apply'] 
 
+# Spending categories of a customer profile, and the words that tie a cashback or reward 
+# category of a card to them. A card category counts for every spending category it mentions. 
+DICT_SPENDING_CATEGORY_KEYWORDS = {
+    'groceries': ['groceries', 'grocery', 'supermarket'], 
+    'dining': ['dining', 'food'], 
+    'petrol': ['petrol', 'petronas', 'petron', 'fuel', 'setel'], 
+    'online': ['online', 'e-commerce'], 
+    'ewallet': ['e-wallet', 'ewallet'], 
+    'utilities': ['utility', 'utilities', 'bill'], 
+    'travel': ['travel', 'airline', 'hotel', 'airasia'], 
+    'overseas': ['overseas', 'foreign'], 
+    'others': ['all retail', 'other', 'all local', 'all purchases', 'all transactions', 'retail spend'], 
+}
+
+# Share of the spending that happens on weekends, for the cashback on weekends only. 
+WEEKEND_SPENDING_SHARE = 2 / 7
+
+# Number of cards kept in each materialised view of the card query index. 
+QUERY_VIEW_SIZE = 20
+
 # Regex. 
 RX_QUALIFIED_APPLICANT = r"Anybody|Malaysians|Permanent Residents|Salaried employee|Self-employed"
 
@@ -37,20 +150,97 @@ VARS_SAVE_DIR = "docs/variables"
 CARD_SAVE_DIR = "docs/csv/card"
 CASHBACK_SAVE_DIR = "docs/csv/cashback" 
 REWARD_POINTS_SAVE_DIR = "docs/csv/reward_points"
+REWARD_CATALOGUE_DIR = "docs/csv/reward_catalogue"
 
-# Directory path for saving checkpoints. 
+# Directory path for saving checkpoints. Each bank has a log of its own, so the banks 
+# scraped in parallel never write to or remove the log of another bank. 
 CARD_CHECKPOINT_DIR = "docs/csv/card_scraping_checkpoint" 
+CARD_CHECKPOINT_FILEPATH = f"{CARD_CHECKPOINT_DIR}/card_checkpoint_v{DF_CARD_VERSION}_{{bank}}.jsonl"
+
+# Resume from the checkpoint log after a crash instead of scraping every card again. The cards 
+# logged more than (CARD_CHECKPOINT_MAX_AGE_HOURS) hours ago are left out, so a log left behind 
+# by an old crash isn't replayed over the fresh data. 
+CARD_CHECKPOINT_RESUME = True
+CARD_CHECKPOINT_MAX_AGE_HOURS = 24
+
+# Incremental scraping. A card keeps its row from the previous card data when its bank listing 
+# (name, image, link and listing text) hasn't changed, instead of its webpage being scraped again. 
+# Every card is still scraped again once its row is older than (SCRAPE_MAX_AGE_DAYS) days. 
+SCRAPE_INCREMENTAL = True
+SCRAPE_MAX_AGE_DAYS = 180
+
+# Build the rows of the new and changed cards from the bank listing alone (link, image and the 
+# summary shown on it) without opening their webpage. The benefits, requirements and tables 
+# are left empty, and the next run with this off scrapes those cards in full. 
+SCRAPE_LISTING_ONLY = False
+
+# Prefect task cache, on with PREFECT__FLOWS__CHECKPOINTING=true (set by "sh/run_pipeline.sh"). 
+# A task result is kept under a key made of its inputs, code and config, and the least recently 
+# used results are removed after each run once (TASK_CACHE_DIR) outgrows (TASK_CACHE_MAX_BYTES). 
+# The scraping tasks also rerun every (TASK_CACHE_SCRAPE_PERIOD). 
+TASK_CACHE_DIR = "result_config"
+TASK_CACHE_MAX_BYTES = 2 * 1024 ** 3
+TASK_CACHE_SCRAPE_PERIOD = "%Y-%m"
+
+# Directory path for saving raw HTML snapshots. 
+SNAPSHOT_DIR = "docs/snapshots"
+SNAPSHOT_MANIFEST_FILEPATH = f"{SNAPSHOT_DIR}/manifest.jsonl"
+
+# Card images, stored once by their content hash with a manifest of the ETag and Last-Modified 
+# of each URL, so an unchanged image is only revalidated on the next run. (IMAGE_DOWNLOAD_WORKERS) 
+# images are downloaded at once from each host, apart from the cap on the pages of the same host 
+# (MAX_CONCURRENT_REQUESTS_PER_HOST), and the thumbnails that fit within (IMAGE_THUMBNAIL_SIZE) are 
+# made on (IMAGE_THUMBNAIL_WORKERS) processes (None for one per core). 
+IMAGE_DIR = "docs/card_images"
+IMAGE_MANIFEST_FILEPATH = f"{IMAGE_DIR}/manifest.json"
+IMAGE_DOWNLOAD_WORKERS = 8
+IMAGE_THUMBNAIL_SIZE = (240, 150)
+IMAGE_THUMBNAIL_WORKERS = None
 
 # Path to the CSV files. 
 CARD_DF_FILEPATH = f"{CARD_SAVE_DIR}/df_card_v{DF_CARD_VERSION}.csv" 
 CASHBACK_DF_FILEPATH = f"{CASHBACK_SAVE_DIR}/df_cashback_v{DF_CASHBACK_VERSION}.csv" 
 REWARD_POINTS_DF_FILEPATH = f"{REWARD_POINTS_SAVE_DIR}/df_reward_points_v{DF_REWARD_POINTS_VERSION}.csv" 
 
+# Path to the reward catalogue, one row per redeemable item of each bank with its value in RM. 
+REWARD_CATALOGUE_FILEPATH = f"{REWARD_CATALOGUE_DIR}/df_reward_catalogue.csv"
+
+# Path to the Parquet files. The CSV files are still written when (SAVE_CSV) is on. 
+CARD_PARQUET_FILEPATH = f"{CARD_SAVE_DIR}/df_card_v{DF_CARD_VERSION}.parquet"
+CASHBACK_PARQUET_FILEPATH = f"{CASHBACK_SAVE_DIR}/df_cashback_v{DF_CASHBACK_VERSION}.parquet"
+REWARD_POINTS_PARQUET_FILEPATH = f"{REWARD_POINTS_SAVE_DIR}/df_reward_points_v{DF_REWARD_POINTS_VERSION}.parquet"
+SAVE_CSV = True
+
 # Path to the log files. 
 LOG_SELENIUM_FILEPATH = "logs/selenium_loader.log"
 LOG_CARD_SCRAPING_FILEPATH = "logs/card_scraping.log"
 LOG_NAME_SCRAPING_FILEPATH = "logs/name_scraping.log"
 LOG_PROCESS_CARD_DATA_FILEPATH = "logs/process_card_data.log" 
+LOG_CATEGORY_EXPLODE_FILEPATH = "logs/category_explode.log"
+LOG_COLUMNAR_STORAGE_FILEPATH = "logs/columnar_storage.log"
+LOG_CASHBACK_SIMULATOR_FILEPATH = "logs/cashback_simulator.log"
+LOG_REWARD_VALUATION_FILEPATH = "logs/reward_valuation.log"
+LOG_CARD_QUERY_FILEPATH = "logs/card_query.log"
+LOG_SNAPSHOT_STORE_FILEPATH = "logs/snapshot_store.log"
+LOG_CARD_PARSING_FILEPATH = "logs/card_parsing.log"
+LOG_HTTP_FILEPATH = "logs/http_loader.log"
+LOG_ASYNC_CRAWLER_FILEPATH = "logs/async_crawler.log"
+LOG_MOCK_SITE_FILEPATH = "logs/mock_site.log"
+LOG_SCRAPE_BENCHMARK_FILEPATH = "logs/scrape_benchmark.log"
+LOG_PROCESS_BENCHMARK_FILEPATH = "logs/process_benchmark.log"
+LOG_TASK_CACHE_FILEPATH = "logs/task_cache.log"
+LOG_CLI_FILEPATH = "logs/cli.log"
+LOG_IMAGE_STORE_FILEPATH = "logs/image_store.log"
+
+# Path to the telemetry files. 
+PAGE_LOAD_TELEMETRY_FILEPATH = "logs/page_load_telemetry.jsonl" 
+
+# Metrics of each run: time spent in each span and counters such as retries and timeouts. 
+# The Prometheus text file is replaced on each run, a trace file is kept for each run. 
+METRICS_PREFIX = "bank_card"
+METRICS_PROMETHEUS_FILEPATH = "logs/metrics/bank_card_scraping.prom"
+METRICS_TRACE_DIR = "logs/metrics/traces"
+METRICS_TRACE_MAX_EVENTS = 200000
 
 
 
@@ -61,7 +251,11 @@ LOG_PROCESS_CARD_DATA_FILEPATH = "logs/process_card_data.log"
 # General metadata. 
 DF_URL = 'url'
 DF_IMG = 'img'
+DF_IMG_PATH = 'img_path'
+DF_IMG_THUMBNAIL_PATH = 'img_thumbnail_path'
 DF_BANK = 'bank'
+DF_LISTING_FINGERPRINT = 'listing_fingerprint'
+DF_SCRAPED_AT = 'scraped_at'
 
 # Card metadata. 
 DF_CARD_NAME_ORIGINAL = 'card_name_original'
@@ -0,0 +1,232 @@
+import os, json, threading, time, asyncio
+import datetime as dt
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Text, Tuple
+
+# Import personal module. 
+from config.config import ( 
+    METRICS_PREFIX, 
+    METRICS_PROMETHEUS_FILEPATH, 
+    METRICS_TRACE_DIR, 
+    METRICS_TRACE_MAX_EVENTS, 
+)
+
+
+
+# --------------------------------------------------------------
+# Metrics registry 
+# --------------------------------------------------------------
+
+class Metrics:
+    '''
+    Purpose :
+        Collect the time spent in each step of a run (spans) and the number of
+        notable events (counters), e.g. retries and timeouts. Spans are summed up
+        by name for the Prometheus export, and each one is also kept as an event
+        of the JSON trace, with its thread and attributes, to see the hot path.
+
+    Args    :
+        prefix     : Prefix of the Prometheus metric names.
+        max_events : Maximum number of span events kept for the trace.
+    '''
+
+    def __init__(self, prefix:Text=METRICS_PREFIX, max_events:int=METRICS_TRACE_MAX_EVENTS):
+        self.prefix = prefix
+        self.max_events = max_events
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __reduce__(self):
+        # Functions sent to a worker process, e.g. by a process pool, carry the metrics 
+        # they record to. Each process records to its own metrics rather than a copy. 
+        return (_process_metrics, ())
+
+    def reset(self) -> None:
+        with self._lock:
+            self._started = time.time()
+            self._origin = time.perf_counter()
+            self._dict_spans:Dict[Text, List[float]] = {}
+            self._dict_counters:Dict[Tuple[Text, Tuple], float] = {}
+            self._ls_events:List[Dict] = []
+            self._dropped_events = 0
+
+    @staticmethod
+    def _track_id() -> int:
+        # Coroutines share the thread of the event loop, so tell them apart by task. 
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        return id(task) if task is not None else threading.get_ident()
+
+    def record_span(self, name:Text, start:float, seconds:float, **attributes:Any) -> None:
+        with self._lock:
+            # Count, sum and max of the span durations. 
+            summary = self._dict_spans.setdefault(name, [0, 0.0, 0.0])
+            summary[0] += 1
+            summary[1] += seconds
+            summary[2] = max(summary[2], seconds)
+
+            if len(self._ls_events) >= self.max_events:
+                self._dropped_events += 1
+                return
+            self._ls_events.append({
+                'name': name,
+                'ph': 'X',
+                'ts': (start - self._origin) * 1e6,
+                'dur': seconds * 1e6,
+                'pid': os.getpid(),
+                'tid': self._track_id(),
+                'args': {key: str(value) for key, value in attributes.items()},
+            })
+
+    @contextmanager
+    def span(self, name:Text, **attributes:Any) -> Iterator[None]:
+        '''
+        Purpose :
+            Time the block, e.g. "with metrics.span('browser.get', url=url): ...".
+            The attributes only go to the trace, not to the Prometheus labels.
+        '''
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_span(name, start, time.perf_counter() - start, **attributes)
+
+    def increment(self, name:Text, value:float=1, **labels:Any) -> None:
+        '''
+        Purpose :
+            Add to a counter, e.g. "metrics.increment('retries', backend='http')".
+            Keep the labels to a few values, they become Prometheus labels.
+        '''
+
+        key = (name, tuple(sorted((label, str(label_value)) for label, label_value in labels.items())))
+        with self._lock:
+            self._dict_counters[key] = self._dict_counters.get(key, 0) + value
+
+    def to_prometheus(self) -> Text:
+        '''
+        Purpose :
+            Render the spans and counters in the Prometheus text format.
+        '''
+
+        def _labels(dict_labels:Dict) -> Text:
+            escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for value in dict_labels.values())
+            return '{' + ','.join(f'{key}="{value}"' for key, value in zip(dict_labels, escaped)) + '}' if dict_labels else ''
+
+        with self._lock:
+            dict_spans = {name: list(summary) for name, summary in self._dict_spans.items()}
+            dict_counters = dict(self._dict_counters)
+            dropped_events = self._dropped_events
+
+        metric = f'{self.prefix}_span_seconds'
+        ls_lines = [
+            f'# HELP {self.prefix}_run_start_timestamp_seconds Start of the run.',
+            f'# TYPE {self.prefix}_run_start_timestamp_seconds gauge',
+            f'{self.prefix}_run_start_timestamp_seconds {self._started:.3f}',
+            f'# HELP {metric} Time spent in each instrumented span.',
+            f'# TYPE {metric} summary',
+        ]
+        for name, (count, total, _) in sorted(dict_spans.items()):
+            ls_lines.append(f'{metric}_count{_labels({"span": name})} {count}')
+            ls_lines.append(f'{metric}_sum{_labels({"span": name})} {total:.6f}')
+        ls_lines += [f'# HELP {metric}_max Longest time spent in each instrumented span.', f'# TYPE {metric}_max gauge']
+        for name, (_, _, longest) in sorted(dict_spans.items()):
+            ls_lines.append(f'{metric}_max{_labels({"span": name})} {longest:.6f}')
+
+        for name in sorted({name for name, _ in dict_counters}):
+            ls_lines += [f'# HELP {self.prefix}_{name}_total Number of {name.replace("_", " ")}.', f'# TYPE {self.prefix}_{name}_total counter']
+            for (counter, labels), value in sorted(dict_counters.items()):
+                if counter == name:
+                    ls_lines.append(f'{self.prefix}_{name}_total{_labels(dict(labels))} {value:g}')
+
+        ls_lines += [
+            f'# HELP {self.prefix}_trace_dropped_events_total Spans left out of the trace once it is full.',
+            f'# TYPE {self.prefix}_trace_dropped_events_total counter',
+            f'{self.prefix}_trace_dropped_events_total {dropped_events}',
+        ]
+        return '\n'.join(ls_lines) + '\n'
+
+    def to_trace(self) -> Dict:
+        '''
+        Purpose :
+            Render the spans as a trace in the Chrome trace event format, which opens
+            in chrome://tracing or https://ui.perfetto.dev.
+        '''
+
+        with self._lock:
+            return {
+                'traceEvents': list(self._ls_events),
+                'displayTimeUnit': 'ms',
+                'otherData': {
+                    'started': dt.datetime.fromtimestamp(self._started).isoformat(timespec='seconds'),
+                    'dropped_events': self._dropped_events,
+                },
+            }
+
+
+
+# --------------------------------------------------------------
+# Metrics of this process 
+# --------------------------------------------------------------
+
+metrics = Metrics()
+
+
+def _process_metrics() -> Metrics:
+    return metrics
+
+
+def traced(name:Optional[Text]=None) -> Callable:
+    '''
+    Purpose :
+        Decorator to time every call of a function as a span, named after the
+        function by default. Put it under the Prefect "@task" decorator so that
+        the task name and signature are kept.
+    '''
+
+    def decorator(func:Callable) -> Callable:
+        span_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with metrics.span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def export_metrics(
+        prometheus_filepath:Text=METRICS_PROMETHEUS_FILEPATH,
+        trace_dir:Text=METRICS_TRACE_DIR,
+    ) -> Tuple[Text, Text]:
+    '''
+    Purpose :
+        Write the metrics of the run to a Prometheus text file, e.g. for the textfile
+        collector of the node exporter, and the trace to a JSON file of its own.
+
+    Args    :
+        prometheus_filepath : Path to the Prometheus text file, replaced on each run.
+        trace_dir           : Folder for the trace files, one per run.
+
+    Output  :
+        The paths to the Prometheus text file and the trace file.
+    '''
+
+    os.makedirs(os.path.dirname(prometheus_filepath), exist_ok=True)
+    os.makedirs(trace_dir, exist_ok=True)
+
+    # Write to a temporary file first so that a scrape never reads half a file. 
+    with open(f'{prometheus_filepath}.tmp', 'w') as f:
+        f.write(metrics.to_prometheus())
+    os.replace(f'{prometheus_filepath}.tmp', prometheus_filepath)
+
+    dict_trace = metrics.to_trace()
+    started = dt.datetime.fromtimestamp(metrics._started).strftime('%Y%m%dT%H%M%S')
+    trace_filepath = f'{trace_dir}/trace_{started}.json'
+    with open(trace_filepath, 'w') as f:
+        json.dump(dict_trace, f)
+
+    return prometheus_filepath, trace_filepath
@@ -5,7 +5,11 @@
 # General metadata. 
 DF_URL = 'url'
 DF_IMG = 'img'
+DF_IMG_PATH = 'img_path'
+DF_IMG_THUMBNAIL_PATH = 'img_thumbnail_path'
 DF_BANK = 'bank'
+DF_LISTING_FINGERPRINT = 'listing_fingerprint'
+DF_SCRAPED_AT = 'scraped_at'
 
 # Card metadata. 
 DF_CARD_NAME_ORIGINAL = 'card_name_original'
@@ -28,6 +32,7 @@ DF_CASHBACK_TILL = 'cashback_till'
 DF_CASHBACK_WEEKENDS_COND = 'cashback_weekends_only'
 DF_CASHBACK_MONTHLY_COND = 'cashback_monthly_basis'
 DF_CASHBACK_SINGLE_RECEIPT_COND = 'cashback_single_receipt'
+DF_CASHBACK_UNCAPPED_COND = 'cashback_uncapped'
 
 # Reward info. 
 DF_REWARD = 'reward'
@@ -40,14 +45,19 @@ DF_EACH_SPENDING = 'each_spending'
 DF_TRAVEL_BENEFIT = 'travel_benefit'
 DF_TRAVEL_BENEFIT_CAT = 'travel_benefit_category'
 DF_TRAVEL_BENEFIT_INFO = 'travel_benefit_info'
+DF_TRAVEL_BENEFIT_DETAIL = 'travel_benefit_detail'
 
 # Premium info. 
 DF_PREMIUM = 'premium'
+DF_PREMIUM_CAT = 'premium_category'
 DF_PREMIUM_INFO = 'premium_info'
+DF_PREMIUM_DETAIL = 'premium_detail'
 
 # Petrol info. 
 DF_PETROL = 'petrol'
+DF_PETROL_CAT = 'petrol_category'
 DF_PETROL_INFO = 'petrol_info'
+DF_PETROL_DETAIL = 'petrol_detail'
 
 # Requirement. 
 DF_REQUIRED_INC = 'required_income'
@@ -69,6 +79,8 @@ DF_CATALOGUE_ITEM_FILE = 'item_filename'
 DF_CATALOGUE_ITEM_PTS = 'required_points' 
 DF_CATALOGUE_ITEM_PAR_PTS = 'required_partial_points'
 DF_CATALOGUE_TILL_DATE = 'last_until_date'
+DF_CATALOGUE_ITEM_VALUE = 'item_value'
+DF_POINT_VALUE = 'rm_per_point'
 
 # Loan metadata. 
 DF_LOAN_NAME_ORIGINAL = 'loan_name_original'
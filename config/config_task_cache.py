@@ -0,0 +1,197 @@
+import os, json, hashlib, importlib.util, logging
+import datetime as dt
+from functools import lru_cache, update_wrapper
+from typing import Any, Callable, Collection, Dict, Optional, Sequence, Text
+
+# For data processing and analysis. 
+import pandas as pd
+
+# Import personal module. 
+from config import config
+from config.config_logger import setup_logger
+from config.config import LOG_TASK_CACHE_FILEPATH
+
+
+
+# --------------------------------------------------------------
+# Logging configuration 
+# --------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+logger, file_handler, stream_handler = setup_logger(logger, LOG_TASK_CACHE_FILEPATH)
+
+
+
+# --------------------------------------------------------------
+# Cache key 
+# --------------------------------------------------------------
+
+@lru_cache(maxsize=None)
+def _code_version(module:Text) -> Text:
+    # Hash the source file rather than importing the module. 
+    with open(importlib.util.find_spec(module).origin, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _json_default(value:Any) -> Any:
+    # Sets have no stable order across runs, e.g. (CARD_TYPE). 
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    return repr(value)
+
+
+def _update_digest(digest:Any, value:Any) -> None:
+    if isinstance(value, pd.Series):
+        value = value.to_frame()
+
+    if isinstance(value, pd.DataFrame):
+        digest.update(json.dumps([list(map(str, value.columns)), list(map(str, value.dtypes))]).encode())
+        try:
+            digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+        # Cells such as lists and dicts can't be hashed by pandas. 
+        except TypeError:
+            digest.update(value.to_json(orient='split', default_handler=repr).encode())
+    else:
+        digest.update(json.dumps(value, sort_keys=True, default=_json_default).encode())
+    digest.update(b'\0')
+
+
+def task_target(
+        ls_inputs:Sequence[Text],
+        ls_config:Sequence[Text]=(),
+        ls_code:Sequence[Text]=(),
+        period:Optional[Text]=None,
+    ) -> Callable[..., Text]:
+    '''
+    Purpose :
+        Build the Prefect "target" of a task from the content it depends on, so that
+        a task only reruns when its inputs, its code or its config change.
+
+    Args    :
+        ls_inputs : Arguments of the task to hash. The arguments left to their default
+                    aren't passed to the target, so only the ones set by the flow count.
+        ls_config : Names of the values in (config.config) that the task reads.
+        ls_code   : Modules whose source the task runs, e.g. the parsers.
+        period    : Date format for tasks whose output changes over time even with the
+                    same inputs, e.g. "%Y-%m" to scrape the live site again every month.
+
+    Output  :
+        A function that Prefect calls with the task inputs and its context to get the
+        location of the result, e.g. "extract_cashback_data–3f2a9c0d1e7b4a65".
+
+    Notice  :
+        The results are only written when checkpointing is on, i.e. with
+        PREFECT__FLOWS__CHECKPOINTING=true for a local run.
+    '''
+
+    def _target(**kwargs:Any) -> Text:
+        digest = hashlib.sha256()
+        for name in ls_inputs:
+            _update_digest(digest, kwargs.get(name))
+        for name in ls_config:
+            _update_digest(digest, getattr(config, name))
+        for module in ls_code:
+            digest.update(_code_version(module).encode())
+        if period is not None:
+            digest.update((kwargs.get('date') or dt.datetime.now()).strftime(period).encode())
+
+        target = f"{kwargs['task_name']}–{digest.hexdigest()[:16]}"
+        logger.debug(f'----- Cache key of ({kwargs["task_name"]}) -- ({target})')
+        return target
+
+    return _target
+
+
+
+# --------------------------------------------------------------
+# Bounded result storage 
+# --------------------------------------------------------------
+
+def evict_results(dir:Text, max_bytes:int, ls_keep:Collection[Text]=()) -> int:
+    '''
+    Purpose :
+        Remove the least recently used results until the directory fits in
+        (max_bytes). The results at the paths in (ls_keep) are never removed,
+        e.g. the ones the last flow run wrote or read back.
+
+    Output  :
+        Number of bytes freed.
+    '''
+
+    ls_files = []
+    for root, _, files in os.walk(dir):
+        for name in files:
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            ls_files.append((stat.st_mtime, stat.st_size, path))
+
+    set_keep = {os.path.abspath(path) for path in ls_keep}
+    total = sum(size for _, size, _ in ls_files)
+    freed = 0
+    for _, size, path in sorted(ls_files):
+        if total - freed <= max_bytes:
+            break
+        if os.path.abspath(path) in set_keep:
+            continue
+        os.remove(path)
+        freed += size
+        logger.info(f'Evicted ({path}) -- ({size} bytes) from the task cache.')
+
+    return freed
+
+
+
+# --------------------------------------------------------------
+# Lazy Prefect task 
+# --------------------------------------------------------------
+
+class LazyTask:
+    '''
+    Purpose :
+        A Prefect task that only imports Prefect once it is used in a flow. Call 
+        (run) to run the function on its own, e.g. to process the data from the 
+        command line, without loading Prefect at all. 
+
+    Args    :
+        func             : The function of the task.
+        dict_task_kwargs : Arguments of the Prefect "@task" decorator.
+    '''
+
+    def __init__(self, func:Callable, dict_task_kwargs:Dict[Text, Any]):
+        self._task = None
+        self._dict_task_kwargs = dict_task_kwargs
+        self.run = func
+        update_wrapper(self, func)
+
+    @property
+    def task(self) -> Any:
+        if self._task is None:
+            from prefect import task
+            from config.config_task_result import BoundedLocalResult
+
+            # Keep every result in the bounded task cache by default. 
+            dict_task_kwargs = {'result': BoundedLocalResult(), 'checkpoint': True, **self._dict_task_kwargs}
+            self._task = task(**dict_task_kwargs)(self.run)
+        return self._task
+
+    def __call__(self, *args:Any, **kwargs:Any) -> Any:
+        return self.task(*args, **kwargs)
+
+    def __getattr__(self, name:Text) -> Any:
+        # Hand the rest over to the Prefect task, e.g. (map). 
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.task, name)
+
+
+def lazy_task(**dict_task_kwargs:Any) -> Callable[[Callable], LazyTask]:
+    '''
+    Purpose :
+        Same as the Prefect "@task" decorator, but Prefect is only imported once the 
+        task is used in a flow (see LazyTask). The result is kept in the task cache 
+        (BoundedLocalResult) with checkpointing unless told otherwise. 
+    '''
+
+    def decorator(func:Callable) -> LazyTask:
+        return LazyTask(func, dict_task_kwargs)
+    return decorator
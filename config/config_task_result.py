@@ -0,0 +1,84 @@
+import os, logging
+from typing import Any, List, Sequence, Text
+
+# For building data pipeline. 
+from prefect.engine.results import LocalResult
+from prefect.engine.state import State
+
+# Import personal module. 
+from config.config_logger import setup_logger
+from config.config_task_cache import evict_results
+from config.config import ( 
+    LOG_TASK_CACHE_FILEPATH, 
+    TASK_CACHE_DIR, 
+    TASK_CACHE_MAX_BYTES, 
+)
+
+
+
+# --------------------------------------------------------------
+# Logging configuration 
+# --------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+logger, file_handler, stream_handler = setup_logger(logger, LOG_TASK_CACHE_FILEPATH)
+
+
+
+# --------------------------------------------------------------
+# Bounded result storage 
+# --------------------------------------------------------------
+
+class BoundedLocalResult(LocalResult):
+    '''
+    Purpose :
+        A LocalResult that keeps the result directory under (max_bytes). Once a flow
+        has run, the least recently used results are removed until it fits (evict),
+        except the ones of that run (see result_locations). A result counts as used
+        when it is written or read back as a cache hit.
+
+    Args    :
+        dir       : Directory for the results.
+        max_bytes : Size limit of the directory.
+    '''
+
+    def __init__(self, dir:Text=TASK_CACHE_DIR, max_bytes:int=TASK_CACHE_MAX_BYTES, **kwargs:Any):
+        self.max_bytes = max_bytes
+        super().__init__(dir=dir, **kwargs)
+
+    def read(self, location:Text) -> LocalResult:
+        new = super().read(location)
+        try:
+            os.utime(os.path.join(self.dir, location))
+        except OSError:
+            pass
+        return new
+
+    def evict(self, ls_keep:Sequence[Text]=()) -> int:
+        # Walking the directory costs more as it grows, so this runs once per flow 
+        # run (see run_pipeline.run_flow) rather than on every write. The locations 
+        # are either absolute or relative to the directory. 
+        try:
+            return evict_results(self.dir, self.max_bytes, [os.path.join(self.dir, location) for location in ls_keep])
+        except OSError:
+            logger.exception(f'Unable to evict the results from ({self.dir}).')
+            return 0
+
+
+def result_locations(flow_state:State) -> List[Text]:
+    '''
+    Purpose :
+        List the results a flow run wrote or read back as a cache hit, including the
+        ones of each mapped task, so that evicting the cache keeps them.
+
+    Output  :
+        The locations of the results, empty if the flow run has no task states.
+    '''
+
+    if not isinstance(flow_state.result, dict):
+        return []
+
+    ls_states = []
+    for task_state in flow_state.result.values():
+        ls_states += getattr(task_state, 'map_states', None) or [task_state]
+    return [state._result.location for state in ls_states if getattr(state._result, 'location', None)]
@@ -1,21 +1,31 @@
 # %%
 import datetime as dt
+from typing import Optional, Text
 
 # For building data pipeline. 
-from prefect import Flow
+from prefect import Flow, unmapped
 from prefect.schedules import IntervalSchedule
-from prefect.engine.results import LocalResult
+from prefect.executors import Executor, LocalDaskExecutor, LocalExecutor
+from prefect.engine.state import State
 
 # For scraping (personal module). 
 from config.config import (
     PIPELINE_VERSION, 
     URL_CARD, 
+    FLOW_EXECUTOR, 
+    FLOW_EXECUTOR_WORKERS, 
 )
 from autoscrape_data import (
     card_scraping, 
     name_scraping, 
+    image_store, 
 )
+from autoscrape_data.selenium_loader import close_browser_pool
+from autoscrape_data.http_loader import close_http_session
+from config.config_task_result import BoundedLocalResult, result_locations
+from config.config_metrics import export_metrics
 from autoprocess_data import process_card_data
+from autoprocess_data.columnar_storage import TABLE_CASHBACK, TABLE_REWARD_POINTS
 
 
 
@@ -26,6 +36,16 @@ from autoprocess_data import process_card_data
 
 schedule = IntervalSchedule(interval=dt.timedelta(days=30)) 
 
+# Run every task in turn ("sequential"), or the tasks mapped over the banks on a pool of 
+# threads ("threads") or processes ("processes"). 
+FLOW_EXECUTOR_SEQUENTIAL = "sequential"
+
+
+def build_executor(kind:Text=FLOW_EXECUTOR, workers:Optional[int]=FLOW_EXECUTOR_WORKERS) -> Executor: 
+    if kind == FLOW_EXECUTOR_SEQUENTIAL: 
+        return LocalExecutor()
+    return LocalDaskExecutor(scheduler=kind, num_workers=workers)
+
 
 
 # %%
@@ -33,29 +53,74 @@ schedule = IntervalSchedule(interval=dt.timedelta(days=30))
 # Build pipeline 
 # -------------------------------------------------------
 
-with Flow(name='malaysia_bank_card_scraping_flow', result=LocalResult(dir="result_config")) as flow: 
+def build_flow(process:bool=True) -> Flow: 
+    '''
+    Purpose :
+        Build the pipeline. 
+
+    Args    : 
+        process : Process the scraped data too. Otherwise only scrape and save the card data. 
+
+    Output  : 
+        The Prefect flow. 
+    '''
+
+    with Flow(name='malaysia_bank_card_scraping_flow', result=BoundedLocalResult()) as flow: 
+
+        # Step 1: Compile a list of bank names for credit cards. 
+        ls_banks_for_card = name_scraping.compile_bank_names_for_card(URL_CARD, '''/html/body/main/section/form/label/select''') 
+
+        # Step 2: Compile a list of credit cards, one task per bank. 
+        dict_cards_per_bank = name_scraping.compile_cards_for_bank.map(
+            bank=ls_banks_for_card,
+            xpath=unmapped('''/html/body/main/section/ul'''),
+            url=unmapped(URL_CARD),
+        )
 
-    # Step 1: Compile a list of bank names for credit cards. 
-    ls_banks_for_card = name_scraping.compile_bank_names_for_card(URL_CARD, '''/html/body/main/section/form/label/select''') 
+        # Step 3: Run the scrapers, one task per bank. Each bank starts as soon as its 
+        # list of cards is ready, and is retried on its own if some of its cards fail. 
+        # Only the cards whose listing has changed since the last run are scraped. 
+        ls_df_card_per_bank = card_scraping.scrape_cards_for_bank.map(
+            url=unmapped(URL_CARD),
+            bank=ls_banks_for_card,
+            dict_cards=dict_cards_per_bank,
+        )
+        df_card = card_scraping.save_card_data(ls_df_card_per_bank)
 
-    # Step 2: Compile a list of credit cards for each bank. 
-    dict_cards = name_scraping.compile_credit_cards(
-        upstream_tasks=[ls_banks_for_card], 
-        ls_banks=ls_banks_for_card, 
-        xpath='''/html/body/main/section/ul''',
-    ) 
+        # Step 4: Download the card images once, and keep their local paths in the card data. 
+        df_card = image_store.download_card_images(df_card)
 
-    # Step 3: Run the scrapers. 
-    df_card = card_scraping.card_scraping_procedure(
-        upstream_tasks=[ls_banks_for_card, dict_cards], 
-        url=URL_CARD, 
-        ls_banks=ls_banks_for_card, 
-        dict_data=dict_cards, 
-    ) 
+        # Step 5: Perform data processing and computation for each bank as soon as its 
+        # cards are scraped, then combine the banks and save the tables. 
+        if process: 
+            ls_df_reward_per_bank = process_card_data.extract_reward_points_data.map(df_main=ls_df_card_per_bank, save=unmapped(False))
+            ls_df_cashback_per_bank = process_card_data.extract_cashback_data.map(df_main=ls_df_card_per_bank, save=unmapped(False))
+            df_reward = process_card_data.combine_processed_data(ls_df_reward_per_bank, table=TABLE_REWARD_POINTS)
+            df_cashback = process_card_data.combine_processed_data(ls_df_cashback_per_bank, table=TABLE_CASHBACK)
 
-    # Step 4: Perform data processing and computation. 
-    df_reward = process_card_data.extract_reward_points_data(upstream_tasks=[df_card], df_main=df_card) 
-    df_cashback = process_card_data.extract_cashback_data(upstream_tasks=[df_card], df_main=df_card) 
+    return flow
+
+
+def run_flow(flow:Flow, executor:Optional[Executor]=None) -> State: 
+    '''
+    Purpose :
+        Run the pipeline, then release the browsers and connections, trim the task cache 
+        and export the metrics. 
+    '''
+
+    flow_state = flow.run(executor=executor or build_executor())
+
+    # Quit the pooled browsers and connections once the scraping is done. 
+    close_browser_pool()
+    close_http_session()
+
+    # Keep the task cache under its size limit once all the results of the run are written, 
+    # without removing the ones the run just wrote or read. 
+    BoundedLocalResult().evict(result_locations(flow_state))
+
+    # Export the time spent in each step and the retry and timeout counters of the run. 
+    export_metrics()
+    return flow_state
 
 
 
@@ -64,11 +129,17 @@ with Flow(name='malaysia_bank_card_scraping_flow', result=LocalResult(dir="resul
 # Run pipeline 
 # -------------------------------------------------------
 
-# # Register the pipeline with a project name. 
-# flow.register(project_name='malaysia_bank_card_scraping') 
+# The worker processes import this module too, so only build and run the pipeline from 
+# the main one. Importing the module (e.g. from "cli.py") doesn't build the flow. 
+if __name__ == '__main__':
+
+    flow = build_flow()
+
+    # # Register the pipeline with a project name. 
+    # flow.register(project_name='malaysia_bank_card_scraping') 
 
-# Execute the pipeline. 
-flow_state = flow.run()
+    # Execute the pipeline. 
+    flow_state = run_flow(flow)
 
-# You need to install "GraphViz" to run this. 
-flow.visualize(flow_state=flow_state)
+    # You need to install "GraphViz" to run this. 
+    flow.visualize(flow_state=flow_state)
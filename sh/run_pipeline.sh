@@ -1,3 +1,6 @@
+# Keep the task results, so a rerun only runs the tasks whose inputs, code or config changed. 
+export PREFECT__FLOWS__CHECKPOINTING=true; 
+
 # Run Prefect pipeline on local terminal. 
 python3 run_pipeline.py; 
 
@@ -0,0 +1,23 @@
+import os
+from typing import Callable, Text
+
+import pytest
+
+
+SNAPSHOT_FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'snapshots')
+
+
+@pytest.fixture
+def read_snapshot() -> Callable[[Text], Text]:
+    # Raw HTML stored from the site, to test the parsers offline. 
+    def _read(name:Text) -> Text:
+        with open(os.path.join(SNAPSHOT_FIXTURE_DIR, name), encoding='utf-8') as f:
+            return f.read()
+    return _read
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # The stores write to paths relative to the working directory (e.g. "docs/snapshots"). 
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from autoprocess_data.benchmark_parser import (
+    UNCAPPED_CASHBACK_CAP,
+    CashbackTerms,
+    parse_cashback_columns,
+    parse_cashback_terms,
+)
+
+
+@pytest.mark.parametrize('rate, cap, benchmark, terms', [
+    ('5%', 'RM15', 'with monthly spend from RM1,000 up to RM2,500.50',
+        CashbackTerms(5.0, 15.0, 1000.0, 2500.5, False, True, False, False)),
+    ('0.2%', 'Uncapped', 'any amount',
+        CashbackTerms(0.2, UNCAPPED_CASHBACK_CAP, 0.0, np.nan, False, False, False, True)),
+    ('10 %', 'RM 50', 'up to RM500 monthly on weekends only',
+        CashbackTerms(10.0, 50.0, 0.0, 500.0, True, True, False, False)),
+    ('5%', 'RM100', 'any amount in a single receipt',
+        CashbackTerms(5.0, 100.0, 0.0, np.nan, False, False, True, False)),
+    (np.nan, np.nan, np.nan,
+        CashbackTerms(np.nan, np.nan, 0.0, np.nan, False, False, False, False)),
+])
+def test_parse_cashback_terms(rate, cap, benchmark, terms):
+    np.testing.assert_equal(tuple(parse_cashback_terms(rate, cap, benchmark)), tuple(terms))
+
+
+def test_parse_cashback_terms_keeps_the_first_amount():
+    # A second "from" later in the phrase doesn't overwrite the first. 
+    terms = parse_cashback_terms('1%', 'RM5', 'from RM500, or from RM1,000 on weekends')
+    assert terms.cashback_from == 500.0
+    assert terms.weekends_only
+
+
+def test_parse_cashback_columns():
+    df_main = pd.DataFrame({
+        'cashback_rate': ['5%', '0.2%'],
+        'cashback_cap': ['RM15', 'uncapped'],
+        'cashback_benchmark': ['with monthly spend from RM1,000', 'any amount'],
+    }, index=[3, 7])
+
+    df_terms = parse_cashback_columns(df_main)
+    assert df_terms.index.tolist() == [3, 7]
+    assert df_terms.columns.tolist() == [
+        'cashback_rate', 'cashback_cap', 'cashback_from', 'cashback_till',
+        'cashback_weekends_only', 'cashback_monthly_basis', 'cashback_single_receipt', 'cashback_uncapped',
+    ]
+    assert df_terms['cashback_from'].tolist() == [1000, 0]
+    assert df_terms['cashback_monthly_basis'].tolist() == [True, False]
+    assert df_terms['cashback_uncapped'].tolist() == [False, True]
+
+    # Whole numbers stay integers, as before the parser. 
+    assert df_terms['cashback_from'].dtype.kind == 'i'
+    assert df_terms['cashback_rate'].dtype.kind == 'f'
@@ -0,0 +1,168 @@
+import glob, json, os
+
+import numpy as np
+import pytest
+
+from autoscrape_data.card_parsing import (
+    fill_row_from_card_document,
+    fill_row_from_listing,
+    fingerprint_listing_card,
+    index_listing_records,
+    is_valid_card_document,
+    parse_bank_names,
+    parse_card_document,
+    parse_listing_records,
+    rebuild_card_data_from_snapshots,
+)
+from autoscrape_data.card_record import CardRecord
+from autoscrape_data.snapshot_store import save_snapshot
+
+
+URL = 'https://ringgitplus.com/en/credit-card/'
+URL_LISTING = f'{URL}?filter=maybank'
+URL_GOLD = f'{URL}maybank/Maybank-2-Gold-Cards.html'
+URL_INFINITE = f'{URL}maybank/Maybank-Visa-Infinite.html'
+URL_INFINITE_ISLAMIC = f'{URL}maybank-islamic/Maybank-Visa-Infinite.html'
+
+
+
+# %%
+# -------------------------------------------------------
+# Listing webpage
+# -------------------------------------------------------
+
+def test_parse_bank_names(read_snapshot):
+    assert parse_bank_names(read_snapshot('listing_maybank.html')) == ['maybank', 'cimb']
+
+
+def test_parse_listing_records_follows_the_links(read_snapshot):
+    dict_cards = parse_listing_records(read_snapshot('listing_maybank.html'), URL_LISTING)
+
+    # Two cards listed under the same name are both kept, keyed by their link. 
+    assert list(dict_cards) == [URL_GOLD, URL_INFINITE, URL_INFINITE_ISLAMIC]
+    assert [record['card'] for record in dict_cards.values()] == [
+        'Maybank 2 Gold Cards', 'Maybank Visa Infinite', 'Maybank Visa Infinite',
+    ]
+
+    record = dict_cards[URL_GOLD]
+    assert record['img'] == {'src': 'https://ringgitplus.com/img/card-400/maybank-2-gold.jpg', 'alt': 'Maybank 2 Gold Cards'}
+    assert record['summary'][0] == {'header': 'Min. Income', 'text': 'RM2,500 monthly', 'span': 'RM2,500'}
+    assert dict_cards[URL_INFINITE_ISLAMIC]['summary'] is None
+
+
+def test_parse_listing_records_without_listing():
+    assert parse_listing_records('<html><body><main></main></body></html>', URL_LISTING) == {}
+
+
+def test_index_listing_records_without_links():
+    ls_records = [
+        {'card': 'Card A', 'href': None},
+        {'card': 'Card B', 'href': '/b.html'},
+        {'card': 'Card A', 'href': None},
+    ]
+    # Without a link the name is the key, and the repeated listing is skipped. 
+    dict_cards = index_listing_records(ls_records)
+    assert list(dict_cards) == ['Card A', '/b.html']
+    assert dict_cards['Card A'] is ls_records[0]
+
+
+def test_fingerprint_ignores_the_layout_of_the_text():
+    fingerprint = fingerprint_listing_card('Card', '/img/card.jpg', 'Min. Income RM2,000', '/card.html')
+    assert fingerprint == fingerprint_listing_card('Card', '/img/card.jpg', '\n Min. Income\n  RM2,000 ', '/card.html')
+    assert fingerprint != fingerprint_listing_card('Card', '/img/card.jpg', 'Min. Income RM3,000', '/card.html')
+    assert fingerprint != fingerprint_listing_card('Card', '/img/card.jpg', 'Min. Income RM2,000', '/other.html')
+
+
+def test_fill_row_from_listing(read_snapshot):
+    dict_cards = parse_listing_records(read_snapshot('listing_maybank.html'), URL_LISTING)
+
+    card_row = fill_row_from_listing(CardRecord(), dict_cards[URL_GOLD])
+    assert card_row['required_income'] == 2500.0
+    assert card_row['cost_annual_fee'] == '0'
+    assert card_row['cost_annual_fee_condition'] == 'free'
+    assert card_row['listing_fingerprint'] == dict_cards[URL_GOLD]['fingerprint']
+
+    # An income that isn't an amount is left empty rather than failing the card. 
+    card_row = fill_row_from_listing(CardRecord(), dict_cards[URL_INFINITE])
+    assert np.isnan(card_row['required_income'])
+    assert card_row['cost_annual_fee'] == 'RM1,200'
+
+
+
+# %%
+# -------------------------------------------------------
+# Card webpage
+# -------------------------------------------------------
+
+def test_parse_card_document(read_snapshot):
+    dict_document = parse_card_document(read_snapshot('card_maybank_2_gold_cards.html'), URL_GOLD)
+    assert is_valid_card_document(dict_document)
+
+    card_row = fill_row_from_card_document(CardRecord(), dict_document)
+    assert card_row['img'] == 'https://ringgitplus.com/img/card-400/maybank-2-gold-card.jpg'
+    assert card_row['required_income'] == 2500.0
+    assert card_row['cost_annual_fee'] == '0'
+    assert card_row['cost_annual_fee_condition'] == 'free for the first year'
+    assert card_row['cost_interest_rate_annum'] == '15% p.a.'
+    assert card_row['required_age'] == '21 years old'
+    assert card_row['required_applicant'] == 'Malaysians | Permanent residents'
+    assert card_row['cashback'] == 'True'
+    assert card_row['cashback_info'] == 'Earn cashback on weekend spending.'
+    assert json.loads(card_row['cashback_category']) == {'5%': ['on weekend dining'], '0.2%': ['on other spending']}
+    assert card_row['reward'] == 'True'
+    assert card_row['travel_benefit'] == 'False'
+
+
+def test_parse_card_document_without_sections(read_snapshot):
+    dict_document = parse_card_document(read_snapshot('card_maybank_visa_infinite.html'), URL_INFINITE)
+    assert dict_document['requirements'] is None
+    assert dict_document['tables']['cashback'] is None
+
+    card_row = fill_row_from_card_document(CardRecord(), dict_document)
+    assert card_row['cost_annual_fee_condition'] == 'not_free'
+    assert card_row['travel_benefit'] == 'True'
+    assert card_row['cashback'] == 'False'
+
+
+def test_javascript_shell_is_not_a_valid_card_document(read_snapshot):
+    # A webpage rendered by JavaScript has to be loaded in a browser instead. 
+    dict_document = parse_card_document(read_snapshot('card_javascript_shell.html'), URL_GOLD)
+    assert not is_valid_card_document(dict_document)
+
+
+
+# %%
+# -------------------------------------------------------
+# Offline rebuild from the snapshots
+# -------------------------------------------------------
+
+@pytest.fixture
+def stored_snapshots(workdir, read_snapshot):
+    # The islamic card has no snapshot of its webpage. 
+    return {
+        url: save_snapshot(url, read_snapshot(name)) for url, name in [
+            (URL_LISTING, 'listing_maybank.html'),
+            (URL_GOLD, 'card_maybank_2_gold_cards.html'),
+            (URL_INFINITE, 'card_maybank_visa_infinite.html'),
+        ]
+    }
+
+
+def test_rebuild_card_data_from_snapshots(stored_snapshots):
+    df_card = rebuild_card_data_from_snapshots(URL)
+
+    assert list(df_card['url']) == [URL_GOLD, URL_INFINITE]
+    assert list(df_card['bank']) == ['maybank', 'maybank']
+    assert list(df_card['required_income']) == [2500.0, 16667.0]
+    assert list(df_card['cashback']) == ['True', 'False']
+    assert df_card['listing_fingerprint'].notnull().all()
+
+
+def test_rebuild_skips_an_unreadable_snapshot(stored_snapshots):
+    # Cut the snapshot of a card webpage short, as a crash would. 
+    filepath, = glob.glob(os.path.join('docs', 'snapshots', 'objects', '*', f'{stored_snapshots[URL_GOLD]}.html.gz'))
+    with open(filepath, 'wb') as f:
+        f.write(b'not gzip')
+
+    df_card = rebuild_card_data_from_snapshots(URL)
+    assert list(df_card['url']) == [URL_INFINITE]
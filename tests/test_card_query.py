@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from autoprocess_data.card_query import CardQueryIndex, build_offers, tokenise_category
+
+
+LS_CATEGORIES = ['Groceries', 'Dining & Food', 'Petrol', 'Online shopping', 'Groceries and petrol', 'Overseas']
+LS_APPLICANTS = ['Anybody', 'Malaysians Only', 'Malaysians and Permanent Residents']
+
+
+@pytest.fixture(scope='module')
+def df_offers():
+    # Many offers share an income and a score, to check the ties too. 
+    rng = np.random.default_rng(0)
+    n_offers = 3000
+    return pd.DataFrame({
+        'card_name': [f'Card {idx // 3}' for idx in range(n_offers)],
+        'bank': 'maybank',
+        'card_type': rng.choice(['visa', 'mastercard', 'amex'], n_offers),
+        'required_income': rng.integers(0, 40, n_offers) * 500,
+        'required_applicant': rng.choice(LS_APPLICANTS, n_offers),
+        'kind': 'cashback',
+        'category': rng.choice(LS_CATEGORIES, n_offers),
+        'score': rng.integers(0, 20, n_offers) / 2,
+    })
+
+
+def _scan(df_offers, category, income, applicant=None, card_type=None, top_n=5):
+    # The same lookup as a full scan, ordered like the index. 
+    df = df_offers.sort_values(['required_income', 'score'], ascending=[True, False], kind='stable')
+    df = df.sort_values('score', ascending=False, kind='stable')
+    set_tokens = set(tokenise_category(category))
+    df = df[df['category'].map(lambda value: set_tokens <= set(tokenise_category(value)))]
+    df = df[df['required_income'] <= income]
+    if applicant is not None:
+        df = df[df['required_applicant'].isin([applicant, 'Anybody'])]
+    if card_type is not None:
+        df = df[df['card_type'] == card_type]
+    return df.drop_duplicates('card_name').head(top_n)[['card_name', 'score']].values.tolist()
+
+
+def test_tokenise_category():
+    assert tokenise_category('Groceries & Dining') == ['dining', 'groceries']
+    assert tokenise_category('All e-Wallet top ups') == ['e', 'top', 'ups', 'wallet']
+
+
+def test_build_offers():
+    df_cashback = pd.DataFrame({
+        'card_name': ['Card A'], 'bank': ['maybank'], 'card_type': ['visa'], 'required_income': [2000],
+        'required_applicant': ['Anybody'], 'cashback_category': ['Dining'], 'cashback_rate': ['5'],
+    })
+    df_reward = pd.DataFrame({
+        'card_name': ['Card B'], 'bank': ['cimb'], 'card_type': ['visa'], 'required_income': [3000],
+        'required_applicant': ['Anybody'], 'reward_category': ['Petrol'], 'reward_points': [5], 'each_spending': [2],
+    })
+
+    df_offers = build_offers(df_cashback, df_reward, pd.Series({'cimb': 0.01}))
+    assert df_offers['kind'].tolist() == ['cashback', 'reward']
+    assert df_offers['category'].tolist() == ['Dining', 'Petrol']
+    assert df_offers['score'].tolist() == [5.0, 2.5]
+
+
+@pytest.mark.parametrize('view_size', [20, 3])
+def test_query_matches_a_full_scan(df_offers, view_size):
+    # A small view makes most lookups fall back to the bitmaps. 
+    index = CardQueryIndex(df_offers, view_size=view_size)
+    for category in ['groceries', 'petrol groceries', 'online', 'food dining']:
+        for income in [-1, 0, 2750, 9000, 50000]:
+            for applicant in [None, 'Malaysians Only']:
+                for card_type in [None, 'amex']:
+                    ls_records = index.query(category, income, applicant, card_type, top_n=8)
+                    assert [[record['card_name'], record['score']] for record in ls_records] == \
+                        _scan(df_offers, category, income, applicant, card_type, top_n=8)
+
+
+def test_query_without_offers(df_offers):
+    index = CardQueryIndex(df_offers)
+    assert index.query('travel', 50000) == []
+    assert index.query('the and', 50000) == []
+    assert index.query('groceries', 50000, card_type='unionpay') == []
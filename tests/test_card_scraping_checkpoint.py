@@ -0,0 +1,130 @@
+import datetime as dt
+import json, os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from autoscrape_data import card_scraping
+from autoscrape_data.async_crawler import CRAWL_ENGINE_THREADS
+from autoscrape_data.card_record import CardRecord
+from autoscrape_data.card_scraping import (
+    _append_checkpoint,
+    _carry_forward_cards,
+    _checkpoint_filepath,
+    _load_checkpoint,
+    _remove_checkpoint,
+    _scrape_cards,
+)
+from config.config import CARD_CHECKPOINT_DIR, CARD_DF_FILEPATH
+
+
+@pytest.fixture
+def filepath(tmp_path):
+    return str(tmp_path / 'card_checkpoint_v1_{bank}.jsonl')
+
+
+def _card_row(card:str, income:float) -> CardRecord:
+    card_row = CardRecord()
+    card_row['bank'] = 'maybank'
+    card_row['card_name_original'] = card
+    card_row['required_income'] = income
+    card_row['reward'] = 'True'
+    return card_row
+
+
+def test_checkpoint_round_trip(filepath):
+    ls_rows = [_card_row('Maybank 2 Gold Cards', 2500.0), _card_row('Maybank Visa Infinite', 16667.0)]
+    for card_row in ls_rows:
+        _append_checkpoint(card_row, 'Maybank', card_row['card_name_original'], filepath)
+
+    dict_records = _load_checkpoint('Maybank', filepath=filepath)
+    assert list(dict_records) == [('Maybank', 'Maybank 2 Gold Cards'), ('Maybank', 'Maybank Visa Infinite')]
+    for card_row, loaded_row in zip(ls_rows, dict_records.values()):
+        assert loaded_row['required_income'] == card_row['required_income']
+        assert loaded_row['reward'] == 'True'
+        assert np.isnan(loaded_row['cashback'])
+
+
+def test_checkpoint_without_log(filepath):
+    assert _load_checkpoint('Maybank', filepath=filepath) == {}
+
+
+def test_checkpoint_skips_and_terminates_a_partial_line(filepath):
+    _append_checkpoint(_card_row('Card A', 1.0), 'Maybank', 'Card A', filepath)
+    with open(_checkpoint_filepath('Maybank', filepath), 'a') as f:
+        f.write('{"timestamp": "20')
+
+    assert list(_load_checkpoint('Maybank', filepath=filepath)) == [('Maybank', 'Card A')]
+
+    # The next card starts on a line of its own after the partial one. 
+    _append_checkpoint(_card_row('Card B', 2.0), 'Maybank', 'Card B', filepath)
+    assert list(_load_checkpoint('Maybank', filepath=filepath)) == [('Maybank', 'Card A'), ('Maybank', 'Card B')]
+
+
+def test_checkpoint_leaves_out_stale_cards(filepath):
+    _append_checkpoint(_card_row('Card A', 1.0), 'Maybank', 'Card A', filepath)
+    stale = (dt.datetime.now() - dt.timedelta(days=30)).isoformat(timespec='seconds')
+    with open(_checkpoint_filepath('Maybank', filepath), 'a') as f:
+        f.write(json.dumps({'timestamp': stale, 'bank': 'Maybank', 'card': 'Card B', 'row': {}}) + '\n')
+
+    assert list(_load_checkpoint('Maybank', max_age_hours=24, filepath=filepath)) == [('Maybank', 'Card A')]
+
+
+def test_checkpoint_log_per_bank(filepath):
+    _append_checkpoint(_card_row('Card A', 1.0), 'Maybank', 'Card A', filepath)
+    _append_checkpoint(_card_row('Card B', 2.0), 'Hong Leong', 'Card B', filepath)
+    assert _checkpoint_filepath('Hong Leong', filepath).endswith('card_checkpoint_v1_hong_leong.jsonl')
+
+    # Removing the log of a bank leaves the other banks alone. 
+    _remove_checkpoint('Maybank', filepath)
+    assert _load_checkpoint('Maybank', filepath=filepath) == {}
+    assert list(_load_checkpoint('Hong Leong', filepath=filepath)) == [('Hong Leong', 'Card B')]
+
+
+
+def test_carry_forward_unchanged_cards(workdir):
+    today = dt.date.today().isoformat()
+    old = (dt.date.today() - dt.timedelta(days=365)).isoformat()
+    os.makedirs(os.path.dirname(CARD_DF_FILEPATH))
+    pd.DataFrame([
+        {'bank': 'maybank', 'card_name_original': 'Card A', 'listing_fingerprint': 'a', 'scraped_at': today},
+        {'bank': 'maybank', 'card_name_original': 'Card B', 'listing_fingerprint': 'b-old', 'scraped_at': today},
+        {'bank': 'maybank', 'card_name_original': 'Card C', 'listing_fingerprint': 'c', 'scraped_at': old},
+        {'bank': 'cimb', 'card_name_original': 'Card D', 'listing_fingerprint': 'd', 'scraped_at': today},
+    ]).to_csv(CARD_DF_FILEPATH, index=False)
+    dict_cards = {
+        '/a.html': {'card': 'Card A', 'fingerprint': 'a'},
+        '/b.html': {'card': 'Card B', 'fingerprint': 'b'},
+        '/c.html': {'card': 'Card C', 'fingerprint': 'c'},
+        '/d.html': {'card': 'Card D', 'fingerprint': 'd'},
+    }
+
+    # Only the card whose listing is unchanged, and was scraped lately, of the same bank is kept. 
+    dict_records = _carry_forward_cards('Maybank', dict_cards, max_age_days=180)
+    assert list(dict_records) == [('Maybank', '/a.html')]
+    assert dict_records[('Maybank', '/a.html')]['card_name_original'] == 'Card A'
+
+
+def test_carry_forward_without_card_data(workdir):
+    assert _carry_forward_cards('Maybank', {'/a.html': {'card': 'Card A', 'fingerprint': 'a'}}) == {}
+
+
+def test_failed_cards_are_keyed_like_the_checkpoint(workdir, monkeypatch):
+    def scrape_single_card(url, bank, card, dict_listing):
+        if dict_listing['href'] == '/islamic.html':
+            raise ValueError('Unable to load the card webpage.')
+        return _card_row(card, 1.0)
+
+    monkeypatch.setattr(card_scraping, '_scrape_single_card', scrape_single_card)
+    os.makedirs(CARD_CHECKPOINT_DIR)
+    dict_cards = {
+        '/card.html': {'card': 'Visa Infinite', 'href': '/card.html'},
+        '/islamic.html': {'card': 'Visa Infinite', 'href': '/islamic.html'},
+    }
+
+    # The two cards share a name, so the failed one is told apart by its link. 
+    ls_records, ls_failed = _scrape_cards('', ['Maybank'], {'Maybank': dict_cards}, {}, workers=1, engine=CRAWL_ENGINE_THREADS)
+    assert len(ls_records) == 1
+    assert ls_failed == [('Maybank', '/islamic.html')]
+    assert list(_load_checkpoint('Maybank')) == [('Maybank', '/card.html')]
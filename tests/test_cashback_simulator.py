@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from autoprocess_data.cashback_simulator import CashbackSimulator, match_spending_categories
+
+
+LS_CATEGORIES = ['groceries', 'dining', 'petrol', 'online']
+LS_COLUMNS = [
+    'card_name', 'cashback_category', 'cashback_rate', 'cashback_cap', 'cashback_from', 'cashback_till',
+    'cashback_weekends_only', 'cashback_monthly_basis', 'cashback_single_receipt',
+]
+
+
+@pytest.fixture
+def df_cashback():
+    return pd.DataFrame([
+        ['Card A', 'Dining', 5, 15, 0, np.nan, False, True, False],
+        ['Card A', 'Dining and food delivery', 1, np.nan, 0, np.nan, False, True, False],
+        ['Card A', 'Petrol on Sunday', 10, 50, 0, np.nan, True, True, False],
+        ['Card B', 'Groceries', 2, np.nan, 1000, np.nan, False, True, False],
+        ['Card C', 'Online shopping', 3, 10, 500, np.nan, False, False, True],
+    ], columns=LS_COLUMNS)
+
+
+def test_match_spending_categories():
+    arr_match = match_spending_categories(pd.Series(['Dining', 'Online groceries', None]), LS_CATEGORIES)
+    assert arr_match.tolist() == [
+        [False, True, False, False],
+        [True, False, False, True],
+        [False, False, False, False],
+    ]
+    assert match_spending_categories(pd.Series(['Dining']), []).shape == (1, 0)
+
+
+def test_payout(df_cashback):
+    simulator = CashbackSimulator(df_cashback, LS_CATEGORIES)
+    spending = np.array([
+        [600, 200, 140, 400],
+        [100, 400, 0, 600],
+    ])
+
+    # Card A takes the best dining row, up to its cap, and the weekend share of the petrol. 
+    # Card B needs RM1,000 of monthly spending on the card, Card C RM500 in the receipt. 
+    assert list(simulator.card_names) == ['Card A', 'Card B', 'Card C']
+    np.testing.assert_allclose(simulator.payout(spending), [
+        [200 * 0.05 + 140 * 2 / 7 * 0.1, 600 * 0.02, 0],
+        [15, 100 * 0.02, 10],
+    ], rtol=1e-6)
+
+
+def test_payout_in_chunks(df_cashback):
+    simulator = CashbackSimulator(df_cashback, LS_CATEGORIES)
+    spending = np.random.default_rng(0).uniform(0, 2000, size=(1000, len(LS_CATEGORIES)))
+    np.testing.assert_array_equal(simulator.payout(spending, chunk_size=64), simulator.payout(spending))
+
+
+def test_payout_without_matching_categories(df_cashback):
+    # None of the cashback categories covers travel, so every card pays nothing. 
+    simulator = CashbackSimulator(df_cashback, ['travel'])
+    assert np.array_equal(simulator.payout(np.full((3, 1), 500)), np.zeros((3, 3)))
+
+    simulator = CashbackSimulator(df_cashback.iloc[:0], LS_CATEGORIES)
+    assert simulator.payout(np.full((3, len(LS_CATEGORIES)), 500)).shape == (3, 0)
+
+    simulator = CashbackSimulator(df_cashback, [])
+    assert np.array_equal(simulator.payout(np.zeros((3, 0))), np.zeros((3, 3)))
+
+
+def test_payout_checks_the_spending_matrix(df_cashback):
+    simulator = CashbackSimulator(df_cashback, LS_CATEGORIES)
+    with pytest.raises(ValueError):
+        simulator.payout(np.zeros((3, 2)))
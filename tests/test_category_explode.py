@@ -0,0 +1,53 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from autoprocess_data.category_explode import explode_category_column
+
+
+LS_META_COLS = ['bank', 'card_name']
+
+
+def _df_card(ls_cashback) -> pd.DataFrame:
+    return pd.DataFrame({
+        'bank': ['maybank', 'cimb', 'cimb', 'aeon'],
+        'card_name': ['Card A', 'Card B', 'Card C', 'Card D'],
+        'cashback_category': ls_cashback,
+    }, index=[10, 20, 30, 40])
+
+
+def test_explode_cashback_category():
+    df_card = _df_card([
+        json.dumps({'Groceries': ['5%', 'RM15', 'with monthly spend from RM1,000'], 'Others': ['0.2%', 'uncapped', 'any amount']}),
+        np.nan,
+        json.dumps({'Dining': ['2%', 'RM10']}),
+        json.dumps({}),
+    ])
+
+    # One row per table row, with the card columns first and the missing cells left empty. 
+    df_exploded = explode_category_column(df_card, 'cashback_category', LS_META_COLS)
+    assert df_exploded.columns.tolist() == [*LS_META_COLS, 'cashback_category', 'cashback_rate', 'cashback_cap', 'cashback_benchmark']
+    assert df_exploded.iloc[:, :5].values.tolist() == [
+        ['maybank', 'Card A', 'Groceries', '5%', 'RM15'],
+        ['maybank', 'Card A', 'Others', '0.2%', 'uncapped'],
+        ['cimb', 'Card C', 'Dining', '2%', 'RM10'],
+    ]
+    assert df_exploded['cashback_benchmark'].tolist()[:2] == ['with monthly spend from RM1,000', 'any amount']
+    assert pd.isnull(df_exploded['cashback_benchmark'].iloc[2])
+
+
+def test_explode_a_single_cell():
+    df_card = _df_card([json.dumps({'RM1 = 1 point': 'Local spend'}), np.nan, np.nan, np.nan]).rename(columns={'cashback_category': 'reward_category'})
+    df_exploded = explode_category_column(df_card, 'reward_category', LS_META_COLS)
+    assert df_exploded.values.tolist() == [['maybank', 'Card A', 'RM1 = 1 point', 'Local spend']]
+
+
+def test_explode_without_the_category():
+    ls_cols = [*LS_META_COLS, 'cashback_category', 'cashback_rate', 'cashback_cap', 'cashback_benchmark']
+
+    df_exploded = explode_category_column(_df_card([np.nan] * 4), 'cashback_category', LS_META_COLS)
+    assert df_exploded.empty and df_exploded.columns.tolist() == ls_cols
+
+    df_exploded = explode_category_column(_df_card([np.nan] * 4).drop(columns='cashback_category'), 'cashback_category', LS_META_COLS)
+    assert df_exploded.empty and df_exploded.columns.tolist() == ls_cols
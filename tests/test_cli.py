@@ -0,0 +1,89 @@
+import json, os, subprocess, sys
+
+import pandas as pd
+import pytest
+
+import cli
+from autoprocess_data.columnar_storage import load_table
+from autoscrape_data import card_parsing
+from config.config import CARD_DF_FILEPATH, CASHBACK_PARQUET_FILEPATH, REWARD_POINTS_PARQUET_FILEPATH
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _df_card() -> pd.DataFrame:
+    return pd.DataFrame({
+        'img': ['a.jpg', 'b.jpg'],
+        'bank': ['maybank', 'cimb'],
+        'card_name': ['Card A', 'Card B'],
+        'card_type': ['visa', 'mastercard'],
+        'required_income': [2000, 3000],
+        'required_applicant': ['Anybody', 'Malaysians Only'],
+        'cashback': ['True', 'False'],
+        'cashback_category': [json.dumps({'Groceries': ['5%', 'RM15', 'any amount monthly']}), None],
+        'reward': ['False', 'True'],
+        'reward_category': [None, json.dumps({'1 point on every RM1': ['on other transactions']})],
+    })
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    # Record the stage each command runs instead of running it. 
+    ls_calls = []
+    monkeypatch.setattr(cli, '_import_stage', lambda stage: None)
+    monkeypatch.setattr(cli, 'run_process_stage', lambda *args: ls_calls.append(('process', *args)) or True)
+    monkeypatch.setattr(cli, 'run_flow_stage', lambda *args: ls_calls.append(('flow', *args)) or False)
+    return ls_calls
+
+
+@pytest.mark.parametrize('argv, call, code', [
+    (['process'], ('process', CARD_DF_FILEPATH, None), 0),
+    (['process', '--from-csv', 'cards.csv'], ('process', 'cards.csv', None), 0),
+    (['process', '--from-snapshot'], ('process', CARD_DF_FILEPATH, ''), 0),
+    (['process', '--from-snapshot', '2026-01-01'], ('process', CARD_DF_FILEPATH, '2026-01-01'), 0),
+    (['scrape', '--executor', 'threads', '--workers', '4'], ('flow', False, 'threads', 4), 1),
+    (['all'], ('flow', True, cli.FLOW_EXECUTOR, cli.FLOW_EXECUTOR_WORKERS), 1),
+])
+def test_main_runs_the_stage(stages, argv, call, code):
+    assert cli.main(argv) == code
+    assert stages == [call]
+
+
+@pytest.mark.parametrize('argv', [
+    ['scrape', '--from-csv'],
+    ['process', '--from-csv', 'cards.csv', '--from-snapshot'],
+    ['crawl'],
+])
+def test_main_rejects_the_arguments(stages, argv):
+    with pytest.raises(SystemExit) as error:
+        cli.main(argv)
+    assert error.value.code == 2
+    assert stages == []
+
+
+def test_startup_imports_no_stage():
+    # The heavy modules are only imported once a stage is picked. 
+    output = subprocess.run(
+        [sys.executable, '-c', 'import sys, cli; print(sorted({"pandas", "prefect", "selenium"} & set(sys.modules)))'],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True,
+    ).stdout
+    assert output.strip() == '[]'
+
+
+def test_run_process_stage_from_csv(workdir):
+    _df_card().to_csv('cards.csv', index=False)
+
+    assert cli.run_process_stage('cards.csv')
+    assert load_table(CASHBACK_PARQUET_FILEPATH)['card_name'].tolist() == ['Card A']
+    assert load_table(REWARD_POINTS_PARQUET_FILEPATH)['card_name'].tolist() == ['Card B']
+
+
+def test_run_process_stage_from_snapshot(workdir, monkeypatch):
+    ls_since = []
+    monkeypatch.setattr(card_parsing, 'rebuild_card_data_from_snapshots', lambda since=None: ls_since.append(since) or _df_card())
+
+    # An empty date rebuilds from every snapshot. 
+    assert cli.run_process_stage(from_snapshot='')
+    assert cli.run_process_stage(from_snapshot='2026-01-01')
+    assert ls_since == [None, '2026-01-01']
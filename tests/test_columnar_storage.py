@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from autoprocess_data import columnar_storage
+from autoprocess_data.columnar_storage import TABLE_CASHBACK, load_table, save_table
+
+
+def _df_cashback() -> pd.DataFrame:
+    # As read back from the CSV, with the flags as text and a missing cap. 
+    return pd.DataFrame({
+        'bank': ['maybank', 'maybank', 'cimb'],
+        'card_name': ['Card A', 'Card A', 'Card B'],
+        'required_income': [2000, 2000, np.nan],
+        'cashback_rate': [5, 0.2, 2],
+        'cashback_cap': [15, np.nan, 1e+10],
+        'cashback_category': ['Groceries', 'Others', 'Groceries'],
+        'cashback_weekends_only': ['True', 'False', np.nan],
+        'cashback_note': ['a', 'b', 'c'],
+    })
+
+
+def test_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(columnar_storage, 'SAVE_CSV', True)
+    parquet_filepath, csv_filepath = str(tmp_path / 'cashback' / 'df.parquet'), str(tmp_path / 'df.csv')
+    save_table(_df_cashback(), TABLE_CASHBACK, parquet_filepath, csv_filepath)
+
+    # Each column has the type of the table schema, and an unknown column keeps its own. 
+    schema = pq.read_schema(parquet_filepath)
+    assert schema.field('bank').type == pa.dictionary(pa.int32(), pa.string())
+    assert schema.field('cashback_rate').type == pa.float64()
+    assert schema.field('cashback_weekends_only').type == pa.bool_()
+    assert pa.types.is_string(schema.field('cashback_note').type) or pa.types.is_large_string(schema.field('cashback_note').type)
+
+    df_loaded = load_table(parquet_filepath)
+    assert df_loaded['bank'].dtype == 'category'
+    assert df_loaded['bank'].tolist() == ['maybank', 'maybank', 'cimb']
+    np.testing.assert_array_equal(df_loaded['cashback_cap'], [15, np.nan, 1e+10])
+    assert df_loaded['cashback_weekends_only'].iloc[:2].tolist() == [True, False]
+    assert pd.isnull(df_loaded['cashback_weekends_only'].iloc[2])
+    assert pd.read_csv(csv_filepath).shape == (3, 8)
+
+
+def test_load_only_the_columns_and_rows_asked_for(tmp_path, monkeypatch):
+    monkeypatch.setattr(columnar_storage, 'SAVE_CSV', False)
+    parquet_filepath = str(tmp_path / 'df.parquet')
+    save_table(_df_cashback(), TABLE_CASHBACK, parquet_filepath, str(tmp_path / 'df.csv'))
+    assert not (tmp_path / 'df.csv').exists()
+
+    df_loaded = load_table(parquet_filepath, columns=['card_name', 'cashback_rate'], filters=[('bank', '==', 'maybank')])
+    assert df_loaded.columns.tolist() == ['card_name', 'cashback_rate']
+    assert df_loaded.values.tolist() == [['Card A', 5.0], ['Card A', 0.2]]
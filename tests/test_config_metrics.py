@@ -0,0 +1,85 @@
+import json, pickle, threading
+
+import pytest
+
+from config import config_metrics
+from config.config_metrics import Metrics, export_metrics, traced
+
+
+@pytest.fixture
+def metrics():
+    # The metrics of this process, emptied for each test. 
+    config_metrics.metrics.reset()
+    yield config_metrics.metrics
+    config_metrics.metrics.reset()
+
+
+def test_spans_and_counters():
+    registry = Metrics(prefix='test')
+    registry.record_span('http.fetch', 0, 0.5, url='https://a')
+    registry.record_span('http.fetch', 0, 1.5)
+    with registry.span('parse'):
+        pass
+    registry.increment('retries', backend='http')
+    registry.increment('retries', 2, backend='http')
+    registry.increment('retries', backend='say "hi"')
+
+    text = registry.to_prometheus()
+    assert 'test_span_seconds_count{span="http.fetch"} 2\n' in text
+    assert 'test_span_seconds_sum{span="http.fetch"} 2.000000\n' in text
+    assert 'test_span_seconds_max{span="http.fetch"} 1.500000\n' in text
+    assert 'test_span_seconds_count{span="parse"} 1\n' in text
+    assert 'test_retries_total{backend="http"} 3\n' in text
+    assert 'test_retries_total{backend="say \\"hi\\""} 1\n' in text
+
+    ls_events = registry.to_trace()['traceEvents']
+    assert [event['name'] for event in ls_events] == ['http.fetch', 'http.fetch', 'parse']
+    assert ls_events[0]['dur'] == 0.5e6 and ls_events[0]['args'] == {'url': 'https://a'}
+
+
+def test_trace_is_capped():
+    registry = Metrics(prefix='test', max_events=2)
+    for _ in range(5):
+        registry.record_span('step', 0, 1)
+
+    # Every span still counts towards the summary. 
+    assert len(registry.to_trace()['traceEvents']) == 2
+    assert registry.to_trace()['otherData']['dropped_events'] == 3
+    assert 'test_span_seconds_count{span="step"} 5\n' in registry.to_prometheus()
+    assert 'test_trace_dropped_events_total 3\n' in registry.to_prometheus()
+
+
+def test_spans_from_threads(metrics):
+    @traced('work')
+    def work(value):
+        return value * 2
+
+    # Hold the threads until they all run, so none of them reuses the id of another. 
+    barrier = threading.Barrier(8)
+    ls_threads = [threading.Thread(target=lambda index: (barrier.wait(), work(index)), args=(index,)) for index in range(8)]
+    for thread in ls_threads:
+        thread.start()
+    for thread in ls_threads:
+        thread.join()
+
+    assert len({event['tid'] for event in metrics.to_trace()['traceEvents']}) == 8
+    assert work.__name__ == 'work' and work(2) == 4
+    assert f'{metrics.prefix}_span_seconds_count{{span="work"}} 9\n' in metrics.to_prometheus()
+
+
+def test_pickled_metrics_record_to_the_process(metrics):
+    # A function sent to a worker process records to the metrics of that process. 
+    assert pickle.loads(pickle.dumps(Metrics())) is metrics
+
+
+def test_export_metrics(metrics, tmp_path):
+    metrics.increment('timeouts', stage='http')
+    with metrics.span('flow'):
+        pass
+
+    prometheus_filepath, trace_filepath = export_metrics(str(tmp_path / 'metrics' / 'run.prom'), str(tmp_path / 'traces'))
+    with open(prometheus_filepath) as f:
+        assert f.read() == metrics.to_prometheus()
+    with open(trace_filepath) as f:
+        assert [event['name'] for event in json.load(f)['traceEvents']] == ['flow']
+    assert not (tmp_path / 'metrics' / 'run.prom.tmp').exists()
@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+from config.config_task_cache import evict_results, task_target
+
+
+def _write(path, size:int, mtime:float) -> str:
+    with open(path, 'wb') as f:
+        f.write(b'0' * size)
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+# %%
+# -------------------------------------------------------
+# Cache key
+# -------------------------------------------------------
+
+def test_task_target_changes_with_the_inputs():
+    target = task_target(ls_inputs=['df_main'], ls_config=['DF_CARD_VERSION'])
+    key = target(task_name='extract_cashback_data', df_main=[1, 2])
+
+    assert key.startswith('extract_cashback_data–')
+    assert key == target(task_name='extract_cashback_data', df_main=[1, 2])
+    assert key != target(task_name='extract_cashback_data', df_main=[1, 3])
+
+
+def test_task_target_ignores_the_order_of_a_set():
+    target = task_target(ls_inputs=['ls_banks'])
+    assert target(task_name='task', ls_banks={'maybank', 'cimb'}) == target(task_name='task', ls_banks={'cimb', 'maybank'})
+
+
+
+# %%
+# -------------------------------------------------------
+# Bounded result storage
+# -------------------------------------------------------
+
+def test_evict_results_removes_the_least_recently_used(tmp_path):
+    oldest = _write(tmp_path / 'a', 100, 1000)
+    older = _write(tmp_path / 'b', 100, 2000)
+    newest = _write(tmp_path / 'c', 100, 3000)
+
+    assert evict_results(str(tmp_path), max_bytes=150) == 200
+    assert [os.path.exists(path) for path in (oldest, older, newest)] == [False, False, True]
+
+
+def test_evict_results_keeps_the_results_of_the_run(tmp_path):
+    # The oldest result was read back by the last run, so it stays. 
+    kept = _write(tmp_path / 'a', 100, 1000)
+    older = _write(tmp_path / 'b', 100, 2000)
+    newest = _write(tmp_path / 'c', 100, 3000)
+
+    assert evict_results(str(tmp_path), max_bytes=250, ls_keep=[kept]) == 100
+    assert [os.path.exists(path) for path in (kept, older, newest)] == [True, False, True]
+
+
+def test_result_locations_include_the_mapped_tasks(tmp_path, monkeypatch):
+    prefect = pytest.importorskip('prefect')
+    from config.config_task_result import BoundedLocalResult, result_locations
+
+    @prefect.task(target='{task_name}-{map_index}')
+    def double(x):
+        return x * 2
+
+    @prefect.task(target='{task_name}')
+    def total(ls):
+        return sum(ls)
+
+    monkeypatch.setitem(prefect.context.config.flows, 'checkpointing', True)
+    with prefect.Flow('cache', result=BoundedLocalResult(dir=str(tmp_path))) as flow:
+        total(double.map([1, 2]))
+
+    # The cache hits of the second run are kept the same as the fresh results. 
+    for _ in range(2):
+        ls_locations = result_locations(flow.run())
+        assert sorted(os.path.basename(location) for location in ls_locations) == ['double-0', 'double-1', 'total']
@@ -0,0 +1,85 @@
+import glob, os
+from urllib.parse import urljoin
+
+import pandas as pd
+import pytest
+
+from autoscrape_data.image_store import add_image_paths, download_images, load_image_manifest, make_thumbnail
+from autoscrape_data.mock_site import MockSite
+from config.config_metrics import metrics
+
+
+@pytest.fixture(scope='module')
+def site():
+    # Every image path of the mock site serves the same card art, with an ETag. 
+    with MockSite(banks=1, cards_per_bank=1, latency=0, jitter=0, failure_rate=0) as site:
+        yield site
+
+
+def _download(ls_urls, tmp_path):
+    return download_images(
+        ls_urls, workers=2, thumbnail_workers=1, size=(8, 8),
+        image_dir=str(tmp_path / 'images'), manifest_filepath=str(tmp_path / 'images' / 'manifest.json'),
+    )
+
+
+def test_download_images_once_per_content(site, tmp_path):
+    url_a, url_b = urljoin(site.url, '/img/card-400/a.jpg'), urljoin(site.url, '/img/card-400/b.jpg')
+    url_missing = urljoin(site.url, 'missing.jpg')
+
+    # The same image behind two URLs is stored and resized once. 
+    dict_paths = _download([url_a, url_b, url_a, None, url_missing], tmp_path)
+    assert list(dict_paths) == [url_a, url_b, url_missing]
+    assert dict_paths[url_a] == dict_paths[url_b]
+    assert dict_paths[url_missing] == (None, None)
+
+    img_filepath, thumbnail_filepath = dict_paths[url_a]
+    assert img_filepath.endswith('.gif') and os.path.exists(img_filepath) and os.path.exists(thumbnail_filepath)
+    assert len(glob.glob(str(tmp_path / 'images' / 'objects' / '*' / '*'))) == 1
+
+    dict_manifest = load_image_manifest(str(tmp_path / 'images' / 'manifest.json'))
+    assert sorted(dict_manifest) == [url_a, url_b]
+    assert dict_manifest[url_a]['etag'] is not None
+
+
+def test_download_images_revalidates(site, tmp_path):
+    url = urljoin(site.url, '/img/card-400/a.jpg')
+    manifest_filepath = str(tmp_path / 'images' / 'manifest.json')
+    dict_paths = _download([url], tmp_path)
+    dict_record = load_image_manifest(manifest_filepath)[url]
+
+    # Unchanged on the server, so the stored image is kept as it is. 
+    metrics.reset()
+    assert _download([url], tmp_path) == dict_paths
+    assert f'{metrics.prefix}_image_requests_total{{status="not_modified"}} 1\n' in metrics.to_prometheus()
+    assert load_image_manifest(manifest_filepath)[url]['fetched'] == dict_record['fetched']
+
+    # Without the stored file, the image is downloaded again rather than revalidated. 
+    os.remove(dict_paths[url][0])
+    metrics.reset()
+    assert _download([url], tmp_path) == dict_paths
+    assert f'{metrics.prefix}_image_requests_total{{status="downloaded"}} 1\n' in metrics.to_prometheus()
+    assert os.path.exists(dict_paths[url][0])
+
+
+def test_make_thumbnail_of_an_unreadable_image(tmp_path):
+    filepath = tmp_path / 'card.svg'
+    filepath.write_text('<svg xmlns="http://www.w3.org/2000/svg"/>')
+    assert make_thumbnail(str(filepath), str(tmp_path / 'thumb.jpg')) is None
+
+
+def test_add_image_paths(site, tmp_path):
+    df_card = pd.DataFrame({
+        'url': [urljoin(site.url, 'maybank/card-a.html'), urljoin(site.url, 'maybank/card-b.html')],
+        'img': ['/img/card-400/a.jpg', None],
+        'bank': ['maybank', 'maybank'],
+    })
+
+    # The image parsed from the raw HTML is resolved against the card webpage. 
+    df_card = add_image_paths(
+        df_card, thumbnail_workers=1, size=(8, 8),
+        image_dir=str(tmp_path / 'images'), manifest_filepath=str(tmp_path / 'images' / 'manifest.json'),
+    )
+    assert df_card.columns.tolist() == ['url', 'img', 'img_path', 'img_thumbnail_path', 'bank']
+    assert os.path.exists(df_card['img_path'].iloc[0]) and os.path.exists(df_card['img_thumbnail_path'].iloc[0])
+    assert pd.isnull(df_card['img_path'].iloc[1])
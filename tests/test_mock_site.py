@@ -0,0 +1,60 @@
+import urllib.error, urllib.request
+from urllib.parse import urljoin
+
+import pytest
+
+from autoscrape_data.card_parsing import is_valid_card_document, parse_bank_names, parse_card_document, parse_listing_records
+from autoscrape_data.mock_site import MOCK_SITE_IMG, MOCK_SITE_IMG_ETAG, MockSite, build_mock_site, render_listing_page
+
+
+def _get(url, dict_headers=None):
+    request = urllib.request.Request(url, headers=dict_headers or {})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as error:
+        return error.code, error.read()
+
+
+def test_build_mock_site_is_seeded():
+    dict_cards, dict_pages = build_mock_site(banks=2, cards_per_bank=3, seed=1)
+    assert build_mock_site(banks=2, cards_per_bank=3, seed=1) == (dict_cards, dict_pages)
+    assert build_mock_site(banks=2, cards_per_bank=3, seed=2) != (dict_cards, dict_pages)
+    assert list(dict_cards) == ['mockbank1', 'mockbank2']
+    assert len(dict_pages) == 6
+
+
+def test_mock_site_parses_like_the_live_site():
+    dict_cards, dict_pages = build_mock_site(banks=2, cards_per_bank=3, seed=1)
+    url = 'http://127.0.0.1/en/credit-card/'
+
+    # The listing of a bank links to the webpage of each of its cards. 
+    html = render_listing_page(dict_cards, 'mockbank2')
+    assert parse_bank_names(html) == ['mockbank1', 'mockbank2']
+    dict_records = parse_listing_records(html, f'{url}?filter=mockbank2')
+    assert [record['card'] for record in dict_records.values()] == list(dict_cards['mockbank2'])
+    assert [record['href'] for record in dict_records.values()] == [urljoin(url, path) for path, _ in dict_cards['mockbank2'].values()]
+
+    for path, html in dict_pages.items():
+        dict_document = parse_card_document(html, path)
+        assert is_valid_card_document(dict_document)
+        assert any(dict_document['tables'][id_tag] is not None for id_tag in ['cashback', 'rewards'])
+
+
+def test_serve_mock_site():
+    with MockSite(banks=2, cards_per_bank=2, latency=0, jitter=0, failure_rate=0) as site:
+        status, body = _get(site.bank_url(site.banks[0]))
+        assert status == 200
+        assert len(parse_listing_records(body.decode('utf-8'), site.bank_url(site.banks[0]))) == 2
+
+        # The card art is revalidated against its ETag. 
+        img_url = urljoin(site.url, '/img/card-400/0.jpg')
+        assert _get(img_url) == (200, MOCK_SITE_IMG)
+        assert _get(img_url, {'If-None-Match': MOCK_SITE_IMG_ETAG})[0] == 304
+        assert _get(urljoin(site.url, 'unknown.html'))[0] == 404
+
+
+@pytest.mark.parametrize('failure_rate, status', [(1, 503), (0, 200)])
+def test_serve_mock_site_with_failures(failure_rate, status):
+    with MockSite(banks=1, cards_per_bank=1, latency=0, jitter=0, failure_rate=failure_rate) as site:
+        assert _get(site.url)[0] == status
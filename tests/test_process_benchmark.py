@@ -0,0 +1,51 @@
+import json, os
+
+import pandas as pd
+import pytest
+
+from autoprocess_data.process_benchmark import LS_PROCESS_STEPS, generate_card_data, load_process_benchmark, run_process_benchmark
+from config.config import CARD_DF_FILEPATH
+
+
+@pytest.fixture
+def card_filepath(workdir):
+    # Two scraped cards, with fewer categories than a payload may draw. 
+    os.makedirs(os.path.dirname(CARD_DF_FILEPATH), exist_ok=True)
+    pd.DataFrame({
+        'img': ['a.jpg', 'b.jpg'],
+        'bank': ['maybank', 'cimb'],
+        'card_name': ['Card A', 'Card B'],
+        'card_type': ['visa', 'mastercard'],
+        'required_income': [2000, 3000],
+        'required_applicant': ['Anybody', 'Malaysians Only'],
+        'cashback_category': [json.dumps({'Groceries': ['5%', 'RM15', 'any amount monthly'], 'Petrol': ['2%', 'RM10', 'from RM500']}), None],
+        'reward_category': [None, json.dumps({'1 point on every RM1': ['on other transactions']})],
+    }).to_csv(CARD_DF_FILEPATH, index=False)
+    return CARD_DF_FILEPATH
+
+
+def test_generate_card_data(card_filepath):
+    df_card = generate_card_data(50, seed=1, filepath=card_filepath)
+    assert len(df_card) == 50
+    assert df_card['card_name'].is_unique
+    assert df_card['bank'].isin(['maybank', 'cimb']).all()
+    pd.testing.assert_frame_equal(df_card, generate_card_data(50, seed=1, filepath=card_filepath))
+
+    # Every payload only draws from the real categories. 
+    for payload in df_card['cashback_category'].dropna():
+        assert set(json.loads(payload)) <= {'Groceries', 'Petrol'}
+    assert (df_card['cashback_category'].notnull() == (df_card['cashback'] == 'True')).all()
+
+
+def test_run_process_benchmark(card_filepath):
+    filepath = 'docs/benchmarks/process_benchmark.json'
+    df_results = run_process_benchmark([30, 10], time_budget=60, filepath=filepath)
+    assert df_results[['step', 'rows', 'status']].values.tolist() == [
+        [step, rows, 'ok'] for step in LS_PROCESS_STEPS for rows in [10, 30]
+    ]
+    assert (df_results['output_rows'] > 0).all()
+
+    # A step over the time budget skips the larger sizes, and each run is appended. 
+    df_results = run_process_benchmark([10, 30], ls_steps=LS_PROCESS_STEPS[:1], time_budget=0, filepath=filepath)
+    assert df_results['rows'].tolist() == [10]
+    assert load_process_benchmark(filepath)['rows'].tolist() == [10, 30, 10, 30, 10]
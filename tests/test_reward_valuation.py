@@ -0,0 +1,63 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from autoprocess_data.cashback_simulator import CashbackSimulator
+from autoprocess_data.reward_valuation import RewardValuation, load_point_values, rank_cards
+
+
+LS_CATEGORIES = ['groceries', 'dining', 'petrol']
+
+
+@pytest.fixture
+def df_reward():
+    return pd.DataFrame({
+        'bank': ['maybank', 'maybank', 'maybank', 'cimb', 'hsbc'],
+        'card_name': ['Card A', 'Card A', 'Card A', 'Card B', 'Card C'],
+        'reward_points': [5, 1, 2, 3, 10],
+        'reward_category': ['Groceries and dining', 'Other spending', 'Dining', 'Petrol', 'Dining'],
+        'each_spending': [1, 1, 1, 2, 1],
+    })
+
+
+def test_load_point_values(tmp_path):
+    filepath = tmp_path / 'df_reward_catalogue.csv'
+    pd.DataFrame({
+        'bank': ['maybank', 'maybank', 'maybank', 'cimb'],
+        'required_points': [1000, 5000, 1000, 0],
+        'item_value': [5, 30, 50, 10],
+        'last_until_date': [np.nan, '2030-01-01', '2020-01-01', np.nan],
+    }).to_csv(filepath, index=False)
+
+    # The expired item and the item without points are left out. 
+    sr_point_values = load_point_values(str(filepath), on_date=dt.date(2026, 1, 1))
+    assert sr_point_values.to_dict() == {'maybank': 0.006}
+    assert load_point_values(str(filepath), aggfunc='min', on_date=dt.date(2026, 1, 1)).to_dict() == {'maybank': 0.005}
+
+
+def test_payout(df_reward):
+    valuation = RewardValuation(df_reward, pd.Series({'maybank': 0.01, 'cimb': 0.02}), LS_CATEGORIES)
+
+    # Card A earns its best rate in each category, Card C has no conversion so it's worth nothing. 
+    assert list(valuation.card_names) == ['Card A', 'Card B', 'Card C']
+    np.testing.assert_allclose(valuation.earn_rates, [[5, 5, 0], [0, 0, 1.5], [0, 10, 0]])
+    np.testing.assert_allclose(valuation.payout(np.array([[100, 200, 300]])), [[15, 9, 0]], rtol=1e-6)
+
+    with pytest.raises(ValueError):
+        valuation.payout(np.zeros((1, 2)))
+
+
+def test_rank_cards_across_engines(df_reward):
+    valuation = RewardValuation(df_reward, pd.Series({'maybank': 0.01, 'cimb': 0.02}), LS_CATEGORIES)
+    simulator = CashbackSimulator(pd.DataFrame({
+        'card_name': ['Card D'], 'cashback_category': ['Petrol'], 'cashback_rate': [5], 'cashback_cap': [np.nan],
+        'cashback_from': [0], 'cashback_till': [np.nan], 'cashback_weekends_only': [False],
+        'cashback_monthly_basis': [True], 'cashback_single_receipt': [False],
+    }), LS_CATEGORIES)
+
+    arr_names, arr_top, arr_top_payout = rank_cards(np.array([[100, 200, 400], [1000, 0, 100]]), [valuation, simulator], top_n=2)
+    assert arr_names.tolist() == ['Card A', 'Card B', 'Card C', 'Card D']
+    assert arr_names[arr_top].tolist() == [['Card D', 'Card A'], ['Card A', 'Card D']]
+    np.testing.assert_allclose(arr_top_payout, [[20, 15], [50, 5]], rtol=1e-6)
@@ -0,0 +1,36 @@
+from autoscrape_data import selenium_loader
+from autoscrape_data.selenium_loader import PAGE_STAGE_CARD, block_resources, wait_for_webpage_to_load
+from config.config import BROWSER_BLOCKED_URLS
+
+
+class FakeBrowser:
+    # Records the CDP commands sent to the browser. 
+    def __init__(self):
+        self.ls_commands = []
+
+    def execute_cdp_cmd(self, cmd, params):
+        self.ls_commands.append((cmd, params))
+
+
+def _load_card(url, xpath, browser):
+    '''Scrape the card.'''
+    return browser
+
+
+def test_wait_for_webpage_to_load_keeps_the_name():
+    # The spans and the Prefect tasks are named after the wrapped loader. 
+    for loader in (wait_for_webpage_to_load(_load_card), wait_for_webpage_to_load(stage=PAGE_STAGE_CARD)(_load_card)):
+        assert loader.__name__ == '_load_card'
+        assert loader.__doc__ == 'Scrape the card.'
+        assert loader.__wrapped__ is _load_card
+
+
+def test_block_resources(monkeypatch):
+    browser = FakeBrowser()
+    block_resources(browser)
+    assert browser.ls_commands[-1] == ('Network.setBlockedURLs', {'urls': BROWSER_BLOCKED_URLS})
+
+    # The full profile blocks nothing, to compare the savings with. 
+    monkeypatch.setattr(selenium_loader, 'BROWSER_BLOCK_RESOURCES', False)
+    block_resources(browser)
+    assert browser.ls_commands[-1] == ('Network.setBlockedURLs', {'urls': []})